@@ -0,0 +1,68 @@
+"""
+Aggregation of per-call LLM accounting (LLMCall) for capacity and cost planning.
+"""
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from .models import LLMCall
+
+
+def _percentiles(values: List[float]) -> Dict[str, Optional[float]]:
+    if not values:
+        return {'p50': None, 'p95': None}
+    p50, p95 = np.percentile(np.asarray(values, dtype=np.float64), [50, 95])
+    return {'p50': round(float(p50), 1), 'p95': round(float(p95), 1)}
+
+
+def aggregate_llm_calls(queryset=None) -> List[Dict]:
+    """
+    Group LLM calls by the ContentGeneration's content type and language and
+    return p50/p95 latency, time-to-first-token and token counts per group.
+    Latency and token percentiles only use successful calls.
+    """
+    queryset = LLMCall.objects.all() if queryset is None else queryset
+    rows = queryset.values_list(
+        'content_generation__content_type', 'content_generation__language_detected',
+        'status', 'hedge', 'cache_hit', 'latency_ms', 'ttft_ms', 'prompt_tokens', 'output_tokens',
+    )
+
+    groups = defaultdict(lambda: {
+        'calls': 0, 'errors': 0, 'cancelled': 0, 'hedged': 0, 'cache_hits': 0,
+        'latency_ms': [], 'ttft_ms': [], 'prompt_tokens': [], 'output_tokens': [],
+    })
+    for content_type, language, call_status, hedge, cache_hit, latency_ms, ttft_ms, prompt_tokens, output_tokens in rows:
+        group = groups[(content_type, language or 'desconhecido')]
+        group['calls'] += 1
+        group['hedged'] += hedge
+        group['cache_hits'] += cache_hit
+        if call_status == 'error':
+            group['errors'] += 1
+        elif call_status == 'cancelled':
+            group['cancelled'] += 1
+        else:
+            group['latency_ms'].append(latency_ms)
+            if ttft_ms is not None:
+                group['ttft_ms'].append(ttft_ms)
+            if prompt_tokens is not None:
+                group['prompt_tokens'].append(prompt_tokens)
+            if output_tokens is not None:
+                group['output_tokens'].append(output_tokens)
+
+    results = []
+    for (content_type, language), group in sorted(groups.items()):
+        results.append({
+            'content_type': content_type,
+            'language': language,
+            'calls': group['calls'],
+            'errors': group['errors'],
+            'cancelled': group['cancelled'],
+            'hedged': group['hedged'],
+            'cache_hit_rate': round(group['cache_hits'] / group['calls'], 3),
+            'latency_ms': _percentiles(group['latency_ms']),
+            'ttft_ms': _percentiles(group['ttft_ms']),
+            'prompt_tokens': dict(_percentiles(group['prompt_tokens']), total=int(sum(group['prompt_tokens']))),
+            'output_tokens': dict(_percentiles(group['output_tokens']), total=int(sum(group['output_tokens']))),
+        })
+    return results
@@ -0,0 +1,100 @@
+"""
+Process-wide LLM provider clients.
+Created once per worker process (see worker_process_init in your_social_media/celery.py)
+and shared by every task, so connection pools and TLS sessions are reused.
+"""
+import logging
+import threading
+from typing import Dict, Optional
+
+from django.conf import settings
+import google.generativeai as genai
+
+logger = logging.getLogger(__name__)
+
+GEMINI_MODEL_NAME = 'gemini-2.0-flash'
+OPENAI_MODEL_NAME = 'gpt-4o-mini'
+
+_lock = threading.Lock()
+_initialized = False
+_gemini_model = None
+_openai_client = None
+_health = {
+    'gemini': False,
+    'openai': False,
+}
+
+
+def _init_gemini() -> None:
+    global _gemini_model
+    api_key = getattr(settings, 'GOOGLE_API_KEY', '')
+    if not api_key:
+        logger.error("[LLM CLIENTS] GOOGLE_API_KEY is missing or empty. Gemini disabled for this process.")
+        return
+    try:
+        if settings.PROVIDER_STUB_URL:
+            # The stub server speaks the REST transport only
+            genai.configure(api_key=api_key, transport='rest',
+                            client_options={'api_endpoint': settings.PROVIDER_STUB_URL})
+        else:
+            genai.configure(api_key=api_key)
+        _gemini_model = genai.GenerativeModel(GEMINI_MODEL_NAME)
+        _health['gemini'] = True
+        logger.info(f"[LLM CLIENTS] Gemini model '{GEMINI_MODEL_NAME}' configured (key length {len(api_key)}).")
+    except Exception as e:
+        logger.error(f"[LLM CLIENTS] Error configuring Gemini: {e}")
+
+
+def _init_openai() -> None:
+    global _openai_client
+    api_key = getattr(settings, 'OPENAI_API_KEY', '')
+    if not api_key:
+        logger.info("[LLM CLIENTS] OPENAI_API_KEY not set. OpenAI client disabled for this process.")
+        return
+    try:
+        # Import OpenAI here to avoid import errors if not installed
+        import openai
+        base_url = f'{settings.PROVIDER_STUB_URL}/v1' if settings.PROVIDER_STUB_URL else None
+        _openai_client = openai.OpenAI(api_key=api_key, base_url=base_url)
+        _health['openai'] = True
+        logger.info(f"[LLM CLIENTS] OpenAI client created (key length {len(api_key)}).")
+    except Exception as e:
+        logger.error(f"[LLM CLIENTS] Error creating OpenAI client: {e}")
+
+
+def init_clients(force: bool = False) -> Dict[str, bool]:
+    """
+    Create the provider clients for this process.
+    Idempotent: later calls are no-ops unless force=True.
+    """
+    global _initialized, _gemini_model, _openai_client
+    if _initialized and not force:
+        return client_health()
+    with _lock:
+        if _initialized and not force:
+            return client_health()
+        _gemini_model = None
+        _openai_client = None
+        _health.update({'gemini': False, 'openai': False})
+        _init_gemini()
+        _init_openai()
+        _initialized = True
+    return client_health()
+
+
+def get_gemini_model():
+    """Return the shared Gemini model, or None if Gemini is not configured."""
+    init_clients()
+    return _gemini_model
+
+
+def get_openai_client():
+    """Return the shared OpenAI client, or None if OpenAI is not configured."""
+    init_clients()
+    return _openai_client
+
+
+def client_health() -> Dict[str, bool]:
+    """Health flags for each provider in this process."""
+    return dict(_health, initialized=_initialized)
+
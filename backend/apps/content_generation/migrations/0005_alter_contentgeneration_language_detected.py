@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-19 01:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('content_generation', '0004_alter_contentgeneration_user'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='contentgeneration',
+            name='language_detected',
+            field=models.CharField(blank=True, max_length=50, null=True),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 4.2.7 on 2026-10-19 01:11
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('content_generation', '0005_alter_contentgeneration_language_detected'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ContentGenerationBatch',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('total', models.IntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='content_generation_batches', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Lote de Geração de Conteúdo',
+                'verbose_name_plural': 'Lotes de Geração de Conteúdo',
+                'db_table': 'content_generation_batches',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.AddField(
+            model_name='contentgeneration',
+            name='batch',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='content_generations', to='content_generation.contentgenerationbatch'),
+        ),
+    ]
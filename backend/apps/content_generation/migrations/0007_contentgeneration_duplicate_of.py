@@ -0,0 +1,19 @@
+# Generated by Django 4.2.7 on 2026-10-19 01:16
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('content_generation', '0006_contentgenerationbatch'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='contentgeneration',
+            name='duplicate_of',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='duplicates', to='content_generation.contentgeneration'),
+        ),
+    ]
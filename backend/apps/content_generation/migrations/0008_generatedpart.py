@@ -0,0 +1,32 @@
+# Generated by Django 4.2.7 on 2026-10-19 01:17
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('content_generation', '0007_contentgeneration_duplicate_of'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GeneratedPart',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('part', models.CharField(choices=[('titles', 'Títulos'), ('description', 'Descrição'), ('chapters', 'Capítulos')], max_length=20)),
+                ('status', models.CharField(choices=[('completed', 'Concluído'), ('failed', 'Falhou')], max_length=20)),
+                ('content', models.TextField(blank=True, default='')),
+                ('error_message', models.TextField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('content_generation', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='parts', to='content_generation.contentgeneration')),
+            ],
+            options={
+                'verbose_name': 'Parte Gerada',
+                'verbose_name_plural': 'Partes Geradas',
+                'db_table': 'generated_parts',
+                'unique_together': {('content_generation', 'part')},
+            },
+        ),
+    ]
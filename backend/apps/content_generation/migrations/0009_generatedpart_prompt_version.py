@@ -0,0 +1,23 @@
+# Generated by Django 4.2.7 on 2026-10-19 01:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('content_generation', '0008_generatedpart'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='generatedpart',
+            name='prompt_tokens',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name='generatedpart',
+            name='prompt_version',
+            field=models.CharField(blank=True, max_length=50, null=True),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 4.2.7 on 2026-10-19 01:20
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('content_generation', '0009_generatedpart_prompt_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LLMCall',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('part', models.CharField(choices=[('titles', 'Títulos'), ('description', 'Descrição'), ('chapters', 'Capítulos')], max_length=20)),
+                ('provider', models.CharField(max_length=20)),
+                ('model', models.CharField(max_length=50)),
+                ('status', models.CharField(choices=[('success', 'Sucesso'), ('error', 'Erro'), ('cancelled', 'Cancelada')], max_length=10)),
+                ('hedge', models.BooleanField(default=False)),
+                ('prompt_tokens', models.PositiveIntegerField(blank=True, null=True)),
+                ('output_tokens', models.PositiveIntegerField(blank=True, null=True)),
+                ('cached_tokens', models.PositiveIntegerField(default=0)),
+                ('cache_hit', models.BooleanField(default=False)),
+                ('latency_ms', models.PositiveIntegerField()),
+                ('ttft_ms', models.PositiveIntegerField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('content_generation', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='llm_calls', to='content_generation.contentgeneration')),
+            ],
+            options={
+                'verbose_name': 'Chamada LLM',
+                'verbose_name_plural': 'Chamadas LLM',
+                'db_table': 'llm_calls',
+            },
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-19 01:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('content_generation', '0010_llmcall'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='contentgeneration',
+            index=models.Index(fields=['status', 'completed_at'], name='content_gen_status_1f7934_idx'),
+        ),
+    ]
@@ -6,6 +6,24 @@ from django.conf import settings
 import uuid
 
 
+class ContentGenerationBatch(models.Model):
+    """Model for grouping content generations requested together."""
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='content_generation_batches', blank=True, null=True)
+    total = models.IntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        db_table = 'content_generation_batches'
+        verbose_name = 'Lote de Geração de Conteúdo'
+        verbose_name_plural = 'Lotes de Geração de Conteúdo'
+        ordering = ['-created_at']
+    
+    def __str__(self):
+        return f"Lote {self.id} ({self.total} gerações)"
+
+
 class ContentGeneration(models.Model):
     """Model for storing content generation requests and results."""
     
@@ -26,6 +44,9 @@ class ContentGeneration(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='content_generations', blank=True, null=True)
     transcription = models.ForeignKey('transcriptions.Transcription', on_delete=models.CASCADE, related_name='content_generations')
+    batch = models.ForeignKey(ContentGenerationBatch, on_delete=models.SET_NULL, related_name='content_generations', blank=True, null=True)
+    # Identical in-flight request whose result this one reuses (see singleflight.py)
+    duplicate_of = models.ForeignKey('self', on_delete=models.SET_NULL, related_name='duplicates', blank=True, null=True)
     
     # Request information
     content_type = models.CharField(max_length=20, choices=CONTENT_TYPE_CHOICES)
@@ -38,7 +59,7 @@ class ContentGeneration(models.Model):
     
     # Processing information
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
-    language_detected = models.CharField(max_length=10, blank=True, null=True)
+    language_detected = models.CharField(max_length=50, blank=True, null=True)
     
     # Results
     generated_content = models.TextField(blank=True, null=True)
@@ -56,6 +77,8 @@ class ContentGeneration(models.Model):
         verbose_name = 'Geração de Conteúdo'
         verbose_name_plural = 'Gerações de Conteúdo'
         ordering = ['-created_at']
+        # Backlog and throughput counts for admission control
+        indexes = [models.Index(fields=['status', 'completed_at'])]
     
     def __str__(self):
         user_info = self.user.email if self.user else 'Anônimo'
@@ -108,4 +131,74 @@ class GeneratedChapter(models.Model):
         ordering = ['content_generation', 'chapter_number']
     
     def __str__(self):
-        return f"Cap. {self.chapter_number}: {self.title}" 
\ No newline at end of file
+        return f"Cap. {self.chapter_number}: {self.title}" 
+
+class GeneratedPart(models.Model):
+    """Model for storing the outcome of each part of a content generation."""
+    
+    PART_CHOICES = [
+        ('titles', 'Títulos'),
+        ('description', 'Descrição'),
+        ('chapters', 'Capítulos'),
+    ]
+    
+    STATUS_CHOICES = [
+        ('completed', 'Concluído'),
+        ('failed', 'Falhou'),
+    ]
+    
+    content_generation = models.ForeignKey(ContentGeneration, on_delete=models.CASCADE, related_name='parts')
+    part = models.CharField(max_length=20, choices=PART_CHOICES)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES)
+    content = models.TextField(blank=True, default='')
+    error_message = models.TextField(blank=True, null=True)
+    # Prompt template that produced this part (e.g. 'titles:v2') and its token sizes per fragment
+    prompt_version = models.CharField(max_length=50, blank=True, null=True)
+    prompt_tokens = models.JSONField(default=dict, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        db_table = 'generated_parts'
+        verbose_name = 'Parte Gerada'
+        verbose_name_plural = 'Partes Geradas'
+        unique_together = ['content_generation', 'part']
+    
+    def __str__(self):
+        return f"{self.get_part_display()}: {self.get_status_display()}"
+
+
+class LLMCall(models.Model):
+    """Model for storing token and latency accounting of each LLM provider call."""
+    
+    STATUS_CHOICES = [
+        ('success', 'Sucesso'),
+        ('error', 'Erro'),
+        ('cancelled', 'Cancelada'),
+    ]
+    
+    content_generation = models.ForeignKey(ContentGeneration, on_delete=models.CASCADE, related_name='llm_calls')
+    part = models.CharField(max_length=20, choices=GeneratedPart.PART_CHOICES)
+    provider = models.CharField(max_length=20)
+    model = models.CharField(max_length=50)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES)
+    hedge = models.BooleanField(default=False)
+    
+    # Token usage (provider-reported, or estimated when the provider reports none)
+    prompt_tokens = models.PositiveIntegerField(blank=True, null=True)
+    output_tokens = models.PositiveIntegerField(blank=True, null=True)
+    cached_tokens = models.PositiveIntegerField(default=0)
+    cache_hit = models.BooleanField(default=False)
+    
+    # Timing
+    latency_ms = models.PositiveIntegerField()
+    ttft_ms = models.PositiveIntegerField(blank=True, null=True)
+    
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    
+    class Meta:
+        db_table = 'llm_calls'
+        verbose_name = 'Chamada LLM'
+        verbose_name_plural = 'Chamadas LLM'
+    
+    def __str__(self):
+        return f"{self.provider}/{self.model} {self.part} {self.latency_ms}ms"
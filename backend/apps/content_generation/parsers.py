@@ -0,0 +1,219 @@
+"""
+Parsers that turn raw LLM output into GeneratedTitle / GeneratedChapter data.
+"""
+import re
+import unicodedata
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+# Title types offered by the frontend (value -> label used in the prompt)
+TITLE_TYPES = {
+    'impactante': 'Impactante',
+    'analítico': 'Analítico',
+    'agressivo': 'Agressivo',
+    'nicho': 'Nicho',
+    'engajamento': 'Engajamento',
+    'curiosidade': 'Curiosidade',
+    'seo_classico': 'SEO Clássico',
+    'storytelling': 'Storytelling',
+    'shorts': 'Shorts',
+    'live_podcast': 'Live/Podcast',
+}
+
+# Translated headers the model sometimes uses when writing in other languages
+TITLE_TYPE_ALIASES = {
+    'impactful': 'impactante', 'impactant': 'impactante', 'impattante': 'impactante', 'wirkungsvoll': 'impactante',
+    'analytical': 'analítico', 'analytique': 'analítico', 'analitico': 'analítico', 'analytisch': 'analítico',
+    'aggressive': 'agressivo', 'agresivo': 'agressivo', 'agressif': 'agressivo', 'aggressivo': 'agressivo',
+    'niche': 'nicho',
+    'engagement': 'engajamento', 'compromiso': 'engajamento', 'coinvolgimento': 'engajamento',
+    'curiosity': 'curiosidade', 'curiosidad': 'curiosidade', 'curiosite': 'curiosidade', 'curiosita': 'curiosidade', 'neugier': 'curiosidade',
+    'classic seo': 'seo_classico', 'seo clasico': 'seo_classico', 'seo classique': 'seo_classico', 'seo classico': 'seo_classico', 'seo': 'seo_classico',
+    'podcast': 'live_podcast',
+}
+
+# Field labels the model uses in the supported languages
+_TITLE_LABELS = r'(?:t[ií]tulo(?:\s+sugerido)?|suggested\s+title|title|titre(?:\s+sugg[ée]r[ée])?|titolo(?:\s+suggerito)?|titel)'
+_JUSTIFICATION_LABELS = r'(?:justificativa|justificaci[oó]n|justification|giustificazione|begr[üu]ndung|por\s+que\s+funciona|why\s+it\s+works)'
+_KEYWORD_LABELS = r'(?:palavras?[-\s]chave(?:\s+utilizadas)?|palabras?\s+clave(?:\s+utilizadas)?|keywords?(?:\s+used)?|mots[-\s]cl[ée]s|parole\s+chiave|schl[üu]sselw[öo]rter)'
+
+_FIELD_RE = re.compile(
+    rf'^\s*(?:[-*•]\s*)?(?P<label>{_TITLE_LABELS}|{_JUSTIFICATION_LABELS}|{_KEYWORD_LABELS})\s*(?:\([^)]*\))?\s*:\s*(?P<value>.*)$',
+    re.IGNORECASE,
+)
+_HEADER_RE = re.compile(r'^\s*(?:#{1,6}\s+|\d+[.)]\s+)(?P<header>.+?)\s*$')
+_MARKDOWN_RE = re.compile(r'[*_`]+')
+_TIMESTAMP_RE = re.compile(r'^(\d{1,2}):(\d{2})(?::(\d{2}))?$')
+_CHAPTER_RE = re.compile(
+    r'^\s*(?:[-*•]\s*|\d+[.)]\s+)?[*_`]*\(?(?P<timestamp>\d{1,2}:\d{2}(?::\d{2})?)\)?[*_`]*\s*[-–—:|]?\s*(?P<title>.+?)\s*$'
+)
+_TRANSCRIPT_LINE_RE = re.compile(r'^(\d{1,2}:\d{2}(?::\d{2})?)\s', re.MULTILINE)
+
+# Tolerance for chapter timestamps slightly past the last transcript line
+CHAPTER_RANGE_TOLERANCE_SECONDS = 30
+
+
+@dataclass
+class ParsedTitle:
+    title_type: str
+    title_text: str
+    justification: Optional[str] = None
+    keywords: List[str] = field(default_factory=list)
+
+
+@dataclass
+class ParsedChapter:
+    chapter_number: int
+    timestamp: str
+    seconds: int
+    title: str
+
+
+def _clean(text: str) -> str:
+    """Strip markdown emphasis, quotes and surrounding whitespace."""
+    return _MARKDOWN_RE.sub('', text).strip().strip('"“”\'').strip()
+
+
+def _fold(text: str) -> str:
+    """Lowercase and remove accents for label matching."""
+    normalized = unicodedata.normalize('NFKD', text.lower())
+    return ''.join(char for char in normalized if not unicodedata.combining(char))
+
+
+_FOLDED_TYPES = {_fold(label): value for value, label in TITLE_TYPES.items()}
+_FOLDED_TYPES.update({_fold(value): value for value in TITLE_TYPES})
+_FOLDED_TYPES.update({_fold(alias): value for alias, value in TITLE_TYPE_ALIASES.items()})
+_TYPE_PREFIX_RE = re.compile(r'^(?:tipo\s*(?:de\s+titulo)?|titulo|title|titre|titolo|titel|type)\s*[:\-]?\s*')
+
+
+def _is_type_line(line: str) -> bool:
+    """True for bare plain-text lines that just name a title type (e.g. 'Shorts:')."""
+    folded = _TYPE_PREFIX_RE.sub('', _fold(_clean(line)).rstrip(':').strip())
+    return folded in _FOLDED_TYPES
+
+
+def resolve_title_type(header: str) -> str:
+    """Map a section header (e.g. 'Título SEO Clássico') to a TITLE_TYPES key."""
+    folded = _fold(_clean(header))
+    # Longest labels first so 'seo classico' wins over shorter overlaps
+    for label in sorted(_FOLDED_TYPES, key=len, reverse=True):
+        if label in folded:
+            return _FOLDED_TYPES[label]
+    folded = _TYPE_PREFIX_RE.sub('', folded)
+    return re.sub(r'[^a-z0-9]+', '_', folded).strip('_')[:50] or 'titulo'
+
+
+def _split_keywords(value: str) -> List[str]:
+    keywords = [_clean(item).lstrip('#') for item in re.split(r'[,;]', value)]
+    return [keyword for keyword in keywords if keyword]
+
+
+def parse_titles(text: Optional[str]) -> List[ParsedTitle]:
+    """Parse titles output: one section per title type, each with title, justification and keywords."""
+    if not text:
+        return []
+
+    sections = []
+    current = None
+    for raw_line in text.splitlines():
+        line = raw_line.strip()
+        if not line:
+            continue
+        header = _HEADER_RE.match(line)
+        is_header = header and not _FIELD_RE.match(_clean(header.group('header')))
+        if is_header or _is_type_line(line):
+            current = {'header': header.group('header') if is_header else line, 'lines': []}
+            sections.append(current)
+        elif current is not None:
+            current['lines'].append(line)
+
+    titles = []
+    for section in sections:
+        title_text, justification, keywords = None, [], []
+        active = None
+        for line in section['lines']:
+            match = _FIELD_RE.match(_clean(line))
+            if match:
+                label = _fold(match.group('label'))
+                value = _clean(match.group('value'))
+                if re.match(_fold(_KEYWORD_LABELS), label):
+                    active = 'keywords'
+                    keywords.extend(_split_keywords(value))
+                elif re.match(_fold(_JUSTIFICATION_LABELS), label):
+                    active = 'justification'
+                    if value:
+                        justification.append(value)
+                else:
+                    active = 'title'
+                    if value:
+                        title_text = value
+                continue
+            value = _clean(line.lstrip('-*• '))
+            if not value:
+                continue
+            if active == 'title' and not title_text:
+                title_text = value
+            elif active == 'justification':
+                justification.append(value)
+            elif active == 'keywords':
+                keywords.extend(_split_keywords(value))
+            elif not title_text:
+                title_text = value
+
+        if title_text:
+            titles.append(ParsedTitle(
+                title_type=resolve_title_type(section['header']),
+                title_text=title_text[:500],
+                justification=' '.join(justification) or None,
+                keywords=keywords,
+            ))
+    return titles
+
+
+def timestamp_to_seconds(timestamp: str) -> Optional[int]:
+    """Convert 'MM:SS' or 'HH:MM:SS' to seconds."""
+    match = _TIMESTAMP_RE.match(timestamp.strip())
+    if not match:
+        return None
+    first, second, third = match.groups()
+    if third is None:
+        return int(first) * 60 + int(second)
+    return int(first) * 3600 + int(second) * 60 + int(third)
+
+
+def transcript_time_range(transcription_text: Optional[str], duration_seconds: Optional[int] = None) -> Optional[int]:
+    """Return the last timestamp (in seconds) covered by a transcription, if known."""
+    timestamps = _TRANSCRIPT_LINE_RE.findall(transcription_text or '')
+    if timestamps:
+        return max(timestamp_to_seconds(timestamp) or 0 for timestamp in timestamps)
+    return duration_seconds
+
+
+def parse_chapters(text: Optional[str], max_seconds: Optional[int] = None) -> List[ParsedChapter]:
+    """
+    Parse chapter lines ('0:00 Title'). Chapters must be strictly increasing and
+    fall inside the transcript's time range; lines that do not are dropped.
+    """
+    if not text:
+        return []
+
+    chapters = []
+    last_seconds = -1
+    for line in text.splitlines():
+        match = _CHAPTER_RE.match(line)
+        if not match:
+            continue
+        seconds = timestamp_to_seconds(match.group('timestamp'))
+        title = _clean(match.group('title'))
+        if seconds is None or not title or seconds <= last_seconds:
+            continue
+        if max_seconds is not None and seconds > max_seconds + CHAPTER_RANGE_TOLERANCE_SECONDS:
+            continue
+        chapters.append(ParsedChapter(
+            chapter_number=len(chapters) + 1,
+            timestamp=match.group('timestamp'),
+            seconds=seconds,
+            title=title[:200],
+        ))
+        last_seconds = seconds
+    return chapters
@@ -0,0 +1,324 @@
+"""
+Prompt template registry for content generation.
+Prompts are assembled from versioned fragments, only the definitions of the
+requested title/description types are included, and the approximate token size
+of every fragment is recorded so prompt overhead can be measured per request.
+"""
+import logging
+import math
+import re
+import unicodedata
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from .parsers import TITLE_TYPES, resolve_title_type
+
+logger = logging.getLogger(__name__)
+
+_TOKEN_RE = re.compile(r"\w+|[^\w\s]", flags=re.UNICODE)
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Approximate LLM token count without a tokenizer: one token per punctuation
+    mark or emoji and roughly one per four characters of each word.
+    """
+    return sum(math.ceil(len(token) / 4) for token in _TOKEN_RE.findall(text or ''))
+
+
+@dataclass(frozen=True)
+class Fragment:
+    name: str
+    version: int
+    text: str
+
+
+@dataclass(frozen=True)
+class PromptTemplate:
+    name: str
+    version: int
+    fragments: Tuple[str, ...]
+
+
+@dataclass
+class BuiltPrompt:
+    template: str
+    version: int
+    text: str
+    # (fragment name, fragment version, approximate tokens) in prompt order
+    parts: List[Tuple[str, int, int]] = field(default_factory=list)
+
+    @property
+    def version_tag(self) -> str:
+        return f"{self.template}:v{self.version}"
+
+    @property
+    def total_tokens(self) -> int:
+        return sum(tokens for _, _, tokens in self.parts)
+
+    def token_sizes(self) -> Dict:
+        """Per-fragment token sizes and versions, stored with the generated output."""
+        return {
+            'total': self.total_tokens,
+            'parts': {name: {'version': version, 'tokens': tokens} for name, version, tokens in self.parts},
+        }
+
+
+def _fragment(name: str, version: int, text: str) -> Fragment:
+    return Fragment(name, version, text.strip('\n'))
+
+
+FRAGMENTS = {fragment.name: fragment for fragment in [
+    _fragment('agents_header', 1, """
+🤖 SISTEMA MULTI-AGENTES - COMUNICAÇÃO ENTRE AGENTES:
+- AGENTE 1 (Detector local): Detectou idioma = {lang_code} ({lang_name})
+- AGENTE 2 (Gemini): Deve gerar conteúdo em {lang_name}
+
+INSTRUÇÕES OBRIGATÓRIAS PARA AGENTE 2 (Gemini):"""),
+    _fragment('agents_header_segments', 1, """
+🤖 SISTEMA MULTI-AGENTES - COMUNICAÇÃO ENTRE AGENTES:
+- AGENTE 1 (Detector local): Detectou idioma = {lang_code} ({lang_name}) e dividiu o vídeo em {segment_count} partes
+- AGENTE 2 (Gemini): Deve nomear os capítulos em {lang_name}
+
+INSTRUÇÕES OBRIGATÓRIAS PARA AGENTE 2 (Gemini):"""),
+    _fragment('language', 1, """
+🚨 GERE TODO O CONTEÚDO EXCLUSIVAMENTE EM {lang_name_upper} ({lang_code_upper})
+🚨 NÃO misture idiomas na resposta
+🚨 Use as palavras e estruturas típicas do {lang_name_upper}
+
+CONFIRMAÇÃO DE IDIOMA DETECTADO:
+- Código: {lang_code}
+- Idioma: {lang_name}
+- Responsável pela geração: Gemini (Agente 2)"""),
+    _fragment('language_chapters', 1, """
+🚨 GERE TODO O CONTEÚDO EXCLUSIVAMENTE EM {lang_name_upper} ({lang_code_upper})
+🚨 NÃO misture idiomas na resposta
+🚨 Os títulos dos capítulos devem ser concisos e no idioma {lang_name_upper}"""),
+
+    _fragment('format_titles_markdown', 1, """
+FORMATAÇÃO DA RESPOSTA:
+Use formatação Markdown para organizar a resposta:
+- **Negrito** para destacar títulos e palavras-chave importantes
+- *Itálico* para justificativas e explicações
+- `Código` para códigos de idioma ou termos técnicos
+- Listas numeradas para organizar os tipos de título
+- Quebras de linha para melhor legibilidade"""),
+    _fragment('format_titles_plain', 1, """
+FORMATAÇÃO DA RESPOSTA:
+Use apenas texto simples, sem formatação especial.
+Organize de forma clara e legível, mas sem usar markdown, negrito, itálico ou outros elementos de formatação."""),
+    _fragment('format_description_markdown', 1, """
+FORMATAÇÃO DA RESPOSTA:
+Use formatação Markdown para organizar a resposta com estrutura clara e profissional."""),
+    _fragment('format_description_plain', 1, """
+FORMATAÇÃO DA RESPOSTA:
+Use apenas texto simples, sem formatação especial."""),
+    _fragment('format_chapters_markdown', 1, """
+FORMATAÇÃO DA RESPOSTA:
+Liste os capítulos no formato:
+0:00 Título Conciso do Capítulo 1
+1:23 Título Conciso do Capítulo 2
+...
+Use formatação Markdown para organizar os capítulos de forma clara, mas os títulos dos capítulos em si devem ser texto simples."""),
+    _fragment('format_chapters_plain', 1, """
+FORMATAÇÃO DA RESPOSTA:
+Liste os capítulos no formato:
+0:00 Título Conciso do Capítulo 1
+1:23 Título Conciso do Capítulo 2
+...
+Use apenas texto simples, sem formatação especial."""),
+
+    _fragment('titles_role', 1, """
+Você é um especialista avançado em YouTube SEO, com profundo conhecimento das melhores práticas da plataforma.
+
+ESPECIALIZAÇÃO EM TÍTULOS:
+
+Analise esta transcrição de vídeo e gere títulos otimizados."""),
+    _fragment('transcription', 1, """
+TRANSCRIÇÃO:
+{transcription_text}"""),
+    _fragment('titles_request', 1, """
+TIPOS DE TÍTULO SOLICITADOS: {requested_types}
+Gere um título para CADA UM dos tipos solicitados.
+
+Para cada tipo de título, forneça:
+- O TIPO DE TÍTULO como um cabeçalho (ex: ### Título Impactante)
+- Título sugerido
+- Justificativa (por que funciona)
+- Palavras-chave utilizadas"""),
+    _fragment('title_definitions', 1, """
+DEFINIÇÕES DOS TIPOS DE TÍTULO (Use estas definições para guiar a geração):
+{title_definitions}"""),
+    _fragment('titles_rules', 1, """
+IMPORTANTE:
+- Retorne APENAS os títulos organizados conforme solicitado
+- NÃO inclua explicações introdutórias como "Here are some suggestions" ou "Okay, I understand"
+- Vá direto ao conteúdo solicitado
+- Gere títulos seguindo exatamente os tipos solicitados EM {lang_name_upper}{shorts_rule}"""),
+
+    _fragment('description_role', 1, """
+Você é um especialista em SEO para YouTube, com domínio total das estratégias que maximizam o alcance, retenção e engajamento dos vídeos na plataforma.
+
+ESPECIALIZAÇÃO EM DESCRIÇÕES:
+
+Analise esta transcrição de vídeo e gere uma descrição otimizada."""),
+    _fragment('description_definitions', 1, """
+TIPO DE DESCRIÇÃO SOLICITADA: {description_type_upper}
+Use a definição abaixo para guiar a geração da descrição:
+
+DEFINIÇÕES DOS TIPOS DE DESCRIÇÃO:
+{description_definitions}"""),
+    _fragment('description_structure', 1, """
+ESTRUTURA OBRIGATÓRIA (exceto para tipo 'Hashtags'):
+- Resumo instigante (primeiras 2-3 linhas)
+- Desenvolvimento do tema conforme o tipo de descrição
+- Palavras-chave naturalmente inseridas
+- Call-to-action no final (se aplicável ao tipo)
+- Quebras de linha para escaneabilidade"""),
+    _fragment('description_rules', 1, """
+IMPORTANTE:
+- Retorne APENAS a descrição conforme solicitado
+- NÃO inclua explicações introdutórias ou comentários adicionais
+- Vá direto ao conteúdo da descrição
+- Gere a descrição EM {lang_name_upper}"""),
+
+    _fragment('chapters_role', 1, """
+Você é um especialista em estruturação de conteúdo para YouTube, especializado em criar capítulos (timestamps) que melhoram a experiência do usuário e o engajamento do vídeo."""),
+    _fragment('chapters_segments', 1, """
+Os limites dos capítulos já foram definidos. Para cada capítulo abaixo você recebe o timestamp de início, os termos-chave do trecho e as primeiras frases.
+
+CAPÍTULOS:
+{segments_text}"""),
+    _fragment('chapters_segments_rules', 1, """
+REGRAS:
+- Use EXATAMENTE os timestamps fornecidos, na mesma ordem, um capítulo por timestamp
+- Títulos curtos e objetivos para cada capítulo (máximo 5-6 palavras)
+- Evitar frases completas nos títulos dos capítulos
+
+IMPORTANTE:
+- Retorne APENAS a lista de capítulos no formato solicitado
+- NÃO inclua explicações introdutórias ou comentários adicionais
+- Gere os títulos EM {lang_name_upper}"""),
+    _fragment('chapters_transcription', 1, """
+ESPECIALIZAÇÃO EM CAPÍTULOS:
+
+Analise esta transcrição com timestamps e crie capítulos otimizados:
+
+TRANSCRIÇÃO COM TIMESTAMPS:
+{transcription_text}"""),
+    _fragment('chapters_full_rules', 1, """
+NÚMERO DE CAPÍTULOS SOLICITADO: {num_chapters}
+
+REGRAS:
+- Usar timestamps exatos da transcrição (formato 0:00, 1:34, 2:47)
+- Crie EXATAMENTE {num_chapters} capítulos. Se necessário, agrupe partes menores para formar blocos mais coesos ou divida blocos maiores.
+- Títulos curtos e objetivos para cada capítulo (máximo 5-6 palavras)
+- Evitar frases completas nos títulos dos capítulos
+- Facilitar navegação rápida e melhorar SEO interno
+
+IMPORTANTE:
+- Retorne APENAS a lista de capítulos no formato solicitado
+- NÃO inclua explicações introdutórias ou comentários adicionais
+- Vá direto aos capítulos
+- Gere os capítulos EM {lang_name_upper}, seguindo os timestamps existentes, com títulos curtos e objetivos"""),
+]}
+
+# Version 1 was the single f-string per method that always carried every type definition
+TEMPLATES = {template.name: template for template in [
+    PromptTemplate('titles', 2, (
+        'agents_header', 'language', 'format_titles', 'titles_role', 'transcription',
+        'titles_request', 'title_definitions', 'titles_rules',
+    )),
+    PromptTemplate('description', 2, (
+        'agents_header', 'language', 'format_description', 'description_role', 'transcription',
+        'description_definitions', 'description_structure', 'description_rules',
+    )),
+    PromptTemplate('chapters_segments', 2, (
+        'agents_header_segments', 'language_chapters', 'format_chapters', 'chapters_role',
+        'chapters_segments', 'chapters_segments_rules',
+    )),
+    PromptTemplate('chapters_full', 2, (
+        'agents_header', 'language_chapters', 'format_chapters', 'chapters_role',
+        'chapters_transcription', 'chapters_full_rules',
+    )),
+]}
+
+TITLE_TYPE_DEFINITIONS = {
+    'impactante': '(Objetivo: Usar emoção, intensidade e palavras fortes para gerar cliques.) Crie um título impactante com linguagem forte e que gere uma reação emocional no público. Use verbos no imperativo e palavras de alto impacto. Exemplo: 👉 Ele Destruiu Tudo em Apenas 5 Minutos!',
+    'analítico': '(Objetivo: Foca em dados, análises, comparações, ideal para vídeos informativos ou de opinião.) Gere um título com linguagem analítica, que sugira uma análise profunda ou comparação entre dados, fatos ou situações. Exemplo: 📊 Por Que Esse Time Está Caindo de Produção? Análise Completa',
+    'agressivo': '(Objetivo: Estilo direto, provocativo, ótimo para vídeos de opinião, crítica ou polêmica.) Crie um título agressivo com tom provocativo ou de confronto. Ideal para vídeos que geram debate ou indignação. Exemplo: 🔥 Esse Jogador NÃO PODE Mais Ser Titular!',
+    'nicho': '(Objetivo: Usa termos que só quem é do nicho entende, criando senso de pertencimento.) Crie um título usando expressões, termos técnicos ou memes específicos do nicho do vídeo. Público-alvo: pessoas que já conhecem o tema. Exemplo (futebol): ⚽ Esse Cara É o Novo "Camisa 10 Raiz"?',
+    'engajamento': '(Objetivo: Estimula comentários, opiniões e compartilhamentos.) Gere um título que convide o público a dar sua opinião, usar perguntas ou temas divisivos. Exemplo: 💬 Quem Foi o Melhor em Campo? Deixe Sua Opinião!',
+    'curiosidade': '(Objetivo: Deixa um mistério no ar, sem revelar o desfecho.) Crie um título que desperte curiosidade extrema, fazendo o público querer descobrir o que acontece. Evite entregar tudo no título. Exemplo: ❓ Você Não Vai Acreditar no Que Aconteceu no Final…',
+    'seo_classico': '(Objetivo: Focado em otimização, com palavra-chave + tema central.) Crie um título claro, direto, com as principais palavras-chave para ranqueamento no YouTube. Ideal para vídeos evergreen e didáticos. Exemplo: 🔍 Como Funciona o VAR no Futebol Brasileiro',
+    'storytelling': '(Objetivo: Introduz uma história ou uma jornada (ótimo para vlogs, bastidores, narrativas).) Crie um título que pareça o começo de uma história real, com início, conflito e expectativa de resolução. Exemplo: 📽️ Tudo Deu Errado no Meu Primeiro Dia no Novo Clube…',
+    'shorts': '(Objetivo: Títulos curtos, diretos, com punch inicial.) Gere um título com até 50 caracteres, estilo viral, para vídeos curtos do YouTube Shorts. Exemplo: ⚡ Ele Gritou Isso no Meio do Treino!',
+    'live_podcast': '(Objetivo: Com nomes + tema + tom de conversa.) Crie um título com o nome dos participantes + o assunto principal + tom convidativo para assistir uma conversa. Exemplo: 🎙️ Com fulano: Os Bastidores do Mercado da Bola',
+}
+
+# Description types offered by the frontend (value -> (label, definition))
+DESCRIPTION_TYPE_DEFINITIONS = {
+    'analitica': ('Analítica', '(Foco: Explicações, detalhes e argumentos.) Escreva uma descrição com tom analítico e informativo. Estruture os parágrafos com clareza, aprofunde nos temas discutidos no vídeo, destaque dados, análises ou conclusões. Ideal para vídeos de opinião, notícias, análises táticas, conteúdo educacional.'),
+    'curiosidade': ('Curiosidade (Gera Curiosidade)', '(Foco: Prender o público com perguntas e mistério.) Escreva uma descrição com foco em curiosidade. Faça perguntas ao leitor, insinue reviravoltas, crie expectativa sobre o conteúdo do vídeo sem entregar todos os detalhes. Utilize frases com mistério e mantenha o leitor intrigado.'),
+    'hashtags': ('Hashtags (Resumida e Focada em Hashtags)', '(Foco: SEO + uso forte de tags.) Gere uma descrição curta, direta e com alto volume de hashtags otimizadas para SEO. Inclua apenas uma introdução objetiva (1-2 linhas) sobre o tema, seguida de hashtags relevantes e estratégicas para posicionamento.'),
+    'topicos': ('Tópicos', '(Foco: Organização e escaneabilidade.) Escreva a descrição em formato de tópicos com marcadores claros (bullet points, emojis ou traços). Liste os assuntos principais tratados no vídeo e utilize palavras-chave em cada ponto. Ideal para vídeos com conteúdo diversificado ou didático.'),
+    'gatilhos': ('Gatilhos (Gatilhos de Curiosidade)', '(Foco: Emocional + incentivo ao clique.) Crie uma descrição com gatilhos mentais como "você vai se surpreender", "ninguém te contou isso", "não cometa esse erro" ou "o que ninguém esperava aconteceu". Use frases curtas e com ritmo acelerado, focando no lado emocional do espectador.'),
+    'engajamento': ('Engajamento (Focada em Engajamento)', '(Foco: Conversão e ações do público.) Escreva uma descrição persuasiva, com vários CTAs ao longo do texto. Peça explicitamente para o público curtir, se inscrever, ativar o sininho, comentar, compartilhar e salvar o vídeo. Pode incluir perguntas diretas ao público para estimular comentários.'),
+}
+
+
+def _fold(text: str) -> str:
+    normalized = unicodedata.normalize('NFKD', (text or '').lower().strip())
+    return ''.join(char for char in normalized if not unicodedata.combining(char))
+
+
+def title_definitions(title_types: Optional[Sequence[str]]) -> Tuple[str, str]:
+    """
+    Return (requested types label, definitions block) for the requested title types.
+    No selection means every type, as before.
+    """
+    if not title_types:
+        selected = list(TITLE_TYPES)
+        requested = "TODOS OS TIPOS ABAIXO"
+    else:
+        selected = list(dict.fromkeys(resolve_title_type(title_type) for title_type in title_types))
+        requested = ", ".join(title_types)
+    lines = [
+        f"- {TITLE_TYPES[slug]}: {TITLE_TYPE_DEFINITIONS[slug]}"
+        for slug in selected if slug in TITLE_TYPE_DEFINITIONS
+    ]
+    return requested, "\n".join(lines)
+
+
+def description_definitions(description_type: str) -> str:
+    """Definition of the requested description type (all of them if it is unknown)."""
+    selected = DESCRIPTION_TYPE_DEFINITIONS.get(_fold(description_type))
+    entries = [selected] if selected else list(DESCRIPTION_TYPE_DEFINITIONS.values())
+    return "\n".join(f"- {label}: {definition}" for label, definition in entries)
+
+
+def build_prompt(template_name: str, use_markdown: bool = False, **context) -> BuiltPrompt:
+    """
+    Render a registered template. `format_*` slots resolve to their markdown or
+    plain variant; every fragment is formatted with `context`.
+    """
+    template = TEMPLATES[template_name]
+    lang_name = context.get('lang_name', '')
+    lang_code = context.get('lang_code', '')
+    context.setdefault('lang_name_upper', lang_name.upper())
+    context.setdefault('lang_code_upper', lang_code.upper())
+
+    rendered, parts = [], []
+    for slot in template.fragments:
+        name = f"{slot}_{'markdown' if use_markdown else 'plain'}" if slot.startswith('format_') else slot
+        fragment = FRAGMENTS[name]
+        text = fragment.text.format(**context)
+        rendered.append(text)
+        parts.append((name, fragment.version, estimate_tokens(text)))
+
+    built = BuiltPrompt(template=template.name, version=template.version, text="\n\n".join(rendered), parts=parts)
+    overhead = built.total_tokens - sum(
+        tokens for name, _, tokens in parts if name in ('transcription', 'chapters_transcription', 'chapters_segments')
+    )
+    logger.info(f"[PROMPT] {built.version_tag}: ~{built.total_tokens} tokens (instruções ~{overhead})")
+    return built
@@ -0,0 +1,458 @@
+"""
+Provider routing for LLM calls.
+Tracks rolling latency and error rates per provider/model in this worker
+process, sends a hedged request to the next provider when the primary is slower
+than its recent p95, and skips providers whose circuit breaker is open.
+"""
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterator, List, Optional
+
+import numpy as np
+from django.conf import settings
+
+from your_social_media import metrics
+
+from .clients import GEMINI_MODEL_NAME, OPENAI_MODEL_NAME, get_gemini_model, get_openai_client
+
+logger = logging.getLogger(__name__)
+
+STATS_WINDOW = 50
+# Samples needed before the rolling p95 replaces the default hedge delay
+MIN_LATENCY_SAMPLES = 5
+HEDGE_PERCENTILE = 95
+# Error-rate trip: fraction of failures over the window, once enough calls were seen
+ERROR_RATE_THRESHOLD = 0.5
+MIN_ERROR_SAMPLES = 10
+
+
+class GenerationCancelled(Exception):
+    """Raised inside an attempt when another provider already answered."""
+
+
+class NoProviderAvailable(Exception):
+    """No provider is configured or every circuit breaker is open."""
+
+
+class RoutingFailed(Exception):
+    """Every attempt failed. Carries the primary's error and the per-attempt records."""
+
+    def __init__(self, error: Exception, calls):
+        super().__init__(*error.args)
+        self.error = error
+        self.calls = calls
+
+
+@dataclass
+class CallRecord:
+    """Accounting for one provider attempt (winning, failed or cancelled)."""
+    provider: str
+    model: str
+    status: str = 'success'
+    hedge: bool = False
+    latency_seconds: float = 0.0
+    ttft_seconds: Optional[float] = None
+    # Usage reported by the provider; None when it did not report any
+    prompt_tokens: Optional[int] = None
+    output_tokens: Optional[int] = None
+    cached_tokens: int = 0
+    error: Optional[str] = None
+    started_at: float = field(default_factory=time.monotonic, repr=False)
+
+
+@dataclass
+class RoutedResult:
+    text: str
+    provider: str
+    model: str
+    latency_seconds: float
+    ttft_seconds: Optional[float]
+    hedged: bool = False
+    calls: List[CallRecord] = field(default_factory=list)
+
+
+class ProviderStats:
+    """Rolling latency and outcome window for one provider/model."""
+
+    def __init__(self, window: int = STATS_WINDOW):
+        self._lock = threading.Lock()
+        self.latencies = deque(maxlen=window)
+        self.outcomes = deque(maxlen=window)
+
+    def record_success(self, latency_seconds: float) -> None:
+        with self._lock:
+            self.latencies.append(latency_seconds)
+            self.outcomes.append(True)
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.outcomes.append(False)
+
+    def percentile(self, q: float) -> Optional[float]:
+        with self._lock:
+            if len(self.latencies) < MIN_LATENCY_SAMPLES:
+                return None
+            return float(np.percentile(np.fromiter(self.latencies, dtype=np.float64), q))
+
+    def error_rate(self) -> Optional[float]:
+        with self._lock:
+            if len(self.outcomes) < MIN_ERROR_SAMPLES:
+                return None
+            return 1.0 - sum(self.outcomes) / len(self.outcomes)
+
+    def snapshot(self) -> Dict:
+        error_rate = self.error_rate()
+        return {
+            'samples': len(self.latencies),
+            'p50_seconds': self.percentile(50),
+            'p95_seconds': self.percentile(HEDGE_PERCENTILE),
+            'error_rate': round(error_rate, 3) if error_rate is not None else None,
+        }
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker.
+    After `failure_threshold` failures the circuit opens for `cooldown_seconds`;
+    then a single probe call is let through (half-open) to decide whether to close it.
+    """
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold: int, cooldown_seconds: float):
+        self.failure_threshold = failure_threshold
+        self.cooldown_seconds = cooldown_seconds
+        self._lock = threading.Lock()
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probe_in_flight = False
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.cooldown_seconds:
+                self.state = self.HALF_OPEN
+                self._probe_in_flight = False
+            if self.state == self.HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self._open()
+
+    def release_probe(self) -> None:
+        """The half-open probe ended without an outcome (cancelled or abandoned): allow another."""
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self._probe_in_flight = False
+
+    def trip(self) -> None:
+        with self._lock:
+            if self.state != self.OPEN:
+                self._open()
+
+    def _open(self) -> None:
+        self.state = self.OPEN
+        self.opened_at = time.monotonic()
+        self._probe_in_flight = False
+
+
+class GeminiProvider:
+    name = 'gemini'
+    model = GEMINI_MODEL_NAME
+
+    def is_configured(self) -> bool:
+        return get_gemini_model() is not None
+
+    def stream(self, prompt: str, record: CallRecord) -> Iterator[str]:
+        for chunk in get_gemini_model().generate_content(prompt, stream=True):
+            usage = getattr(chunk, 'usage_metadata', None)
+            if usage is not None and getattr(usage, 'prompt_token_count', None):
+                record.prompt_tokens = usage.prompt_token_count
+                record.output_tokens = getattr(usage, 'candidates_token_count', None)
+                record.cached_tokens = getattr(usage, 'cached_content_token_count', 0) or 0
+            text = chunk.text
+            if text:
+                yield text
+
+
+class OpenAIProvider:
+    name = 'openai'
+    model = OPENAI_MODEL_NAME
+
+    def is_configured(self) -> bool:
+        return get_openai_client() is not None
+
+    def stream(self, prompt: str, record: CallRecord) -> Iterator[str]:
+        response = get_openai_client().chat.completions.create(
+            model=self.model,
+            messages=[{'role': 'user', 'content': prompt}],
+            stream=True,
+            stream_options={'include_usage': True},
+        )
+        try:
+            for chunk in response:
+                usage = getattr(chunk, 'usage', None)
+                if usage is not None:
+                    record.prompt_tokens = usage.prompt_tokens
+                    record.output_tokens = usage.completion_tokens
+                    details = getattr(usage, 'prompt_tokens_details', None)
+                    record.cached_tokens = getattr(details, 'cached_tokens', 0) or 0
+                text = chunk.choices[0].delta.content if chunk.choices else None
+                if text:
+                    yield text
+        finally:
+            # Closing the HTTP stream is what actually cancels a losing attempt
+            response.close()
+
+
+class _Race:
+    """Shared state between the attempts of one routed call."""
+
+    def __init__(self, on_chunk: Optional[Callable[[str], None]]):
+        self.on_chunk = on_chunk
+        self.cancelled = threading.Event()
+        self._lock = threading.Lock()
+        self._stream_owner = None
+        # Output of every live attempt, in the order they started emitting
+        self._chunks: Dict[str, List[str]] = {}
+
+    def forward(self, attempt_key: str, text: str) -> None:
+        """Stream the chunks of one attempt at a time, the first to produce output."""
+        if not self.on_chunk:
+            return
+        with self._lock:
+            self._chunks.setdefault(attempt_key, []).append(text)
+            if self._stream_owner is None:
+                self._stream_owner = attempt_key
+            if self._stream_owner == attempt_key:
+                self.on_chunk(text)
+
+    def abandon(self, attempt_key: str) -> None:
+        """An attempt failed or lost: hand the stream to the next attempt with output."""
+        if not self.on_chunk:
+            return
+        with self._lock:
+            self._chunks.pop(attempt_key, None)
+            if self._stream_owner != attempt_key:
+                return
+            self._stream_owner = None
+            successor = next(iter(self._chunks), None)
+            self._restart(successor, self._chunks.get(successor, []))
+
+    def settle(self, attempt_key: str, text: str) -> None:
+        """The attempt won: make sure the stream ends with its answer."""
+        if not self.on_chunk:
+            return
+        with self._lock:
+            if self._stream_owner != attempt_key:
+                self._restart(attempt_key, [text])
+
+    def _restart(self, attempt_key: Optional[str], chunks: List[str]) -> None:
+        # Callers hold the lock. Callbacks with a restart() (e.g. PartStream) drop the old output.
+        restart = getattr(self.on_chunk, 'restart', None)
+        if restart:
+            restart()
+        self._stream_owner = attempt_key
+        for text in chunks:
+            self.on_chunk(text)
+
+
+class LLMRouter:
+    """Route a prompt to the configured providers, primary first."""
+
+    def __init__(self, providers=None):
+        self.providers = providers or [GeminiProvider(), OpenAIProvider()]
+        self.hedging_enabled = settings.LLM_HEDGING_ENABLED
+        self.stats = {self._key(p): ProviderStats() for p in self.providers}
+        self.breakers = {
+            self._key(p): CircuitBreaker(settings.LLM_CIRCUIT_FAILURE_THRESHOLD, settings.LLM_CIRCUIT_COOLDOWN_SECONDS)
+            for p in self.providers
+        }
+
+    @staticmethod
+    def _key(provider) -> str:
+        return f"{provider.name}:{provider.model}"
+
+    def has_providers(self) -> bool:
+        return any(provider.is_configured() for provider in self.providers)
+
+    def hedge_delay(self, provider) -> float:
+        """Seconds to wait on `provider` before hedging: its rolling p95, clamped."""
+        p95 = self.stats[self._key(provider)].percentile(HEDGE_PERCENTILE)
+        if p95 is None:
+            return settings.LLM_HEDGE_DEFAULT_DELAY_SECONDS
+        return min(max(p95, settings.LLM_HEDGE_MIN_DELAY_SECONDS), settings.LLM_HEDGE_MAX_DELAY_SECONDS)
+
+    def _run_attempt(self, provider, prompt: str, race: _Race, record: CallRecord) -> str:
+        started = record.started_at
+        chunks = []
+        with metrics.external_call(provider.name, 'generate') as call:
+            stream = provider.stream(prompt, record)
+            try:
+                for text in stream:
+                    if race.cancelled.is_set():
+                        call.status = 'cancelled'
+                        raise GenerationCancelled()
+                    if record.ttft_seconds is None:
+                        record.ttft_seconds = time.monotonic() - started
+                    chunks.append(text)
+                    race.forward(self._key(provider), text)
+            finally:
+                stream.close()
+                if record.status != 'cancelled':
+                    record.latency_seconds = time.monotonic() - started
+        return ''.join(chunks)
+
+    def _record_failure(self, provider, error: Exception) -> None:
+        key = self._key(provider)
+        stats, breaker = self.stats[key], self.breakers[key]
+        stats.record_failure()
+        breaker.record_failure()
+        error_rate = stats.error_rate()
+        if error_rate is not None and error_rate >= ERROR_RATE_THRESHOLD:
+            breaker.trip()
+        if breaker.state == CircuitBreaker.OPEN:
+            logger.warning(f"[LLM ROUTER] Circuito aberto para {key} (falhas seguidas: {breaker.failures}, taxa de erro: {error_rate})")
+        logger.error(f"[LLM ROUTER] ❌ Falha em {key}: {error}")
+
+    def generate(self, prompt: str, on_chunk: Optional[Callable[[str], None]] = None) -> RoutedResult:
+        """
+        Generate with the primary provider, hedging with the next one once the
+        primary exceeds its hedge delay and falling back to it on failure.
+        The first non-empty answer wins; the other attempt is cancelled.
+        on_chunk receives the output of one attempt at a time; when that attempt
+        fails or loses, its restart() (if any) is called and the stream switches
+        to the winner.
+        Raises RoutingFailed (with the primary's error args) if every attempt fails.
+        """
+        queue = [provider for provider in self.providers if provider.is_configured()]
+        race = _Race(on_chunk)
+        pending = {}
+        calls: List[CallRecord] = []
+        errors: List[Exception] = []
+        hedged = False
+
+        executor = ThreadPoolExecutor(max_workers=max(len(queue), 1), thread_name_prefix='llm-route')
+
+        def launch_next():
+            while queue:
+                provider = queue.pop(0)
+                if not self.breakers[self._key(provider)].allow():
+                    logger.warning(f"[LLM ROUTER] Circuito aberto, pulando {self._key(provider)}")
+                    continue
+                record = CallRecord(provider=provider.name, model=provider.model, hedge=bool(pending))
+                calls.append(record)
+                pending[executor.submit(self._run_attempt, provider, prompt, race, record)] = (provider, record)
+                return provider
+            return None
+
+        try:
+            primary = launch_next()
+            if primary is None:
+                raise NoProviderAvailable("Nenhum provedor de IA disponível (não configurado ou com circuito aberto).")
+            hedge_at = time.monotonic() + self.hedge_delay(primary) if self.hedging_enabled and queue else None
+
+            while pending:
+                timeout = None if hedge_at is None else max(0.0, hedge_at - time.monotonic())
+                done, _ = wait(list(pending), timeout=timeout, return_when=FIRST_COMPLETED)
+                if not done:
+                    hedge_at = None
+                    hedge = launch_next()
+                    if hedge:
+                        hedged = True
+                        logger.info(f"[LLM ROUTER] {self._key(primary)} acima do p95, enviando requisição hedge para {self._key(hedge)}")
+                    continue
+
+                for future in done:
+                    provider, record = pending.pop(future)
+                    try:
+                        text = future.result()
+                        if not text.strip():
+                            raise ValueError(f"Resposta vazia de {provider.name}")
+                    except GenerationCancelled:
+                        record.status = 'cancelled'
+                        race.abandon(self._key(provider))
+                        self.breakers[self._key(provider)].release_probe()
+                        continue
+                    except Exception as e:
+                        record.status = 'error'
+                        record.error = str(e)[:500]
+                        self._record_failure(provider, e)
+                        race.abandon(self._key(provider))
+                        errors.append(e)
+                        continue
+
+                    key = self._key(provider)
+                    race.settle(key, text)
+                    self.stats[key].record_success(record.latency_seconds)
+                    self.breakers[key].record_success()
+                    race.cancelled.set()
+                    for _, other in pending.values():
+                        # The loser keeps running until its next chunk; account for it as cancelled now
+                        other.status = 'cancelled'
+                        other.latency_seconds = time.monotonic() - other.started_at
+                    logger.info(f"[LLM ROUTER] ✅ {key} respondeu em {record.latency_seconds:.2f}s (TTFT {record.ttft_seconds or 0:.2f}s, hedge: {hedged})")
+                    return RoutedResult(
+                        text=text,
+                        provider=provider.name,
+                        model=provider.model,
+                        latency_seconds=record.latency_seconds,
+                        ttft_seconds=record.ttft_seconds,
+                        hedged=hedged,
+                        calls=calls,
+                    )
+
+                if not pending:
+                    # Every attempt so far failed: fall back to the next provider immediately
+                    hedge_at = None
+                    if launch_next():
+                        logger.info("[LLM ROUTER] Usando provedor de fallback após falha")
+        finally:
+            race.cancelled.set()
+            executor.shutdown(wait=False, cancel_futures=True)
+            # Attempts still running never report success or failure to their breaker
+            for provider, _ in pending.values():
+                self.breakers[self._key(provider)].release_probe()
+
+        if errors:
+            raise RoutingFailed(errors[0], calls)
+        raise NoProviderAvailable("Nenhum provedor de IA disponível (não configurado ou com circuito aberto).")
+
+    def snapshot(self) -> Dict:
+        """Rolling stats and circuit state per provider/model."""
+        return {
+            key: dict(self.stats[key].snapshot(), circuit=self.breakers[key].state)
+            for key in self.stats
+        }
+
+
+_router = None
+_router_lock = threading.Lock()
+
+
+def get_router() -> LLMRouter:
+    """Return the process-wide router (stats are kept per worker process)."""
+    global _router
+    if _router is None:
+        with _router_lock:
+            if _router is None:
+                _router = LLMRouter()
+    return _router
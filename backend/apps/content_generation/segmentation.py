@@ -0,0 +1,169 @@
+"""
+Local topic segmentation for chapter generation (TextTiling-style).
+Proposes chapter boundaries from a timestamped transcript using TF-IDF block
+vectors and a cosine-similarity valley search, so only short excerpts around
+each boundary need to be sent to the LLM for naming.
+"""
+import re
+import logging
+from dataclasses import dataclass, field
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from apps.transcriptions.language import STOPWORDS
+from .parsers import timestamp_to_seconds
+
+logger = logging.getLogger(__name__)
+
+_LINE_RE = re.compile(r'^\s*(\d{1,2}:\d{2}(?::\d{2})?)\s+(.*\S)\s*$')
+_TOKEN_RE = re.compile(r"[^\W\d_]{3,}", flags=re.UNICODE)
+_STOPWORD_SET = frozenset(' '.join(STOPWORDS.values()).split())
+
+# Pseudo-sentence (block) size in words and number of blocks compared on each side of a gap
+BLOCK_WORDS = 40
+WINDOW_BLOCKS = 3
+# Minimum lines of transcript needed for segmentation to be meaningful
+MIN_TRANSCRIPT_LINES = 20
+EXCERPT_WORDS = 45
+KEY_TERMS = 5
+
+
+@dataclass
+class TranscriptLine:
+    seconds: int
+    timestamp: str
+    text: str
+
+
+@dataclass
+class TopicSegment:
+    start_seconds: int
+    timestamp: str
+    excerpt: str
+    key_terms: List[str] = field(default_factory=list)
+
+
+def parse_transcript_lines(transcription_text: Optional[str]) -> List[TranscriptLine]:
+    """Split a 'MM:SS text' transcript into timestamped lines."""
+    lines = []
+    for raw_line in (transcription_text or '').splitlines():
+        match = _LINE_RE.match(raw_line)
+        if match:
+            seconds = timestamp_to_seconds(match.group(1))
+            if seconds is not None:
+                lines.append(TranscriptLine(seconds, match.group(1), match.group(2)))
+    return lines
+
+
+def _tokenize(text: str) -> List[str]:
+    return [token for token in _TOKEN_RE.findall(text.lower()) if token not in _STOPWORD_SET]
+
+
+def _build_blocks(lines: List[TranscriptLine]) -> List[Tuple[int, List[str]]]:
+    """Group consecutive lines into blocks of roughly BLOCK_WORDS tokens: (first line index, tokens)."""
+    blocks = []
+    start, tokens = 0, []
+    for index, line in enumerate(lines):
+        if not tokens:
+            start = index
+        tokens.extend(_tokenize(line.text))
+        if len(tokens) >= BLOCK_WORDS:
+            blocks.append((start, tokens))
+            tokens = []
+    if tokens:
+        blocks.append((start, tokens))
+    return blocks
+
+
+def _tfidf_matrix(blocks: List[List[str]]) -> Tuple[np.ndarray, List[str]]:
+    """Return the L2-normalised TF-IDF matrix (blocks x vocabulary) and the vocabulary."""
+    vocabulary = {}
+    rows, cols = [], []
+    for row, tokens in enumerate(blocks):
+        for token in tokens:
+            rows.append(row)
+            cols.append(vocabulary.setdefault(token, len(vocabulary)))
+
+    counts = np.zeros((len(blocks), len(vocabulary)), dtype=np.float64)
+    np.add.at(counts, (np.array(rows, dtype=np.int64), np.array(cols, dtype=np.int64)), 1.0)
+
+    document_frequency = np.count_nonzero(counts, axis=0)
+    idf = np.log((1 + len(blocks)) / (1 + document_frequency)) + 1.0
+    tfidf = counts * idf
+    norms = np.linalg.norm(tfidf, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    terms = [None] * len(vocabulary)
+    for token, index in vocabulary.items():
+        terms[index] = token
+    return tfidf / norms, terms
+
+
+def _gap_similarities(matrix: np.ndarray, window: int) -> np.ndarray:
+    """Cosine similarity between the `window` blocks before and after each gap."""
+    cumulative = np.vstack([np.zeros((1, matrix.shape[1])), np.cumsum(matrix, axis=0)])
+    gaps = np.arange(1, matrix.shape[0])
+    left = cumulative[gaps] - cumulative[np.maximum(gaps - window, 0)]
+    right = cumulative[np.minimum(gaps + window, matrix.shape[0])] - cumulative[gaps]
+    numerator = np.einsum('ij,ij->i', left, right)
+    denominator = np.linalg.norm(left, axis=1) * np.linalg.norm(right, axis=1)
+    denominator[denominator == 0] = 1.0
+    return numerator / denominator
+
+
+def _depth_scores(similarities: np.ndarray) -> np.ndarray:
+    """TextTiling depth: how far each gap sits below the nearest peaks on both sides."""
+    left_peaks = np.maximum.accumulate(similarities)
+    right_peaks = np.maximum.accumulate(similarities[::-1])[::-1]
+    return (left_peaks - similarities) + (right_peaks - similarities)
+
+
+def _pick_boundaries(depths: np.ndarray, count: int, min_spacing: int) -> List[int]:
+    """Pick up to `count` deepest gaps that are at least `min_spacing` blocks apart."""
+    chosen = []
+    for gap in np.argsort(depths)[::-1]:
+        if len(chosen) >= count:
+            break
+        # Gap g separates block g from g + 1; keep the first block for the opening chapter
+        if gap + 1 < min_spacing or any(abs(int(gap) - other) < min_spacing for other in chosen):
+            continue
+        chosen.append(int(gap))
+    return sorted(chosen)
+
+
+def segment_transcript(transcription_text: Optional[str], num_chapters: int) -> List[TopicSegment]:
+    """
+    Propose `num_chapters` topic segments for a timestamped transcript.
+    Returns an empty list when the transcript has no timestamps or is too short,
+    in which case callers should fall back to sending the full transcript.
+    """
+    lines = parse_transcript_lines(transcription_text)
+    if num_chapters < 1 or len(lines) < MIN_TRANSCRIPT_LINES:
+        return []
+
+    blocks = _build_blocks(lines)
+    if len(blocks) < max(num_chapters, 2 * WINDOW_BLOCKS):
+        return []
+
+    matrix, terms = _tfidf_matrix([tokens for _, tokens in blocks])
+    similarities = _gap_similarities(matrix, WINDOW_BLOCKS)
+    min_spacing = max(1, len(blocks) // (num_chapters * 2))
+    boundaries = _pick_boundaries(_depth_scores(similarities), num_chapters - 1, min_spacing)
+
+    starts = [0] + [gap + 1 for gap in boundaries]
+    ends = starts[1:] + [len(blocks)]
+    segments = []
+    for chapter_index, (first_block, end_block) in enumerate(zip(starts, ends)):
+        first_line = blocks[first_block][0]
+        excerpt_words = ' '.join(line.text for line in lines[first_line:first_line + 10]).split()
+        segment_scores = matrix[first_block:end_block].sum(axis=0)
+        top_terms = [terms[index] for index in np.argsort(segment_scores)[::-1][:KEY_TERMS] if segment_scores[index] > 0]
+        segments.append(TopicSegment(
+            start_seconds=0 if chapter_index == 0 else lines[first_line].seconds,
+            timestamp='00:00' if chapter_index == 0 else lines[first_line].timestamp,
+            excerpt=' '.join(excerpt_words[:EXCERPT_WORDS]),
+            key_terms=top_terms,
+        ))
+
+    logger.info(f"[SEGMENTAÇÃO] {len(lines)} linhas, {len(blocks)} blocos, {len(segments)} segmentos propostos")
+    return segments
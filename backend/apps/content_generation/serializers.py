@@ -1,11 +1,52 @@
 """
 Serializers for content generation functionality.
 """
+from django.conf import settings
 from rest_framework import serializers
-from .models import ContentGeneration, GeneratedTitle, GeneratedChapter
+from .models import ContentGeneration, ContentGenerationBatch, GeneratedTitle, GeneratedChapter, GeneratedPart
+from .streaming import ContentStreamBuffer
 from apps.transcriptions.models import Transcription
 
 
+def apply_content_type_defaults(data):
+    """Fill in default options for the requested content type."""
+    content_type = data.get('content_type')
+    
+    if content_type == 'titles':
+        if not data.get('title_types'):
+            data['title_types'] = ['clickbait', 'seo', 'descritivo']
+    
+    elif content_type == 'description':
+        if not data.get('description_type'):
+            data['description_type'] = 'analítica'
+    
+    elif content_type == 'chapters':
+        if not data.get('max_chapters'):
+            data['max_chapters'] = 6
+    
+    return data
+
+
+class ContentPackageOptionsSerializer(serializers.ModelSerializer):
+    """Serializer for content package options requested together with a transcription."""
+    
+    class Meta:
+        model = ContentGeneration
+        fields = [
+            'content_type', 'use_markdown',
+            'title_types', 'description_type', 'max_chapters'
+        ]
+        extra_kwargs = {
+            'title_types': {'required': False},
+            'description_type': {'required': False},
+            'max_chapters': {'required': False},
+        }
+    
+    def validate(self, data):
+        """Validate content package options."""
+        return apply_content_type_defaults(data)
+
+
 class ContentGenerationCreateSerializer(serializers.ModelSerializer):
     """Serializer for creating content generation requests."""
     
@@ -37,21 +78,7 @@ class ContentGenerationCreateSerializer(serializers.ModelSerializer):
     
     def validate(self, data):
         """Validate content generation data."""
-        content_type = data.get('content_type')
-        
-        if content_type == 'titles':
-            if not data.get('title_types'):
-                data['title_types'] = ['clickbait', 'seo', 'descritivo']
-        
-        elif content_type == 'description':
-            if not data.get('description_type'):
-                data['description_type'] = 'analítica'
-        
-        elif content_type == 'chapters':
-            if not data.get('max_chapters'):
-                data['max_chapters'] = 6
-        
-        return data
+        return apply_content_type_defaults(data)
     
     def create(self, validated_data):
         """Create content generation with transcription."""
@@ -68,6 +95,110 @@ class ContentGenerationCreateSerializer(serializers.ModelSerializer):
         return super().create(validated_data)
 
 
+class ContentGenerationBatchCreateSerializer(serializers.ModelSerializer):
+    """Serializer for creating content generations for many transcriptions at once."""
+    
+    transcription_ids = serializers.ListField(
+        child=serializers.UUIDField(), allow_empty=False, write_only=True
+    )
+    
+    class Meta:
+        model = ContentGeneration
+        fields = [
+            'transcription_ids', 'content_type', 'use_markdown',
+            'title_types', 'description_type', 'max_chapters'
+        ]
+        extra_kwargs = {
+            'title_types': {'required': False},
+            'description_type': {'required': False},
+            'max_chapters': {'required': False},
+        }
+    
+    def validate_transcription_ids(self, value):
+        """Validate all transcriptions exist and are completed, in a single query."""
+        max_size = settings.CONTENT_GENERATION_BATCH_MAX_SIZE
+        unique_ids = list(dict.fromkeys(value))
+        if len(unique_ids) > max_size:
+            raise serializers.ValidationError(
+                f"Máximo de {max_size} transcrições por lote"
+            )
+        
+        statuses = dict(
+            Transcription.objects.filter(id__in=unique_ids).values_list('id', 'status')
+        )
+        missing = [str(transcription_id) for transcription_id in unique_ids if transcription_id not in statuses]
+        if missing:
+            raise serializers.ValidationError(
+                f"Transcrições não encontradas: {', '.join(missing)}"
+            )
+        not_completed = [str(transcription_id) for transcription_id, status in statuses.items() if status != 'completed']
+        if not_completed:
+            raise serializers.ValidationError(
+                f"As transcrições devem estar concluídas para gerar conteúdo: {', '.join(not_completed)}"
+            )
+        return unique_ids
+    
+    def validate(self, data):
+        """Validate content generation options shared by the whole batch."""
+        return apply_content_type_defaults(data)
+    
+    def create(self, validated_data):
+        """Create the batch and all its content generations with one bulk insert."""
+        transcription_ids = validated_data.pop('transcription_ids')
+        
+        request_user = self.context['request'].user
+        user = request_user if request_user.is_authenticated else None
+        
+        batch = ContentGenerationBatch.objects.create(user=user, total=len(transcription_ids))
+        ContentGeneration.objects.bulk_create([
+            ContentGeneration(
+                user=user,
+                batch=batch,
+                transcription_id=transcription_id,
+                **validated_data
+            )
+            for transcription_id in transcription_ids
+        ])
+        return batch
+
+
+class ContentGenerationBatchSerializer(serializers.ModelSerializer):
+    """Serializer for batch progress with aggregate status counts."""
+    
+    progress = serializers.SerializerMethodField()
+    items = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = ContentGenerationBatch
+        fields = ['id', 'total', 'created_at', 'progress', 'items']
+    
+    def _items(self, obj):
+        if not hasattr(obj, '_progress_items'):
+            obj._progress_items = list(
+                obj.content_generations.order_by('created_at').values(
+                    'id', 'transcription_id', 'status', 'completed_at'
+                )
+            )
+        return obj._progress_items
+    
+    def get_progress(self, obj):
+        """Aggregate progress of the batch."""
+        counts = {status: 0 for status, _ in ContentGeneration.STATUS_CHOICES}
+        for item in self._items(obj):
+            counts[item['status']] += 1
+        finished = counts['completed'] + counts['failed']
+        return {
+            **counts,
+            'finished': finished,
+            'percent': round(100 * finished / obj.total, 1) if obj.total else 100.0,
+            'is_finished': finished >= obj.total,
+        }
+    
+    def get_items(self, obj):
+        """Compact per-item status list."""
+        return self._items(obj)
+
+
 class GeneratedTitleSerializer(serializers.ModelSerializer):
     """Serializer for generated titles."""
     
@@ -84,12 +215,22 @@ class GeneratedChapterSerializer(serializers.ModelSerializer):
         fields = ['chapter_number', 'timestamp', 'title', 'description']
 
 
+class GeneratedPartSerializer(serializers.ModelSerializer):
+    """Serializer for the outcome of each generated part."""
+    
+    class Meta:
+        model = GeneratedPart
+        fields = ['part', 'status', 'content', 'error_message', 'prompt_version', 'prompt_tokens', 'updated_at']
+
+
 class ContentGenerationDetailSerializer(serializers.ModelSerializer):
     """Serializer for content generation details."""
     
     titles = GeneratedTitleSerializer(many=True, read_only=True)
     chapters = GeneratedChapterSerializer(many=True, read_only=True)
+    parts = GeneratedPartSerializer(many=True, read_only=True)
     user_email = serializers.SerializerMethodField()
+    partial_content = serializers.SerializerMethodField()
     transcription_title = serializers.CharField(source='transcription.title', read_only=True)
     transcription_filename = serializers.CharField(source='transcription.original_filename', read_only=True)
     
@@ -99,19 +240,36 @@ class ContentGenerationDetailSerializer(serializers.ModelSerializer):
             'id', 'user_email', 'transcription_title', 'transcription_filename',
             'content_type', 'use_markdown', 'title_types', 'description_type',
             'max_chapters', 'status', 'language_detected', 'generated_content',
-            'error_message', 'created_at', 'updated_at', 'completed_at',
-            'titles', 'chapters'
+            'partial_content', 'error_message', 'created_at', 'updated_at', 'completed_at',
+            'duplicate_of', 'titles', 'chapters', 'parts'
         ]
         read_only_fields = [
             'id', 'user_email', 'transcription_title', 'transcription_filename',
             'status', 'language_detected', 'generated_content', 'error_message',
-            'created_at', 'updated_at', 'completed_at'
+            'created_at', 'updated_at', 'completed_at', 'duplicate_of'
         ]
 
     def get_user_email(self, obj):
         """Get user email or return 'Anônimo' if no user."""
         return obj.user.email if obj.user else 'Anônimo'
 
+    def get_partial_content(self, obj):
+        """Output streamed so far while processing, so pollers need no second request."""
+        if obj.status != 'processing':
+            return None
+        try:
+            return ContentStreamBuffer(obj.id).partial_text() or None
+        except Exception:
+            return None
+
+
+# Columns read by ContentGenerationListSerializer (with the transcription joined);
+# list querysets load only these so generated content is not fetched for list pages
+CONTENT_GENERATION_LIST_COLUMNS = (
+    'id', 'content_type', 'status', 'language_detected', 'created_at', 'completed_at',
+    'transcription', 'transcription__title', 'transcription__original_filename',
+)
+
 
 class ContentGenerationListSerializer(serializers.ModelSerializer):
     """Serializer for content generation list."""
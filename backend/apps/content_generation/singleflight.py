@@ -0,0 +1,172 @@
+"""
+Single-flight de-duplication for identical content generations.
+The first ContentGeneration for a (transcription, options) fingerprint becomes
+the leader and calls the providers. Identical requests that arrive while it runs
+attach to it (duplicate_of) and get its result copied when it finishes.
+"""
+import hashlib
+import json
+import logging
+from typing import List, Optional
+
+from django.db import transaction
+
+from your_social_media.redis_client import get_redis
+from .models import ContentGeneration, GeneratedChapter, GeneratedPart, GeneratedTitle
+
+logger = logging.getLogger(__name__)
+
+SINGLEFLIGHT_TTL_SECONDS = 30 * 60
+IN_FLIGHT_STATUSES = ('pending', 'processing')
+
+
+def options_fingerprint(content_generation: ContentGeneration) -> str:
+    """Hash of everything that determines the generated output."""
+    options = {
+        'transcription': str(content_generation.transcription_id),
+        'content_type': content_generation.content_type,
+        'use_markdown': content_generation.use_markdown,
+        'title_types': sorted(content_generation.title_types or []),
+        'description_type': content_generation.description_type,
+        'max_chapters': content_generation.max_chapters,
+    }
+    return hashlib.sha256(json.dumps(options, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+class ContentSingleFlight:
+    """Leader election for one ContentGeneration's fingerprint."""
+
+    def __init__(self, content_generation: ContentGeneration):
+        self.content_generation = content_generation
+        self.key = f"content_singleflight:{options_fingerprint(content_generation)}"
+
+    def acquire(self) -> Optional[ContentGeneration]:
+        """
+        Try to become the leader. Returns None when this generation should run
+        itself, or the in-flight (or just completed) leader to attach to.
+        Redis errors fail open: the generation simply runs.
+        """
+        own_id = str(self.content_generation.id)
+        try:
+            redis_client = get_redis()
+            if redis_client.set(self.key, own_id, nx=True, ex=SINGLEFLIGHT_TTL_SECONDS):
+                return None
+            leader_id = redis_client.get(self.key)
+        except Exception as e:
+            logger.warning(f"[SINGLE-FLIGHT] Redis indisponível, processando {own_id} sem deduplicação: {e}")
+            return None
+
+        if leader_id in (None, own_id):
+            return None
+        leader = ContentGeneration.objects.filter(id=leader_id).exclude(status='failed').first()
+        if leader is None:
+            # Stale key: the leader failed or was deleted, so take over
+            try:
+                get_redis().set(self.key, own_id, ex=SINGLEFLIGHT_TTL_SECONDS)
+            except Exception as e:
+                logger.warning(f"[SINGLE-FLIGHT] Falha ao assumir liderança de {self.key}: {e}")
+            return None
+        return leader
+
+    def attach(self, leader: ContentGeneration) -> List[str]:
+        """
+        Attach this generation to the leader. If the leader already finished,
+        resolve immediately. Returns follower IDs that must be re-enqueued.
+        """
+        follower = self.content_generation
+        follower.duplicate_of = leader
+        follower.status = 'processing'
+        follower.save(update_fields=['duplicate_of', 'status', 'updated_at'])
+        logger.info(f"[SINGLE-FLIGHT] {follower.id} anexada à geração em andamento {leader.id}")
+
+        # The leader may have finished between acquire() and the save above
+        leader.refresh_from_db(fields=['status'])
+        if leader.status in IN_FLIGHT_STATUSES:
+            return []
+        return resolve_followers(leader)
+
+    def release(self) -> None:
+        """Drop the leader key if this generation still holds it."""
+        try:
+            redis_client = get_redis()
+            if redis_client.get(self.key) == str(self.content_generation.id):
+                redis_client.delete(self.key)
+        except Exception as e:
+            logger.warning(f"[SINGLE-FLIGHT] Falha ao liberar {self.key}: {e}")
+
+
+def mirror_result(leader: ContentGeneration, follower_id) -> bool:
+    """Copy a completed leader's output onto a waiting follower (idempotent)."""
+    with transaction.atomic():
+        follower = (
+            ContentGeneration.objects.select_for_update()
+            .filter(id=follower_id, status__in=IN_FLIGHT_STATUSES)
+            .first()
+        )
+        if follower is None:
+            return False
+        follower.status = leader.status
+        follower.generated_content = leader.generated_content
+        follower.language_detected = leader.language_detected
+        follower.error_message = leader.error_message
+        follower.completed_at = leader.completed_at
+        follower.save()
+        follower.titles.all().delete()
+        follower.chapters.all().delete()
+        follower.parts.all().delete()
+        GeneratedTitle.objects.bulk_create([
+            GeneratedTitle(
+                content_generation=follower,
+                title_type=title.title_type,
+                title_text=title.title_text,
+                justification=title.justification,
+                keywords=title.keywords,
+            )
+            for title in leader.titles.all()
+        ])
+        GeneratedChapter.objects.bulk_create([
+            GeneratedChapter(
+                content_generation=follower,
+                chapter_number=chapter.chapter_number,
+                timestamp=chapter.timestamp,
+                title=chapter.title,
+                description=chapter.description,
+            )
+            for chapter in leader.chapters.all()
+        ])
+        GeneratedPart.objects.bulk_create([
+            GeneratedPart(
+                content_generation=follower,
+                part=part.part,
+                status=part.status,
+                content=part.content,
+                error_message=part.error_message,
+                prompt_version=part.prompt_version,
+                prompt_tokens=part.prompt_tokens,
+            )
+            for part in leader.parts.all()
+        ])
+    return True
+
+
+def resolve_followers(leader: ContentGeneration) -> List[str]:
+    """
+    Settle every follower of a finished leader. Completed results are mirrored;
+    after a failure the followers are detached and returned so the caller can
+    re-enqueue them (one of them becomes the new leader).
+    """
+    leader.refresh_from_db()
+    follower_ids = list(
+        ContentGeneration.objects.filter(duplicate_of=leader, status__in=IN_FLIGHT_STATUSES).values_list('id', flat=True)
+    )
+    if not follower_ids:
+        return []
+
+    if leader.status == 'completed':
+        mirrored = sum(mirror_result(leader, follower_id) for follower_id in follower_ids)
+        logger.info(f"[SINGLE-FLIGHT] Resultado de {leader.id} reaproveitado em {mirrored} geração(ões) duplicada(s)")
+        return []
+
+    ContentGeneration.objects.filter(id__in=follower_ids).update(duplicate_of=None, status='pending')
+    logger.warning(f"[SINGLE-FLIGHT] Líder {leader.id} falhou; reenfileirando {len(follower_ids)} geração(ões) duplicada(s)")
+    return [str(follower_id) for follower_id in follower_ids]
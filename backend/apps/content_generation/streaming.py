@@ -0,0 +1,94 @@
+"""
+Redis buffer for streamed content generation output.
+Chunks are appended per part (titles, description, chapters) as Gemini produces
+them; clients read the snapshot (partial_content of the detail/status response)
+while they poll. The final text is only written to
+ContentGeneration.generated_content when the whole package is done.
+"""
+import logging
+from typing import Dict
+
+from your_social_media.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+STREAM_TTL_SECONDS = 15 * 60
+
+
+class ContentStreamBuffer:
+    """Incremental output buffer for one ContentGeneration."""
+
+    def __init__(self, content_generation_id):
+        self.prefix = f"content_stream:{content_generation_id}"
+
+    def reset(self) -> None:
+        """Clear any previous output (e.g. from an earlier attempt)."""
+        try:
+            redis_client = get_redis()
+            parts = redis_client.lrange(f"{self.prefix}:parts", 0, -1)
+            keys = [f"{self.prefix}:part:{part}" for part in parts]
+            redis_client.delete(f"{self.prefix}:parts", f"{self.prefix}:status", *keys)
+        except Exception as e:
+            logger.warning(f"[STREAM] Falha ao limpar buffer {self.prefix}: {e}")
+
+    def start_part(self, part: str) -> None:
+        try:
+            pipe = get_redis().pipeline()
+            pipe.rpush(f"{self.prefix}:parts", part)
+            pipe.set(f"{self.prefix}:part:{part}", '', ex=STREAM_TTL_SECONDS)
+            pipe.set(f"{self.prefix}:status", 'streaming', ex=STREAM_TTL_SECONDS)
+            pipe.expire(f"{self.prefix}:parts", STREAM_TTL_SECONDS)
+            pipe.execute()
+        except Exception as e:
+            logger.warning(f"[STREAM] Falha ao iniciar parte '{part}' em {self.prefix}: {e}")
+
+    def restart_part(self, part: str) -> None:
+        """Discard what was streamed for a part (its output switches to another provider)."""
+        try:
+            get_redis().set(f"{self.prefix}:part:{part}", '', ex=STREAM_TTL_SECONDS)
+        except Exception as e:
+            logger.warning(f"[STREAM] Falha ao reiniciar parte '{part}' em {self.prefix}: {e}")
+
+    def append(self, part: str, chunk: str) -> None:
+        """Append a chunk to a part."""
+        try:
+            get_redis().append(f"{self.prefix}:part:{part}", chunk)
+        except Exception as e:
+            logger.warning(f"[STREAM] Falha ao anexar chunk em {self.prefix}: {e}")
+
+    def finish(self, status: str) -> None:
+        try:
+            get_redis().set(f"{self.prefix}:status", status, ex=STREAM_TTL_SECONDS)
+        except Exception as e:
+            logger.warning(f"[STREAM] Falha ao finalizar buffer {self.prefix}: {e}")
+
+    def snapshot(self) -> Dict:
+        """Return the partial output accumulated so far."""
+        redis_client = get_redis()
+        parts = redis_client.lrange(f"{self.prefix}:parts", 0, -1)
+        texts = redis_client.mget([f"{self.prefix}:part:{part}" for part in parts]) if parts else []
+        return {
+            'status': redis_client.get(f"{self.prefix}:status"),
+            'parts': [
+                {'part': part, 'text': text or ''}
+                for part, text in zip(parts, texts)
+            ],
+        }
+
+    def partial_text(self) -> str:
+        """Parts streamed so far, joined in the order they were started."""
+        return '\n\n'.join(part['text'] for part in self.snapshot()['parts'])
+
+
+class PartStream:
+    """Chunk callback for one part of a buffer; restart() clears the part."""
+
+    def __init__(self, buffer: ContentStreamBuffer, part: str):
+        self.buffer = buffer
+        self.part = part
+
+    def __call__(self, chunk: str) -> None:
+        self.buffer.append(self.part, chunk)
+
+    def restart(self) -> None:
+        self.buffer.restart_part(self.part)
@@ -1,28 +1,54 @@
 """
 Celery tasks for content generation.
 """
-from celery import shared_task
+from celery import chain, group, shared_task
+from celery.exceptions import Ignore
+from django.conf import settings
 from django.utils import timezone
 import logging
 
 from apps.transcriptions.models import Transcription
+from your_social_media import profiling, scheduling
 from .models import ContentGeneration, GeneratedTitle, GeneratedChapter
 from .services import ContentGenerationService
+from .singleflight import ContentSingleFlight, resolve_followers
 
 logger = logging.getLogger(__name__)
 
 
 @shared_task(bind=True, max_retries=3)
+@profiling.profile_task('content_generation')
 def process_content_generation(self, content_generation_id):
     """
     Process content generation request.
     This task will call the ContentGenerationService to generate content.
     """
+    if not scheduling.start_job('content_generation', content_generation_id, self.request.id):
+        if self.request.chain:
+            # Part of a batch lane: let the rest of the chain run
+            return {'status': 'skipped', 'content_generation_id': str(content_generation_id)}
+        raise Ignore()
+    
     try:
         content_generation = ContentGeneration.objects.get(id=content_generation_id)
+        
+        flight = None
+        if settings.CONTENT_GENERATION_SINGLE_FLIGHT:
+            flight = ContentSingleFlight(content_generation)
+            leader = flight.acquire()
+            if leader is not None:
+                _enqueue_detached_followers(flight.attach(leader))
+                return {
+                    'status': 'attached',
+                    'content_generation_id': str(content_generation_id),
+                    'leader_id': str(leader.id),
+                    'message': 'Geração idêntica já em andamento; o resultado será reaproveitado'
+                }
+        
         service = ContentGenerationService()
         
         success = service.process_content_generation(content_generation)
+        _finish_single_flight(flight, content_generation)
         
         if success:
             logger.info(f"Content generation {content_generation_id} completed successfully.")
@@ -60,6 +86,8 @@ def process_content_generation(self, content_generation_id):
             content_generation.error_message = f"Falha após {self.max_retries} tentativas: {str(exc)}"
             content_generation.completed_at = timezone.now()
             content_generation.save()
+            if settings.CONTENT_GENERATION_SINGLE_FLIGHT:
+                _finish_single_flight(ContentSingleFlight(content_generation), content_generation)
         except ContentGeneration.DoesNotExist:
             logger.error(f"Content generation {content_generation_id} not found during final error handling.")
         except Exception as inner_exc:
@@ -69,4 +97,66 @@ def process_content_generation(self, content_generation_id):
             'status': 'error',
             'content_generation_id': str(content_generation_id),
             'message': f'Erro após {self.max_retries} tentativas: {str(exc)}'
-        } 
\ No newline at end of file
+        }
+
+
+def _finish_single_flight(flight, content_generation):
+    """Release the leader key and settle any identical generations waiting on this one."""
+    if flight is None:
+        return
+    flight.release()
+    _enqueue_detached_followers(resolve_followers(content_generation))
+
+
+def _enqueue_detached_followers(content_generation_ids):
+    for follower in ContentGeneration.objects.filter(id__in=content_generation_ids).select_related('transcription'):
+        dispatch_content_generation(follower)
+
+
+def dispatch_content_generation(content_generation):
+    """Publish a content generation with a priority from the owner's plan and the transcript size."""
+    priority = scheduling.base_priority(
+        scheduling.plan_of(content_generation.user),
+        scheduling.content_generation_cost_seconds(content_generation)
+    )
+    return scheduling.dispatch_job(
+        'content_generation',
+        content_generation.id,
+        process_content_generation.si(str(content_generation.id)),
+        priority
+    )
+
+
+def redispatch_content_generation(content_generation_id, extra):
+    """Rebuild the signature of a content generation that is still waiting (age boost)."""
+    if not ContentGeneration.objects.filter(id=content_generation_id, status='pending').exists():
+        return None
+    return process_content_generation.si(str(content_generation_id))
+
+
+def dispatch_content_generation_batch(content_generation_ids, concurrency=None):
+    """
+    Enqueue a batch as a Celery group of chains.
+    Each chain runs its generations one after another, so at most `concurrency`
+    tasks of the batch run at the same time. Every generation carries its own
+    plan and transcript-size priority and is registered with the scheduler, so
+    one left waiting too long is boosted out of its chain and run on its own.
+    """
+    content_generations = ContentGeneration.objects.select_related('user', 'transcription').in_bulk(
+        content_generation_ids
+    )
+    signatures = []
+    for content_generation_id in content_generation_ids:
+        content_generation = content_generations.get(content_generation_id)
+        if content_generation is None:
+            continue
+        priority = scheduling.base_priority(
+            scheduling.plan_of(content_generation.user),
+            scheduling.content_generation_cost_seconds(content_generation)
+        )
+        signature = process_content_generation.si(str(content_generation_id)).set(priority=priority)
+        signatures.append(scheduling.register_job('content_generation', content_generation_id, signature, priority))
+
+    concurrency = max(1, concurrency or settings.CONTENT_GENERATION_BATCH_CONCURRENCY)
+    lanes = [signatures[lane::concurrency] for lane in range(concurrency)]
+    return group(chain(*lane) for lane in lanes if lane).apply_async()
@@ -0,0 +1,105 @@
+"""
+Query-count and response-size budgets for the content generation endpoints.
+"""
+from unittest import mock
+
+from django.test import override_settings
+
+from apps.transcriptions.tests.budgets import QueryBudgetTestCase
+
+BASE_URL = '/api/content-generation/'
+
+
+@override_settings(ADMISSION_CONTROL_ENABLED=False)
+class ContentGenerationQueryBudgetTests(QueryBudgetTestCase):
+
+    def test_list(self):
+        response = self.assertWithinBudget('get', BASE_URL, max_queries=2, max_bytes=12 * 1024,
+                                           unfetched_columns=['generated_content', 'transcription_text'])
+        self.assertEqual(len(response.data['results']), 20)
+
+    def test_list_filtered_searched_and_ordered(self):
+        url = f'{BASE_URL}?status=completed&content_type=titles&search=episodio&ordering=-completed_at&page=2'
+        self.assertWithinBudget('get', url, max_queries=2, max_bytes=12 * 1024,
+                                unfetched_columns=['generated_content', 'transcription_text'])
+
+    def test_detail(self):
+        content_generation = self.catalog.content_generation
+        response = self.assertWithinBudget('get', f'{BASE_URL}{content_generation.id}/', max_queries=4,
+                                           max_bytes=24 * 1024, unfetched_columns=['transcription_text'])
+        self.assertEqual(len(response.data['titles']), 5)
+        self.assertEqual(len(response.data['parts']), 3)
+
+    def test_detail_while_processing(self):
+        content_generation = self.catalog.content_generation
+        content_generation.status = 'processing'
+        content_generation.save(update_fields=['status'])
+        with mock.patch('apps.content_generation.serializers.ContentStreamBuffer') as buffer:
+            buffer.return_value.partial_text.return_value = 'Título parcial'
+            response = self.assertWithinBudget('get', f'{BASE_URL}{content_generation.id}/', max_queries=4,
+                                               max_bytes=24 * 1024, unfetched_columns=['transcription_text'])
+        self.assertEqual(response.data['partial_content'], 'Título parcial')
+
+    def test_status(self):
+        content_generation = self.catalog.content_generation
+        self.assertWithinBudget('get', f'{BASE_URL}{content_generation.id}/status/', max_queries=4,
+                                max_bytes=24 * 1024, unfetched_columns=['transcription_text'])
+
+    def test_stream(self):
+        content_generation = self.catalog.content_generation
+        snapshot = {'status': 'done', 'parts': {}}
+        with mock.patch('apps.content_generation.views.ContentStreamBuffer') as buffer:
+            buffer.return_value.snapshot.return_value = snapshot
+            self.assertWithinBudget('get', f'{BASE_URL}{content_generation.id}/stream/', max_queries=1,
+                                    max_bytes=512, unfetched_columns=['generated_content'])
+
+    def test_batch_status(self):
+        batch = self.catalog.batch
+        response = self.assertWithinBudget('get', f'{BASE_URL}batch/{batch.id}/', max_queries=2, max_bytes=12 * 1024)
+        self.assertEqual(len(response.data['items']), 50)
+
+    def test_available_transcriptions(self):
+        response = self.assertWithinBudget('get', f'{BASE_URL}available-transcriptions/', max_queries=1,
+                                           max_bytes=1800 * 600, unfetched_columns=['transcription_text'])
+        # Unpaginated: the budget is per item
+        self.assertEqual(len(response.data), 1800)
+
+    def test_stats(self):
+        response = self.assertWithinBudget('get', f'{BASE_URL}stats/', max_queries=1, max_bytes=512)
+        self.assertEqual(response.data['total_content_generations'], 1000)
+
+    def test_llm_stats(self):
+        self.assertWithinBudget('get', f'{BASE_URL}llm-stats/', max_queries=1, max_bytes=4 * 1024)
+
+    def test_llm_stats_clamps_days(self):
+        response = self.assertWithinBudget('get', f'{BASE_URL}llm-stats/?days=999999999', max_queries=1,
+                                           max_bytes=4 * 1024)
+        self.assertEqual(response.data['days'], 365)
+
+    def test_create(self):
+        data = {'transcription_id': str(self.catalog.transcription.id), 'content_type': 'titles'}
+        with mock.patch('apps.content_generation.views.dispatch_content_generation') as dispatch:
+            self.assertWithinBudget('post', f'{BASE_URL}create/', max_queries=6, max_bytes=4 * 1024, data=data,
+                                    expected_status=201, unfetched_columns=['generated_content'])
+        dispatch.assert_called_once()
+
+    def test_batch_create(self):
+        data = {
+            'transcription_ids': [str(self.catalog.transcription.id), str(self.catalog.content_generation.transcription.id)],
+            'content_type': 'description',
+        }
+        with mock.patch('apps.content_generation.views.dispatch_content_generation_batch') as dispatch:
+            self.assertWithinBudget('post', f'{BASE_URL}batch/', max_queries=5, max_bytes=4 * 1024, data=data,
+                                    expected_status=201, unfetched_columns=['transcription_text'])
+        dispatch.assert_called_once()
+
+    def test_retry(self):
+        content_generation = self.catalog.failed_content_generation
+        with mock.patch('apps.content_generation.views.dispatch_content_generation') as dispatch:
+            self.assertWithinBudget('post', f'{BASE_URL}{content_generation.id}/retry/', max_queries=8,
+                                    max_bytes=24 * 1024)
+        dispatch.assert_called_once()
+
+    def test_delete(self):
+        content_generation = self.catalog.failed_content_generation
+        self.assertWithinBudget('delete', f'{BASE_URL}{content_generation.id}/delete/', max_queries=7, max_bytes=512)
@@ -0,0 +1,120 @@
+"""
+LLM router behaviour: circuit breaker probes that never report an outcome and
+which attempt's output is streamed when attempts fail or lose the hedge race.
+"""
+import time
+
+from django.test import SimpleTestCase, override_settings
+
+from apps.content_generation.routing import CircuitBreaker, LLMRouter
+
+
+class FakeProvider:
+
+    def __init__(self, name, delay_seconds=0.0, fail=False, fail_mid_stream=False, stall_seconds=0.0):
+        self.name = name
+        self.model = f'{name}-model'
+        self.delay_seconds = delay_seconds
+        self.fail = fail
+        self.fail_mid_stream = fail_mid_stream
+        self.stall_seconds = stall_seconds
+
+    def is_configured(self):
+        return True
+
+    def stream(self, prompt, record):
+        time.sleep(self.delay_seconds)
+        if self.fail:
+            raise RuntimeError(f'{self.name} indisponível')
+        yield f'resposta de {self.name}'
+        time.sleep(self.stall_seconds)
+        if self.fail_mid_stream:
+            raise RuntimeError(f'{self.name} caiu no meio da resposta')
+        yield ' fim'
+
+
+class RestartableSink:
+    """Collects streamed chunks like PartStream does."""
+
+    def __init__(self):
+        self.text = ''
+        self.restarts = 0
+
+    def __call__(self, chunk):
+        self.text += chunk
+
+    def restart(self):
+        self.text = ''
+        self.restarts += 1
+
+
+@override_settings(
+    LLM_HEDGING_ENABLED=True,
+    LLM_HEDGE_DEFAULT_DELAY_SECONDS=0.05,
+    LLM_CIRCUIT_FAILURE_THRESHOLD=1,
+    LLM_CIRCUIT_COOLDOWN_SECONDS=0.0,
+)
+class HalfOpenProbeTests(SimpleTestCase):
+
+    def test_released_probe_can_be_retried(self):
+        breaker = CircuitBreaker(failure_threshold=1, cooldown_seconds=0.0)
+        breaker.record_failure()
+        self.assertTrue(breaker.allow())
+        self.assertFalse(breaker.allow())
+        breaker.release_probe()
+        self.assertEqual(breaker.state, CircuitBreaker.HALF_OPEN)
+        self.assertTrue(breaker.allow())
+
+    def test_probe_losing_the_hedge_race_is_released(self):
+        primary = FakeProvider('primary', fail=True)
+        router = LLMRouter([primary, FakeProvider('secondary')])
+        breaker = router.breakers['primary:primary-model']
+
+        router.generate('prompt')
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+
+        # Half-open probe: the primary is slow, the hedge wins and the probe is abandoned
+        primary.fail = False
+        primary.delay_seconds = 0.5
+        result = router.generate('prompt')
+        self.assertEqual(result.provider, 'secondary')
+        self.assertEqual(breaker.state, CircuitBreaker.HALF_OPEN)
+
+        self.assertTrue(breaker.allow())
+        breaker.release_probe()
+
+        primary.delay_seconds = 0.0
+        result = router.generate('prompt')
+        self.assertEqual(result.provider, 'primary')
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+
+
+@override_settings(
+    LLM_HEDGING_ENABLED=True,
+    LLM_HEDGE_DEFAULT_DELAY_SECONDS=0.05,
+    LLM_CIRCUIT_FAILURE_THRESHOLD=5,
+)
+class StreamOwnershipTests(SimpleTestCase):
+
+    def test_stream_switches_to_fallback_after_mid_stream_failure(self):
+        router = LLMRouter([FakeProvider('primary', fail_mid_stream=True), FakeProvider('secondary')])
+        sink = RestartableSink()
+        result = router.generate('prompt', on_chunk=sink)
+        self.assertEqual(result.provider, 'secondary')
+        self.assertEqual(sink.text, 'resposta de secondary fim')
+
+    def test_stream_switches_to_hedge_that_wins(self):
+        router = LLMRouter([FakeProvider('primary', stall_seconds=0.5), FakeProvider('secondary', delay_seconds=0.1)])
+        sink = RestartableSink()
+        result = router.generate('prompt', on_chunk=sink)
+        self.assertEqual(result.provider, 'secondary')
+        self.assertEqual(sink.text, 'resposta de secondary fim')
+        self.assertEqual(sink.restarts, 1)
+
+    def test_stream_owner_that_wins_is_not_restarted(self):
+        router = LLMRouter([FakeProvider('primary'), FakeProvider('secondary', delay_seconds=0.5)])
+        sink = RestartableSink()
+        result = router.generate('prompt', on_chunk=sink)
+        self.assertEqual(result.provider, 'primary')
+        self.assertEqual(sink.text, 'resposta de primary fim')
+        self.assertEqual(sink.restarts, 0)
@@ -4,23 +4,35 @@ Views for content generation functionality.
 from rest_framework import generics, status, permissions
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
+from django.db.models import Count, Q
 from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from datetime import timedelta
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.filters import SearchFilter, OrderingFilter
 import logging
 
-from .models import ContentGeneration
+from .accounting import aggregate_llm_calls
+from .models import ContentGeneration, ContentGenerationBatch, LLMCall
 from .serializers import (
+    ContentGenerationBatchCreateSerializer,
+    ContentGenerationBatchSerializer,
     ContentGenerationCreateSerializer,
     ContentGenerationDetailSerializer,
-    ContentGenerationListSerializer
+    ContentGenerationListSerializer,
+    CONTENT_GENERATION_LIST_COLUMNS
 )
-from .tasks import process_content_generation
+from .streaming import ContentStreamBuffer
+from .tasks import dispatch_content_generation, dispatch_content_generation_batch
 from apps.transcriptions.models import Transcription
-from apps.transcriptions.serializers import TranscriptionListSerializer
+from apps.transcriptions.serializers import TRANSCRIPTION_LIST_COLUMNS, TranscriptionListSerializer
+from your_social_media.admission import check_admission, too_busy_response
 
 logger = logging.getLogger(__name__)
 
+# Window of the LLM call stats; larger ?days values are clamped to it
+LLM_STATS_MAX_DAYS = 365
+
 
 class ContentGenerationCreateView(generics.CreateAPIView):
     """Create new content generation."""
@@ -33,12 +45,16 @@ class ContentGenerationCreateView(generics.CreateAPIView):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         
+        admission = check_admission('content_generation')
+        if not admission.admitted:
+            return too_busy_response(admission)
+        
         try:
             # Save content generation
             content_generation = serializer.save()
             
             # Start processing task
-            task = process_content_generation.delay(str(content_generation.id))
+            task = dispatch_content_generation(content_generation)
             logger.info(f"Started content generation task {task.id} for {content_generation.id}")
             
             # Return detailed response
@@ -47,7 +63,8 @@ class ContentGenerationCreateView(generics.CreateAPIView):
             return Response(
                 {
                     'message': 'Geração de conteúdo criada com sucesso. Processamento iniciado.',
-                    'content_generation': response_serializer.data
+                    'content_generation': response_serializer.data,
+                    **admission.as_dict()
                 },
                 status=status.HTTP_201_CREATED
             )
@@ -59,6 +76,46 @@ class ContentGenerationCreateView(generics.CreateAPIView):
             )
 
 
+class ContentGenerationBatchCreateView(generics.CreateAPIView):
+    """Create content generations for many transcriptions in one request."""
+    
+    serializer_class = ContentGenerationBatchCreateSerializer
+    permission_classes = [permissions.AllowAny]
+    
+    def create(self, request, *args, **kwargs):
+        """Validate, bulk insert and enqueue the whole batch."""
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        
+        admission = check_admission('content_generation', jobs=len(serializer.validated_data['transcription_ids']))
+        if not admission.admitted:
+            return too_busy_response(admission)
+        
+        try:
+            batch = serializer.save()
+            content_generation_ids = list(
+                batch.content_generations.order_by('created_at').values_list('id', flat=True)
+            )
+            dispatch_content_generation_batch(content_generation_ids)
+            logger.info(f"Started content generation batch {batch.id} with {len(content_generation_ids)} items")
+            
+            return Response(
+                {
+                    'message': 'Lote de geração de conteúdo criado com sucesso. Processamento iniciado.',
+                    'batch_id': str(batch.id),
+                    'batch': ContentGenerationBatchSerializer(batch).data,
+                    **admission.as_dict()
+                },
+                status=status.HTTP_201_CREATED
+            )
+        except Exception as e:
+            logger.error(f"Error creating content generation batch: {e}")
+            return Response(
+                {'error': f'Erro ao criar lote de geração de conteúdo: {str(e)}'},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+
 class ContentGenerationListView(generics.ListAPIView):
     """List user content generations."""
     
@@ -71,8 +128,8 @@ class ContentGenerationListView(generics.ListAPIView):
     ordering = ['-created_at']
     
     def get_queryset(self):
-        """Get all content generations."""
-        return ContentGeneration.objects.all()
+        """Get all content generations with the transcription fields the list shows."""
+        return ContentGeneration.objects.select_related('transcription').only(*CONTENT_GENERATION_LIST_COLUMNS)
 
 
 class ContentGenerationDetailView(generics.RetrieveAPIView):
@@ -83,8 +140,10 @@ class ContentGenerationDetailView(generics.RetrieveAPIView):
     lookup_field = 'id'
     
     def get_queryset(self):
-        """Get all content generations."""
-        return ContentGeneration.objects.all()
+        """Get all content generations with their structured titles and chapters (without the transcript)."""
+        return ContentGeneration.objects.select_related(
+            'user', 'transcription'
+        ).defer('transcription__transcription_text').prefetch_related('titles', 'chapters', 'parts')
 
 
 class ContentGenerationDeleteView(generics.DestroyAPIView):
@@ -113,7 +172,9 @@ def content_generation_status_view(request, content_generation_id):
     """Get content generation status."""
     try:
         content_generation = get_object_or_404(
-            ContentGeneration,
+            ContentGeneration.objects.select_related(
+                'user', 'transcription'
+            ).defer('transcription__transcription_text').prefetch_related('titles', 'chapters', 'parts'),
             id=content_generation_id
         )
         
@@ -128,6 +189,49 @@ def content_generation_status_view(request, content_generation_id):
         )
 
 
+@api_view(['GET'])
+@permission_classes([permissions.AllowAny])
+def content_generation_batch_status_view(request, batch_id):
+    """Get aggregate progress of a content generation batch."""
+    try:
+        batch = get_object_or_404(ContentGenerationBatch, id=batch_id)
+        serializer = ContentGenerationBatchSerializer(batch)
+        return Response(serializer.data)
+        
+    except Exception as e:
+        logger.error(f"Error getting content generation batch status: {e}")
+        return Response(
+            {'error': 'Erro ao buscar status do lote de geração de conteúdo'},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+
+@api_view(['GET'])
+@permission_classes([permissions.AllowAny])
+def content_generation_stream_view(request, content_generation_id):
+    """Get partial (streamed) output while a content generation is processing."""
+    try:
+        content_generation = get_object_or_404(
+            ContentGeneration.objects.only('id', 'status'),
+            id=content_generation_id
+        )
+        
+        stream = ContentStreamBuffer(content_generation.id).snapshot()
+        return Response({
+            'id': str(content_generation.id),
+            'status': content_generation.status,
+            'stream_status': stream['status'],
+            'parts': stream['parts'],
+        })
+        
+    except Exception as e:
+        logger.error(f"Error getting content generation stream: {e}")
+        return Response(
+            {'error': 'Erro ao buscar conteúdo parcial da geração'},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+
 @api_view(['POST'])
 @permission_classes([permissions.AllowAny])
 def retry_content_generation_view(request, content_generation_id):
@@ -144,18 +248,22 @@ def retry_content_generation_view(request, content_generation_id):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Reset status
+        # Reset status; parts that already succeeded are kept and only failed ones are regenerated
         content_generation.status = 'pending'
         content_generation.error_message = None
         content_generation.save()
+        reused_parts = list(
+            content_generation.parts.filter(status='completed').values_list('part', flat=True)
+        )
         
         # Start processing task
-        task = process_content_generation.delay(str(content_generation.id))
-        logger.info(f"Started content generation retry task {task.id} for {content_generation.id}")
+        task = dispatch_content_generation(content_generation)
+        logger.info(f"Started content generation retry task {task.id} for {content_generation.id} (reusing parts: {reused_parts})")
         
         serializer = ContentGenerationDetailSerializer(content_generation)
         return Response({
             'message': 'Geração de conteúdo reiniciada com sucesso',
+            'reused_parts': reused_parts,
             'content_generation': serializer.data
         })
         
@@ -172,15 +280,13 @@ def retry_content_generation_view(request, content_generation_id):
 def user_content_generation_stats_view(request):
     """Get content generation statistics."""
     try:
-        content_generations = ContentGeneration.objects.all()
-        
-        stats = {
-            'total_content_generations': content_generations.count(),
-            'completed_content_generations': content_generations.filter(status='completed').count(),
-            'processing_content_generations': content_generations.filter(status='processing').count(),
-            'failed_content_generations': content_generations.filter(status='failed').count(),
-            'pending_content_generations': content_generations.filter(status='pending').count(),
-        }
+        stats = ContentGeneration.objects.aggregate(
+            total_content_generations=Count('id'),
+            completed_content_generations=Count('id', filter=Q(status='completed')),
+            processing_content_generations=Count('id', filter=Q(status='processing')),
+            failed_content_generations=Count('id', filter=Q(status='failed')),
+            pending_content_generations=Count('id', filter=Q(status='pending')),
+        )
         
         return Response(stats)
         
@@ -192,6 +298,36 @@ def user_content_generation_stats_view(request):
         )
 
 
+@api_view(['GET'])
+@permission_classes([permissions.AllowAny])
+def llm_call_stats_view(request):
+    """Get p50/p95 LLM latency and tokens per content type and language (?days=7, 1 to 365)."""
+    try:
+        days = min(max(int(request.query_params.get('days', 7)), 1), LLM_STATS_MAX_DAYS)
+    except ValueError:
+        return Response(
+            {'error': 'Parâmetro days inválido'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    try:
+        since = timezone.now() - timedelta(days=days)
+        calls = LLMCall.objects.filter(created_at__gte=since)
+        
+        return Response({
+            'since': since,
+            'days': days,
+            'groups': aggregate_llm_calls(calls),
+        })
+        
+    except Exception as e:
+        logger.error(f"Error getting LLM call stats: {e}")
+        return Response(
+            {'error': 'Erro ao buscar estatísticas de chamadas LLM'},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+
 @api_view(['GET'])
 @permission_classes([permissions.AllowAny])
 def available_transcriptions_view(request):
@@ -204,7 +340,7 @@ def available_transcriptions_view(request):
             transcription_text__isnull=True
         ).exclude(
             transcription_text__exact=''
-        ).order_by('-created_at')
+        ).only(*TRANSCRIPTION_LIST_COLUMNS).order_by('-created_at')
         
         serializer = TranscriptionListSerializer(transcriptions, many=True)
         return Response(serializer.data)
@@ -0,0 +1,442 @@
+"""
+Benchmark of the audio pipeline on synthetic long-form media.
+
+Generates audio and video files of a given length (a speech-like modulated voice,
+pink noise and a tone, encoded with different codecs and containers) and runs the
+worker pipeline's stages on them, the same AudioTranscriptionService calls as
+tasks.py on a throwaway Transcription: the upload probe, extract_audio,
+split_segments (speech encoding profile, oversized segments reduced),
+transcribe_segment (against the local Groq stand-in from
+your_social_media/provider_stubs.py) and merge_segments.
+
+Each stage reports wall time, CPU time (including the ffmpeg child processes),
+peak RSS (this process plus its children, sampled) and peak temp-disk usage. Each
+case runs in a forked child process so one case's heap does not inflate the next.
+Results can be saved as JSON and compared against a baseline to catch regressions.
+Run through `python manage.py benchmark_audio_pipeline`.
+"""
+import json
+import logging
+import os
+import platform
+import re
+import resource
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from multiprocessing import get_context
+from typing import Any, Dict, List, Optional
+
+from django.db import connections
+from django.test.utils import override_settings
+
+from your_social_media.provider_stubs import StubProfile, start_stub_server
+
+from .media_probe import probe_media
+from .models import Transcription
+from .services import SEGMENT_DURATION_MS, AudioTranscriptionService
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_INTERVAL_SECONDS = 0.05
+BASE_CLIP_SECONDS = 60
+SOURCE_SAMPLE_RATE = 44100
+
+# name -> container extension, whether it has a video stream, ffmpeg codec arguments
+MEDIA_FORMATS = {
+    'mp3': {'ext': 'mp3', 'video': False, 'codec': ['-c:a', 'libmp3lame', '-b:a', '128k']},
+    'm4a': {'ext': 'm4a', 'video': False, 'codec': ['-c:a', 'aac', '-b:a', '128k']},
+    'wav': {'ext': 'wav', 'video': False, 'codec': ['-c:a', 'pcm_s16le']},
+    'flac': {'ext': 'flac', 'video': False, 'codec': ['-c:a', 'flac']},
+    'opus': {'ext': 'ogg', 'video': False, 'codec': ['-c:a', 'libopus', '-b:a', '64k']},
+    'mp4': {'ext': 'mp4', 'video': True, 'codec': ['-c:a', 'aac', '-b:a', '128k']},
+    'mkv': {'ext': 'mkv', 'video': True, 'codec': ['-c:a', 'libopus', '-b:a', '96k']},
+}
+VIDEO_CODEC = ['-c:v', 'libx264', '-preset', 'ultrafast', '-tune', 'stillimage', '-pix_fmt', 'yuv420p']
+
+# A voice-like carrier (gliding pitch, ~4 Hz syllable envelope), pink noise and a tone
+_SOURCE_FILTER = (
+    "aevalsrc=exprs='0.5*sin(2*PI*(165+35*sin(2*PI*0.27*t))*t)"
+    "*gt(sin(2*PI*0.11*t),-0.8)*(0.5+0.5*sin(2*PI*3.9*t))':s={rate}:d={seconds}[voice];"
+    "anoisesrc=d={seconds}:c=pink:r={rate}:a=0.06[noise];"
+    "sine=f=440:r={rate}:d={seconds},volume=0.05[tone];"
+    "[voice][noise][tone]amix=inputs=3"
+)
+
+# Regressions smaller than these are noise on short cases
+REGRESSION_FLOORS = {'wall_s': 0.5, 'cpu_s': 0.5, 'peak_rss_mb': 25.0, 'peak_temp_mb': 25.0}
+
+
+class BenchmarkError(Exception):
+    """The benchmark cannot run (missing ffmpeg, bad arguments)."""
+
+
+@dataclass
+class StageResult:
+    wall_s: float
+    cpu_s: float
+    peak_rss_mb: float
+    peak_temp_mb: float
+    error: Optional[str] = None
+
+
+@dataclass
+class CaseResult:
+    case: str
+    media_format: str
+    duration_seconds: int
+    input_mb: float
+    segments: int = 0
+    stages: Dict[str, StageResult] = field(default_factory=dict)
+    temp_left_mb: float = 0.0
+
+    @property
+    def total_wall_s(self) -> float:
+        return round(sum(stage.wall_s for stage in self.stages.values()), 2)
+
+    @property
+    def realtime_factor(self) -> Optional[float]:
+        """Seconds of audio processed per second of wall time."""
+        return round(self.duration_seconds / self.total_wall_s, 1) if self.total_wall_s else None
+
+
+def parse_duration(value: str) -> int:
+    """'90s', '10m', '4h', '1h30m' or plain seconds -> seconds."""
+    value = value.strip().lower()
+    if value.isdigit():
+        return int(value)
+    parts = re.findall(r'(\d+)([hms])', value)
+    if not parts or ''.join(number + unit for number, unit in parts) != value:
+        raise BenchmarkError(f"Duração inválida: {value!r} (use por exemplo 90s, 10m, 4h ou 1h30m)")
+    return sum(int(number) * {'h': 3600, 'm': 60, 's': 1}[unit] for number, unit in parts)
+
+
+def format_duration(seconds: int) -> str:
+    hours, remainder = divmod(seconds, 3600)
+    minutes, seconds = divmod(remainder, 60)
+    return ''.join(f'{value}{unit}' for value, unit in ((hours, 'h'), (minutes, 'm'), (seconds, 's')) if value) or '0s'
+
+
+# Synthetic media
+
+def _ffmpeg(*args: str) -> None:
+    command = ['ffmpeg', '-hide_banner', '-loglevel', 'error', '-y', *args]
+    completed = subprocess.run(command, capture_output=True, text=True)
+    if completed.returncode != 0:
+        raise BenchmarkError(f"ffmpeg falhou: {completed.stderr.strip()[:500]}")
+
+
+def ffmpeg_version() -> str:
+    if not shutil.which('ffmpeg'):
+        raise BenchmarkError("ffmpeg não encontrado no PATH")
+    output = subprocess.run(['ffmpeg', '-version'], capture_output=True, text=True).stdout
+    return output.splitlines()[0] if output else 'unknown'
+
+
+def synthetic_media(cache_dir: str, seconds: int, media_format: str, video_size: str = '640x360') -> str:
+    """
+    Path of a synthetic file of `seconds` in `media_format`, generated on first use.
+    A one-minute source clip is looped, so long files cost one encode, not a synthesis.
+    """
+    spec = MEDIA_FORMATS[media_format]
+    os.makedirs(cache_dir, exist_ok=True)
+    path = os.path.join(cache_dir, f'synthetic_{format_duration(seconds)}_{media_format}.{spec["ext"]}')
+    if os.path.exists(path):
+        return path
+
+    base_clip = os.path.join(cache_dir, f'source_{BASE_CLIP_SECONDS}s.wav')
+    if not os.path.exists(base_clip):
+        partial = f'{base_clip}.part.wav'
+        _ffmpeg('-filter_complex', _SOURCE_FILTER.format(rate=SOURCE_SAMPLE_RATE, seconds=BASE_CLIP_SECONDS),
+                '-ac', '2', '-c:a', 'pcm_s16le', partial)
+        os.replace(partial, base_clip)
+
+    logger.info(f"[BENCHMARK] Gerando {format_duration(seconds)} em {media_format}")
+    inputs = ['-stream_loop', '-1', '-i', base_clip]
+    maps = ['-map', '0:a']
+    if spec['video']:
+        inputs += ['-f', 'lavfi', '-i', f'color=c=0x336699:s={video_size}:r=1']
+        maps = ['-map', '1:v', '-map', '0:a', *VIDEO_CODEC]
+    partial = f'{path}.part.{spec["ext"]}'
+    _ffmpeg(*inputs, *maps, *spec['codec'], '-t', str(seconds), partial)
+    os.replace(partial, path)
+    return path
+
+
+# Measurement
+
+def _rss_bytes(pid: int) -> int:
+    try:
+        with open(f'/proc/{pid}/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+def _descendants(pid: int) -> List[int]:
+    children = []
+    try:
+        for task in os.listdir(f'/proc/{pid}/task'):
+            with open(f'/proc/{pid}/task/{task}/children') as task_children:
+                children += [int(child) for child in task_children.read().split()]
+    except OSError:
+        return []
+    return children + [grandchild for child in children for grandchild in _descendants(child)]
+
+
+def directory_bytes(path: str) -> int:
+    total = 0
+    try:
+        with os.scandir(path) as entries:
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        total += directory_bytes(entry.path)
+                    else:
+                        total += entry.stat(follow_symlinks=False).st_size
+                except OSError:
+                    continue
+    except OSError:
+        pass
+    return total
+
+
+def _cpu_seconds() -> float:
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return own.ru_utime + own.ru_stime + children.ru_utime + children.ru_stime
+
+
+class StageMeter:
+    """
+    Measure one stage: wall and CPU time, and on a background thread the RSS of this
+    process plus its children (ffmpeg) and the size of the scratch directory.
+    """
+
+    def __init__(self, name: str, scratch_dir: str):
+        self.name = name
+        self.scratch_dir = scratch_dir
+        self.result: Optional[StageResult] = None
+        self._stop = threading.Event()
+        self._peak_rss = 0
+        self._peak_temp = 0
+
+    def _sample(self) -> None:
+        pid = os.getpid()
+        rss = _rss_bytes(pid) + sum(_rss_bytes(child) for child in _descendants(pid))
+        self._peak_rss = max(self._peak_rss, rss)
+        self._peak_temp = max(self._peak_temp, directory_bytes(self.scratch_dir))
+
+    def _run(self) -> None:
+        while not self._stop.wait(SAMPLE_INTERVAL_SECONDS):
+            self._sample()
+
+    def __enter__(self):
+        self._sample()
+        self._thread = threading.Thread(target=self._run, name='benchmark-sampler', daemon=True)
+        self._thread.start()
+        self._cpu_start = _cpu_seconds()
+        self._wall_start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        wall = time.perf_counter() - self._wall_start
+        cpu = _cpu_seconds() - self._cpu_start
+        self._stop.set()
+        self._thread.join()
+        self._sample()
+        self.result = StageResult(
+            wall_s=round(wall, 3),
+            cpu_s=round(cpu, 3),
+            peak_rss_mb=round(self._peak_rss / 1024 ** 2, 1),
+            peak_temp_mb=round(self._peak_temp / 1024 ** 2, 1),
+            error=f'{exc_type.__name__}: {exc}' if exc_type else None,
+        )
+        # A failed stage is reported; the following ones are skipped by the caller
+        return exc_type is not None and issubclass(exc_type, Exception)
+
+
+# Pipeline stages
+
+def _transcribe_segments(service: AudioTranscriptionService, transcription: Transcription,
+                         segments: List[Dict[str, Any]], concurrency: int) -> None:
+    """transcribe_segment fanned out like the Celery chord, `concurrency` at a time."""
+    def transcribe(segment):
+        try:
+            service.transcribe_segment(transcription, segment)
+        finally:
+            connections.close_all()
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(transcribe, segments))
+
+
+def run_case(media_path: str, media_format: str, seconds: int, scratch_root: str, concurrency: int,
+             stub_url: str) -> CaseResult:
+    """
+    Run the worker pipeline's stages (tasks.py) on one media file and measure each of them.
+    A throwaway Transcription is created for the run (its work directory lives in the
+    scratch directory) and deleted afterwards.
+    """
+    scratch_dir = os.path.join(scratch_root, f'{format_duration(seconds)}_{media_format}_{os.getpid()}')
+    os.makedirs(scratch_dir, exist_ok=True)
+    # pydub decodes through tempfile: keep it in the measured directory too
+    tempfile.tempdir = scratch_dir
+    result = CaseResult(
+        case=f'{format_duration(seconds)}-{media_format}',
+        media_format=media_format,
+        duration_seconds=seconds,
+        input_mb=round(os.path.getsize(media_path) / 1024 ** 2, 1),
+    )
+    service = AudioTranscriptionService()
+    transcription = None
+
+    def stage(name: str) -> StageMeter:
+        return StageMeter(name, scratch_dir)
+
+    def record(meter: StageMeter) -> bool:
+        result.stages[meter.name] = meter.result
+        if meter.result.error:
+            logger.error(f"[BENCHMARK] {result.case} {meter.name}: {meter.result.error}")
+        return meter.result.error is None
+
+    with override_settings(GROQ_API_BASE_URL=f'{stub_url}/openai/v1', MEDIA_ROOT=scratch_dir):
+        try:
+            transcription = Transcription.objects.create(
+                source_type='video_upload' if MEDIA_FORMATS[media_format]['video'] else 'audio_upload',
+                status='processing',
+                original_filename=os.path.basename(media_path),
+                model_used='whisper-large-v3-turbo',
+            )
+
+            # The upload preflight: its metadata drives the speech encoding profile
+            with stage('probe') as meter:
+                media_probe = probe_media(media_path)
+                if media_probe is None:
+                    raise Exception("probe_media não leu a mídia")
+                for name, value in media_probe.model_fields().items():
+                    setattr(transcription, name, value)
+                transcription.save()
+            if not record(meter):
+                return result
+
+            audio_path = media_path
+            if MEDIA_FORMATS[media_format]['video']:
+                with stage('extract_audio') as meter:
+                    audio_path = service.extract_audio(transcription, media_path)
+                if not record(meter):
+                    return result
+
+            # Segments that exceed the Groq limit are re-encoded inside this stage, as in production
+            with stage('split') as meter:
+                segments = service.split_segments(transcription, audio_path)
+            if not record(meter):
+                return result
+            result.segments = len(segments)
+
+            with stage('transcribe') as meter:
+                _transcribe_segments(service, transcription, segments, concurrency)
+            if not record(meter):
+                return result
+
+            with stage('merge') as meter:
+                if not service.merge_segments(transcription, len(segments)):
+                    raise Exception("merge_segments não completou a transcrição")
+            record(meter)
+        finally:
+            # merge_segments removes the work directory: anything left in the scratch directory is a leak
+            result.temp_left_mb = round(directory_bytes(scratch_dir) / 1024 ** 2, 1)
+            if transcription is not None:
+                service.cleanup_work_dir(transcription)
+                transcription.delete()
+            shutil.rmtree(scratch_dir, ignore_errors=True)
+    return result
+
+
+def run_benchmark(durations: List[int], media_formats: List[str], cache_dir: str, scratch_dir: Optional[str] = None,
+                  concurrency: int = 4, stub_url: Optional[str] = None, stub_latency_ms: float = 0.0,
+                  progress=None) -> Dict[str, Any]:
+    """
+    Run every (duration, format) case, each in a fresh forked process, against the
+    given stub server or one started here. Returns the JSON-serializable report.
+    """
+    unknown = [media_format for media_format in media_formats if media_format not in MEDIA_FORMATS]
+    if unknown:
+        raise BenchmarkError(f"Formatos desconhecidos: {', '.join(unknown)} (disponíveis: {', '.join(MEDIA_FORMATS)})")
+    environment = {
+        'ffmpeg': ffmpeg_version(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'concurrency': concurrency,
+        'segment_minutes': SEGMENT_DURATION_MS / 60000,
+        'started_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    }
+    scratch_dir = scratch_dir or os.path.join(tempfile.gettempdir(), 'audio_benchmark_scratch')
+    stub_server = None
+    if not stub_url:
+        stub_server = start_stub_server(StubProfile(latency_ms=stub_latency_ms, jitter_ms=0,
+                                                    transcribe_ms_per_audio_minute=0))
+        stub_url = stub_server.url
+
+    cases = []
+    try:
+        for seconds in durations:
+            for media_format in media_formats:
+                media_path = synthetic_media(cache_dir, seconds, media_format)
+                # Forked children must not share the parent's database connections
+                connections.close_all()
+                with ProcessPoolExecutor(max_workers=1, mp_context=get_context('fork')) as pool:
+                    case = pool.submit(run_case, media_path, media_format, seconds, scratch_dir, concurrency,
+                                       stub_url).result()
+                cases.append(case)
+                if progress:
+                    progress(case)
+    finally:
+        if stub_server:
+            stub_server.shutdown()
+            stub_server.server_close()
+
+    return {
+        'environment': environment,
+        'cases': [
+            dict(asdict(case), total_wall_s=case.total_wall_s, realtime_factor=case.realtime_factor)
+            for case in cases
+        ],
+    }
+
+
+def compare_with_baseline(report: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """Regressions of more than `tolerance` (and the absolute floor) per case, stage and metric."""
+    baseline_stages = {
+        (case['case'], stage_name): stage
+        for case in baseline.get('cases', [])
+        for stage_name, stage in case['stages'].items()
+    }
+    regressions = []
+    for case in report['cases']:
+        for stage_name, stage in case['stages'].items():
+            previous = baseline_stages.get((case['case'], stage_name))
+            if not previous or previous.get('error') or stage.get('error'):
+                continue
+            for metric, floor in REGRESSION_FLOORS.items():
+                old, new = previous[metric], stage[metric]
+                if new > old * (1 + tolerance) and new - old > floor:
+                    regressions.append(
+                        f"{case['case']} {stage_name} {metric}: {old} -> {new} (+{(new / old - 1) * 100 if old else 100:.0f}%)"
+                    )
+    return regressions
+
+
+def load_report(path: str) -> Dict[str, Any]:
+    with open(path, encoding='utf-8') as report_file:
+        return json.load(report_file)
+
+
+def save_report(report: Dict[str, Any], path: str) -> None:
+    with open(path, 'w', encoding='utf-8') as report_file:
+        json.dump(report, report_file, indent=1)
@@ -0,0 +1,172 @@
+"""
+Local language detection for transcriptions.
+Replaces the GPT-4o-mini round trip with character trigram and stopword profiles.
+"""
+import re
+import logging
+from typing import Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LANGUAGE = 'pt'
+
+LANGUAGE_NAMES = {
+    'pt': 'Português (Brasil)',
+    'en': 'English',
+    'es': 'Español',
+    'fr': 'Français',
+    'it': 'Italiano',
+    'de': 'Deutsch',
+}
+
+# Most frequent function words per language. They double as the seed text for
+# the character trigram profiles, so every entry should be common in speech.
+STOPWORDS = {
+    'pt': (
+        'o a os as um uma de do da dos das em no na nos nas por para pra com '
+        'não que se mas mais como muito também então isso isto esse essa este '
+        'esta aqui ali eu você vocês ele ela eles elas nós a gente é são foi '
+        'era tem têm ter está estão estou vai vou vamos pode fazer quando '
+        'porque já ainda só bem agora tudo nada ao à pelo pela meu minha seu sua'
+    ),
+    'en': (
+        'the a an of to in on at for with and or but not no that this these '
+        'those it is are was were be been have has had do does did i you he '
+        'she we they my your his her our their what which who when where why '
+        'how so just very really about from there here if will would can '
+        'could should all one get going know like think'
+    ),
+    'es': (
+        'el la los las un una de del en por para con sin no que se pero más '
+        'como muy también entonces eso esto ese esa este esta aquí allí yo tú '
+        'usted ustedes él ella ellos ellas nosotros es son fue era tiene '
+        'tienen tener está están estoy va voy vamos puede hacer cuando porque '
+        'ya todavía solo bien ahora todo nada al lo le les mi su y hay'
+    ),
+    'fr': (
+        'le la les un une de du des en dans par pour avec sans ne pas que qui '
+        'se mais plus comme très aussi alors ça cela ce cette ces ici là je tu '
+        'vous il elle ils elles nous on est sont était être avoir a ont fait '
+        'faire va vais allons peut quand parce déjà encore seulement bien '
+        'maintenant tout rien au aux mon ma son sa et'
+    ),
+    'it': (
+        'il lo la i gli le un una di del della dei in nel nella per con non '
+        'che si ma più come molto anche allora questo questa quello quella qui '
+        'lì io tu voi lui lei loro noi è sono era essere avere ha hanno fatto '
+        'fare va vado andiamo può quando perché già ancora solo bene adesso '
+        'tutto niente al alla mio mia suo sua e ci'
+    ),
+    'de': (
+        'der die das ein eine einen dem den des in im an am auf für mit ohne '
+        'nicht kein dass und oder aber mehr wie sehr auch also dies hier '
+        'da ich du sie er es wir ihr ist sind war waren sein haben hat habe '
+        'hatte machen wird werden kann wenn weil schon noch nur gut jetzt '
+        'alles nichts zum zur mein meine sein seine'
+    ),
+}
+
+LANGUAGE_CODES = tuple(STOPWORDS.keys())
+
+NGRAM_BUCKETS = 4096
+MIN_SAMPLE_CHARS = 20
+MAX_SAMPLE_CHARS = 1000
+MIN_CONFIDENCE = 0.02
+
+_TIMESTAMP_RE = re.compile(r'^\d{1,2}:\d{2}(?::\d{2})?\s+', flags=re.MULTILINE)
+_WORD_RE = re.compile(r"[^\W\d_]+", flags=re.UNICODE)
+
+
+def _trigram_vector(text: str) -> np.ndarray:
+    """Hash the character trigrams of text into a fixed-size count vector."""
+    padded = f" {text} "
+    codes = np.frombuffer(padded.encode('utf-32-le'), dtype=np.uint32).astype(np.uint64)
+    if codes.size < 3:
+        return np.zeros(NGRAM_BUCKETS, dtype=np.float64)
+    ids = (codes[:-2] * np.uint64(1_000_003) + codes[1:-1]) * np.uint64(1_000_003) + codes[2:]
+    counts = np.bincount((ids % np.uint64(NGRAM_BUCKETS)).astype(np.int64), minlength=NGRAM_BUCKETS)
+    return counts.astype(np.float64)
+
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+# Profiles are built once at import time: one L2-normalised row per language.
+_PROFILES = _normalize_rows(np.vstack([
+    _trigram_vector(STOPWORDS[code]) for code in LANGUAGE_CODES
+]))
+_STOPWORD_MASKS = {
+    word: np.array([word in STOPWORDS[code].split() for code in LANGUAGE_CODES], dtype=np.float64)
+    for word in set(' '.join(STOPWORDS.values()).split())
+}
+
+
+def normalize_language_code(value: Optional[str]) -> Optional[str]:
+    """
+    Normalise stored or external language tags to a supported two-letter code.
+    Accepts values like 'pt-BR', 'en_US' or the legacy 'pt|Português (Brasil)'.
+    """
+    if not value:
+        return None
+    code = re.split(r'[|\-_\s]', value.strip().lower(), maxsplit=1)[0]
+    return code if code in LANGUAGE_NAMES else None
+
+
+def language_label(code: str) -> str:
+    """Return the 'code|Name' string used in prompts and ContentGeneration."""
+    code = normalize_language_code(code) or DEFAULT_LANGUAGE
+    return f"{code}|{LANGUAGE_NAMES[code]}"
+
+
+def _prepare_sample(text: str) -> str:
+    """Strip timestamps and keep a bounded lowercase sample."""
+    without_timestamps = _TIMESTAMP_RE.sub('', text[:MAX_SAMPLE_CHARS * 2])
+    return ' '.join(without_timestamps.split())[:MAX_SAMPLE_CHARS].lower()
+
+
+def score_languages(text: str) -> np.ndarray:
+    """Return one score per entry of LANGUAGE_CODES (higher is more likely)."""
+    sample = _prepare_sample(text)
+    words = _WORD_RE.findall(sample)
+    if len(sample) < MIN_SAMPLE_CHARS or not words:
+        return np.zeros(len(LANGUAGE_CODES))
+
+    trigram_scores = _PROFILES @ _normalize_rows(_trigram_vector(' '.join(words)))
+    stopword_hits = [_STOPWORD_MASKS[word] for word in words if word in _STOPWORD_MASKS]
+    stopword_ratio = np.sum(stopword_hits, axis=0) / len(words) if stopword_hits else 0.0
+    return trigram_scores + stopword_ratio
+
+
+def detect_language_with_confidence(text: Optional[str]) -> Tuple[Optional[str], float]:
+    """Detect the language of text, returning (code, margin over the runner-up)."""
+    if not text:
+        return None, 0.0
+    scores = score_languages(text)
+    if not scores.any():
+        return None, 0.0
+    order = np.argsort(scores)[::-1]
+    margin = float(scores[order[0]] - scores[order[1]])
+    return LANGUAGE_CODES[order[0]], margin
+
+
+def detect_language(text: Optional[str], fallback: Optional[str] = None) -> str:
+    """
+    Detect the language code of a transcription.
+    Falls back to the normalised `fallback` tag (e.g. from YouTube) and then to
+    DEFAULT_LANGUAGE when the sample is too short or ambiguous.
+    """
+    code, margin = detect_language_with_confidence(text)
+    if code and margin >= MIN_CONFIDENCE:
+        return code
+    fallback_code = normalize_language_code(fallback)
+    if fallback_code:
+        return fallback_code
+    if code:
+        return code
+    logger.info("Amostra insuficiente para detecção de idioma, usando português por padrão")
+    return DEFAULT_LANGUAGE
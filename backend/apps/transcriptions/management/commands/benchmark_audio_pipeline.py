@@ -0,0 +1,113 @@
+import os
+import tempfile
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.transcriptions.benchmark import (
+    MEDIA_FORMATS, BenchmarkError, compare_with_baseline, load_report, parse_duration,
+    run_benchmark, save_report,
+)
+
+STAGES = ('probe', 'extract_audio', 'split', 'transcribe', 'merge')
+
+
+class Command(BaseCommand):
+    help = ('Benchmark the worker pipeline (probe, extraction, splitting, transcription against a local Groq stand-in '
+            'and merging) on synthetic media of increasing length')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--durations',
+            default='1m,10m,1h,4h',
+            help='Comma-separated media lengths, e.g. 1m,10m,1h,4h (default)',
+        )
+        parser.add_argument(
+            '--formats',
+            default='mp3,m4a,mp4',
+            help=f'Comma-separated formats: {", ".join(MEDIA_FORMATS)} (default: mp3,m4a,mp4)',
+        )
+        parser.add_argument(
+            '--cache-dir',
+            default=os.path.join(tempfile.gettempdir(), 'audio_benchmark_media'),
+            help='Where the synthetic media is generated and reused between runs',
+        )
+        parser.add_argument('--scratch-dir', help='Working directory of the stages (temp-disk usage is measured here)')
+        parser.add_argument('--concurrency', type=int, default=4, help='Segments transcribed at once')
+        parser.add_argument(
+            '--stub-url',
+            default=settings.PROVIDER_STUB_URL,
+            help='Running provider stub server; by default one is started in-process',
+        )
+        parser.add_argument('--stub-latency-ms', type=float, default=0.0,
+                            help='Latency of the in-process Groq stand-in')
+        parser.add_argument('--json', help='Write the report to this file')
+        parser.add_argument('--baseline', help='Earlier --json report to compare against')
+        parser.add_argument(
+            '--max-regression',
+            type=float,
+            default=0.25,
+            help='Fail when a stage metric grows by more than this fraction over the baseline (default 0.25)',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            durations = [parse_duration(value) for value in options['durations'].split(',') if value.strip()]
+            media_formats = [value.strip() for value in options['formats'].split(',') if value.strip()]
+            self.stdout.write('Stage cells: wall seconds / CPU seconds / peak RSS MB / peak temp-disk MB')
+            self.stdout.write(self._row('case', 'input MB', 'segs', *STAGES, 'total s', 'x realtime'))
+            report = run_benchmark(
+                durations,
+                media_formats,
+                cache_dir=options['cache_dir'],
+                scratch_dir=options['scratch_dir'],
+                concurrency=options['concurrency'],
+                stub_url=options['stub_url'],
+                stub_latency_ms=options['stub_latency_ms'],
+                progress=self._print_case,
+            )
+        except BenchmarkError as e:
+            raise CommandError(str(e))
+
+        if options['json']:
+            save_report(report, options['json'])
+            self.stdout.write(f"Report written to {options['json']}")
+
+        failed = [case['case'] for case in report['cases'] if any(stage['error'] for stage in case['stages'].values())]
+        if failed:
+            self.stdout.write(self.style.ERROR(f"Failed cases: {', '.join(failed)}"))
+
+        if options['baseline']:
+            regressions = compare_with_baseline(report, load_report(options['baseline']), options['max_regression'])
+            if regressions:
+                for regression in regressions:
+                    self.stdout.write(self.style.ERROR(f"REGRESSION {regression}"))
+                raise CommandError(f"{len(regressions)} regression(s) against {options['baseline']}")
+            self.stdout.write(self.style.SUCCESS(f"No regressions against {options['baseline']}"))
+
+        if failed:
+            raise CommandError(f"{len(failed)} case(s) failed")
+
+    def _print_case(self, case):
+        cells = []
+        for name in STAGES:
+            stage = case.stages.get(name)
+            if stage is None:
+                cells.append('-')
+            elif stage.error:
+                cells.append('ERROR')
+            else:
+                cells.append(f'{stage.wall_s:.1f}s/{stage.cpu_s:.1f}c/{stage.peak_rss_mb:.0f}M/{stage.peak_temp_mb:.0f}D')
+        self.stdout.write(self._row(
+            case.case, f'{case.input_mb:.1f}', str(case.segments), *cells, f'{case.total_wall_s:.1f}',
+            str(case.realtime_factor or '-'),
+        ))
+        if case.temp_left_mb:
+            self.stdout.write(self.style.WARNING(
+                f"  {case.case}: {case.temp_left_mb} MB left in the scratch directory after the run"
+            ))
+
+    @staticmethod
+    def _row(*cells):
+        widths = (12, 9, 5) + (24,) * len(STAGES) + (8, 10)
+        return ' '.join(str(cell).ljust(width) for cell, width in zip(cells, widths))
@@ -4,7 +4,7 @@ Django management command to reprocess pending transcriptions.
 from django.core.management.base import BaseCommand
 from django.utils import timezone
 from apps.transcriptions.models import Transcription
-from apps.transcriptions.tasks import process_youtube_transcription, process_audio_transcription
+from apps.transcriptions.tasks import dispatch_transcription
 import logging
 
 logger = logging.getLogger(__name__)
@@ -109,10 +109,7 @@ class Command(BaseCommand):
                         self.stdout.write(f'Reprocessando transcrição ID: {transcription.id}')
                         
                         # Start appropriate task
-                        if transcription.source_type == 'youtube':
-                            task = process_youtube_transcription.delay(str(transcription.id))
-                        else:
-                            task = process_audio_transcription.delay(str(transcription.id))
+                        task = dispatch_transcription(transcription)
                         
                         self.stdout.write(f'  Task iniciada: {task.id}')
                         processed_count += 1
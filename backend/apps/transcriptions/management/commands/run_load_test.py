@@ -0,0 +1,133 @@
+import json
+import os
+import tempfile
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from your_social_media.loadtest import SCENARIOS, LoadTest, LoadTestConfig, LoadTestError
+
+
+class Command(BaseCommand):
+    help = ('Ramp concurrent uploads, YouTube extractions and content generations against the REST API '
+            'and report throughput, latency percentiles, queue depth and error rates per step')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--base-url', default='http://localhost:8000', help='Backend to load (default: %(default)s)')
+        parser.add_argument('--token', help='Bearer token sent with every request')
+        parser.add_argument(
+            '--scenarios',
+            default='youtube,content,upload',
+            help=f'Comma-separated scenarios, each ramped separately: {", ".join(SCENARIOS)} (default: %(default)s)',
+        )
+        parser.add_argument('--steps', default='1,2,4,8,16', help='Concurrency of each step (default: %(default)s)')
+        parser.add_argument('--step-seconds', type=float, default=60.0,
+                            help='New jobs are started for this long in each step (default: %(default)s)')
+        parser.add_argument('--poll-interval', type=float, default=2.0, help='Seconds between status polls')
+        parser.add_argument('--job-timeout', type=float, default=15 * 60, help='A job not finished by then is a timeout')
+        parser.add_argument('--upload-file', help='Audio file for the upload scenario (default: synthetic mp3); '
+                                                  'every upload stays in the backend\'s MEDIA_ROOT')
+        parser.add_argument('--upload-seconds', type=int, default=60,
+                            help='Length of the synthetic upload when --upload-file is not given')
+        parser.add_argument(
+            '--transcription-ids',
+            default='',
+            help='Comma-separated completed transcriptions for the content scenario, one per virtual user '
+                 '(missing ones are created)',
+        )
+        parser.add_argument('--content-type', default='complete', help='content_type of the content scenario')
+        parser.add_argument(
+            '--stub-url',
+            default=settings.PROVIDER_STUB_URL,
+            help='Provider stub server the workers use; its counters are reported per step',
+        )
+        parser.add_argument(
+            '--allow-real-providers',
+            action='store_true',
+            help='Run without a stub server (every job then calls the real, paid APIs)',
+        )
+        parser.add_argument('--p95-degradation', type=float, default=1.5,
+                            help='Capacity ends when the end-to-end p95 exceeds the first step\'s by this factor')
+        parser.add_argument('--max-error-rate', type=float, default=0.05,
+                            help='Capacity ends when a step\'s error rate exceeds this fraction')
+        parser.add_argument('--json', help='Write the report to this file')
+
+    def handle(self, *args, **options):
+        if not options['stub_url'] and not options['allow_real_providers']:
+            raise CommandError(
+                'No provider stub server: start `manage.py run_provider_stubs`, set PROVIDER_STUB_URL on the '
+                'backend and the workers and pass --stub-url (or --allow-real-providers to call the real APIs)'
+            )
+
+        scenarios = [value.strip() for value in options['scenarios'].split(',') if value.strip()]
+        try:
+            steps = tuple(int(value) for value in options['steps'].split(',') if value.strip())
+        except ValueError:
+            raise CommandError(f"Invalid --steps: {options['steps']}")
+
+        upload_file = options['upload_file']
+        if 'upload' in scenarios and not upload_file:
+            from apps.transcriptions.benchmark import BenchmarkError, synthetic_media
+
+            try:
+                upload_file = synthetic_media(os.path.join(tempfile.gettempdir(), 'audio_benchmark_media'),
+                                              options['upload_seconds'], 'mp3')
+            except BenchmarkError as e:
+                raise CommandError(f'Cannot generate the upload file ({e}); pass --upload-file')
+
+        config = LoadTestConfig(
+            base_url=options['base_url'].rstrip('/'),
+            token=options['token'],
+            stub_url=options['stub_url'].rstrip('/') if options['stub_url'] else None,
+            steps=steps,
+            step_seconds=options['step_seconds'],
+            poll_interval_seconds=options['poll_interval'],
+            job_timeout_seconds=options['job_timeout'],
+            upload_file=upload_file,
+            transcription_ids=[value.strip() for value in options['transcription_ids'].split(',') if value.strip()],
+            content_type=options['content_type'],
+            p95_degradation=options['p95_degradation'],
+            max_error_rate=options['max_error_rate'],
+        )
+
+        self.stdout.write(self._row('scenario', 'conc', 'jobs/s', 'req/s', 'done', 'fail', 'tout', '429', 'err%',
+                                    'create p95', 'poll p95', 'e2e p50', 'e2e p95', 'queue max'))
+        try:
+            report = LoadTest(config, progress=self._print_step).run(scenarios)
+        except LoadTestError as e:
+            raise CommandError(str(e))
+
+        for scenario, result in report['scenarios'].items():
+            capacity = result['capacity']
+            if capacity['degraded_at'] is None:
+                self.stdout.write(self.style.SUCCESS(
+                    f"{scenario}: no degradation up to {capacity['sustained_concurrency']} concurrent jobs"
+                ))
+            else:
+                self.stdout.write(self.style.WARNING(
+                    f"{scenario}: sustains {capacity['sustained_concurrency'] or 0} concurrent jobs, "
+                    f"degrades at {capacity['degraded_at']} ({capacity['reason']})"
+                ))
+
+        if options['json']:
+            with open(options['json'], 'w', encoding='utf-8') as report_file:
+                json.dump(report, report_file, indent=1)
+            self.stdout.write(f"Report written to {options['json']}")
+
+    def _print_step(self, step):
+        queue_max = max((value['max'] for value in step['queue'].values()), default='-')
+        self.stdout.write(self._row(
+            step['scenario'], step['concurrency'], step['jobs_per_second'], step['requests_per_second'],
+            step['jobs_completed'], step['jobs_failed'], step['jobs_timed_out'], step['rejected_429'],
+            f"{step['error_rate'] * 100:.1f}", self._ms(step['create']['p95_ms']), self._ms(step['poll']['p95_ms']),
+            self._ms(step['end_to_end']['p50_ms']), self._ms(step['end_to_end']['p95_ms']), queue_max,
+        ))
+
+    @staticmethod
+    def _ms(value):
+        return '-' if value is None else f'{value:.0f}ms'
+
+    @staticmethod
+    def _row(*cells):
+        widths = (9, 5, 7, 7, 5, 5, 5, 5, 6, 11, 9, 9, 9, 9)
+        return ' '.join(str(cell).ljust(width) for cell, width in zip(cells, widths))
@@ -0,0 +1,69 @@
+from dataclasses import fields
+
+from django.core.management.base import BaseCommand
+
+from your_social_media.provider_stubs import ProviderStubServer, StubProfile
+
+
+class Command(BaseCommand):
+    help = ('Serve local stand-ins for Groq, Gemini, OpenAI and YouTube '
+            '(point PROVIDER_STUB_URL at this server to use them)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1', help='Interface to listen on')
+        parser.add_argument('--port', type=int, default=8090, help='Port to listen on')
+        parser.add_argument(
+            '--public-url',
+            help='URL the clients use to reach this server (subtitle URLs point at it); '
+                 'defaults to http://<host>:<port>',
+        )
+        parser.add_argument(
+            '--fixtures',
+            help='Directory of recorded responses; replayed when present for a route, synthesized otherwise',
+        )
+        parser.add_argument(
+            '--record',
+            action='store_true',
+            help='Forward every request to the real provider with the caller\'s key and save the responses in --fixtures',
+        )
+        parser.add_argument('--seed', type=int, help='Seed for latency jitter and failure injection')
+        defaults = StubProfile()
+        for field in fields(StubProfile):
+            parser.add_argument(
+                f'--{field.name.replace("_", "-")}',
+                dest=field.name,
+                type=type(getattr(defaults, field.name)),
+                default=getattr(defaults, field.name),
+                help=f'Default: {getattr(defaults, field.name)}',
+            )
+
+    def handle(self, *args, **options):
+        if options['record'] and not options['fixtures']:
+            self.stdout.write(self.style.ERROR('--record needs --fixtures to know where to save the responses'))
+            return
+
+        profile = StubProfile(**{field.name: options[field.name] for field in fields(StubProfile)})
+        server = ProviderStubServer(
+            (options['host'], options['port']),
+            profile=profile,
+            fixtures_dir=options['fixtures'],
+            record=options['record'],
+            seed=options['seed'],
+            public_url=options['public_url'],
+        )
+
+        mode = 'RECORDING from the real providers' if options['record'] else 'replaying/synthesizing'
+        self.stdout.write(self.style.SUCCESS(f'Provider stubs on {server.url} ({mode})'))
+        fixture_counts = server.fixtures.counts()
+        if fixture_counts:
+            self.stdout.write(f'Fixtures: {fixture_counts}')
+        self.stdout.write(f'Set PROVIDER_STUB_URL={server.url} on the backend and the workers.')
+        self.stdout.write('Runtime control: GET/POST /_stub/config, GET /_stub/stats, POST /_stub/reset')
+
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            self.stdout.write('Provider stubs stopped.')
@@ -0,0 +1,144 @@
+"""
+ffprobe preflight for uploaded media.
+Reads only the container and stream headers, so broken or audio-less files are
+rejected at upload time instead of after a worker has decoded them, and the
+duration is known before the job is scheduled.
+"""
+import json
+import logging
+import os
+import shutil
+import subprocess
+import tempfile
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+FFPROBE_TIMEOUT_SECONDS = 30
+# Speech encoding used when audio is (re-)encoded for the transcription API.
+# Whisper works on 16 kHz mono, so anything above that only costs upload size.
+SPEECH_SAMPLE_RATE = 16000
+SPEECH_MAX_BITRATE_KBPS = 64
+
+
+class MediaProbeError(Exception):
+    """The file cannot be used for transcription (user-facing message)."""
+
+
+@dataclass
+class MediaProbe:
+    duration_seconds: float
+    format_name: Optional[str] = None
+    audio_codec: Optional[str] = None
+    audio_bitrate_kbps: Optional[int] = None
+    audio_channels: Optional[int] = None
+    audio_sample_rate: Optional[int] = None
+
+    def model_fields(self) -> Dict[str, Any]:
+        """Transcription field values for the probed metadata."""
+        return {
+            'duration_seconds': int(round(self.duration_seconds)),
+            'audio_codec': self.audio_codec,
+            'audio_bitrate_kbps': self.audio_bitrate_kbps,
+            'audio_channels': self.audio_channels,
+            'audio_sample_rate': self.audio_sample_rate,
+        }
+
+
+def ffprobe_available() -> bool:
+    return shutil.which('ffprobe') is not None
+
+
+def _to_int(value: Any) -> Optional[int]:
+    try:
+        return int(float(value))
+    except (TypeError, ValueError):
+        return None
+
+
+def _run_ffprobe(path: str) -> Dict[str, Any]:
+    command = [
+        'ffprobe', '-v', 'error',
+        '-show_entries', 'format=duration,bit_rate,format_name:stream=codec_type,codec_name,bit_rate,channels,sample_rate',
+        '-of', 'json', path,
+    ]
+    try:
+        completed = subprocess.run(command, capture_output=True, text=True, timeout=FFPROBE_TIMEOUT_SECONDS)
+    except subprocess.TimeoutExpired:
+        raise MediaProbeError("Não foi possível ler o arquivo de mídia (tempo esgotado na análise).")
+    if completed.returncode != 0:
+        logger.warning(f"[PROBE] ffprobe falhou para {path}: {completed.stderr.strip()[:300]}")
+        raise MediaProbeError("Arquivo de mídia corrompido ou em formato não reconhecido.")
+    return json.loads(completed.stdout or '{}')
+
+
+def probe_media(path: str) -> Optional[MediaProbe]:
+    """
+    Probe a media file and validate that it can be transcribed.
+    Returns None when ffprobe is not installed (the check is skipped).
+    Raises MediaProbeError for unusable files.
+    """
+    if not ffprobe_available():
+        logger.warning("[PROBE] ffprobe não encontrado; pré-validação de mídia ignorada")
+        return None
+
+    info = _run_ffprobe(path)
+    streams = info.get('streams') or []
+    media_format = info.get('format') or {}
+    audio = next((stream for stream in streams if stream.get('codec_type') == 'audio'), None)
+    if audio is None:
+        raise MediaProbeError("O arquivo não contém trilha de áudio.")
+
+    duration = media_format.get('duration')
+    try:
+        duration = float(duration)
+    except (TypeError, ValueError):
+        duration = 0.0
+    if duration <= 0:
+        raise MediaProbeError("Não foi possível determinar a duração do arquivo (arquivo corrompido?).")
+
+    bitrate = _to_int(audio.get('bit_rate')) or _to_int(media_format.get('bit_rate'))
+    probe = MediaProbe(
+        duration_seconds=duration,
+        format_name=media_format.get('format_name'),
+        audio_codec=audio.get('codec_name'),
+        audio_bitrate_kbps=bitrate // 1000 if bitrate else None,
+        audio_channels=_to_int(audio.get('channels')),
+        audio_sample_rate=_to_int(audio.get('sample_rate')),
+    )
+    logger.info(
+        f"[PROBE] {duration:.1f}s, {probe.format_name}, áudio {probe.audio_codec} "
+        f"{probe.audio_bitrate_kbps or '?'} kbps, {probe.audio_channels or '?'} canal(is)"
+    )
+    return probe
+
+
+def probe_uploaded_file(uploaded_file) -> Optional[MediaProbe]:
+    """Probe an UploadedFile, spooling in-memory uploads to a temporary file first."""
+    if not ffprobe_available():
+        logger.warning("[PROBE] ffprobe não encontrado; pré-validação de mídia ignorada")
+        return None
+    if hasattr(uploaded_file, 'temporary_file_path'):
+        return probe_media(uploaded_file.temporary_file_path())
+
+    suffix = os.path.splitext(getattr(uploaded_file, 'name', '') or '')[1]
+    with tempfile.NamedTemporaryFile(suffix=suffix) as spooled:
+        for chunk in uploaded_file.chunks():
+            spooled.write(chunk)
+        spooled.flush()
+        try:
+            return probe_media(spooled.name)
+        finally:
+            uploaded_file.seek(0)
+
+
+def speech_encoding_profile(transcription) -> Dict[str, Any]:
+    """
+    Encoding settings for audio sent to the transcription API: mono 16 kHz,
+    never above the source bitrate (re-encoding cannot add quality).
+    """
+    bitrate = SPEECH_MAX_BITRATE_KBPS
+    if transcription.audio_bitrate_kbps:
+        bitrate = max(16, min(bitrate, transcription.audio_bitrate_kbps))
+    return {'bitrate': f'{bitrate}k', 'sample_rate': SPEECH_SAMPLE_RATE, 'channels': 1}
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.7 on 2026-10-19 01:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transcriptions', '0003_alter_transcription_user'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='transcription',
+            name='language_code',
+            field=models.CharField(blank=True, db_index=True, max_length=10, null=True),
+        ),
+        migrations.AlterField(
+            model_name='transcription',
+            name='language_detected',
+            field=models.CharField(blank=True, max_length=50, null=True),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.7 on 2026-10-19 01:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transcriptions', '0004_transcription_language_code'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='transcription',
+            name='audio_bitrate_kbps',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='transcription',
+            name='audio_channels',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='transcription',
+            name='audio_codec',
+            field=models.CharField(blank=True, max_length=50, null=True),
+        ),
+        migrations.AddField(
+            model_name='transcription',
+            name='audio_sample_rate',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-19 01:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transcriptions', '0005_transcription_audio_metadata'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='transcription',
+            index=models.Index(fields=['status', 'completed_at'], name='transcripti_status_1e7173_idx'),
+        ),
+    ]
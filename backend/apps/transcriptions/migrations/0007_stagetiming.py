@@ -0,0 +1,34 @@
+# Generated by Django 4.2.7 on 2026-10-19 01:35
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transcriptions', '0006_status_completed_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StageTiming',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('stage', models.CharField(max_length=50)),
+                ('detail', models.CharField(blank=True, default='', max_length=100)),
+                ('status', models.CharField(choices=[('ok', 'OK'), ('error', 'Erro')], default='ok', max_length=10)),
+                ('started_at_ns', models.BigIntegerField()),
+                ('duration_ns', models.BigIntegerField(blank=True, null=True)),
+                ('worker', models.CharField(blank=True, default='', max_length=100)),
+                ('transcription', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stage_timings', to='transcriptions.transcription')),
+            ],
+            options={
+                'verbose_name': 'Etapa de Processamento',
+                'verbose_name_plural': 'Etapas de Processamento',
+                'db_table': 'transcription_stage_timings',
+                'ordering': ['transcription', 'started_at_ns'],
+                'indexes': [models.Index(fields=['transcription', 'started_at_ns'], name='transcripti_transcr_9b1780_idx')],
+            },
+        ),
+    ]
@@ -37,7 +37,8 @@ class Transcription(models.Model):
     # Processing information
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
     model_used = models.CharField(max_length=50, blank=True, null=True)  # Whisper model
-    language_detected = models.CharField(max_length=10, blank=True, null=True)
+    language_detected = models.CharField(max_length=50, blank=True, null=True)
+    language_code = models.CharField(max_length=10, blank=True, null=True, db_index=True)  # Normalised ISO 639-1
     
     # Results
     title = models.CharField(max_length=500, blank=True, null=True)
@@ -48,6 +49,11 @@ class Transcription(models.Model):
     duration_seconds = models.IntegerField(blank=True, null=True)
     file_size_mb = models.FloatField(blank=True, null=True)
     processing_time_seconds = models.FloatField(blank=True, null=True)
+    # Audio stream details from the ffprobe preflight (media_probe.py)
+    audio_codec = models.CharField(max_length=50, blank=True, null=True)
+    audio_bitrate_kbps = models.IntegerField(blank=True, null=True)
+    audio_channels = models.IntegerField(blank=True, null=True)
+    audio_sample_rate = models.IntegerField(blank=True, null=True)
     
     # Error handling
     error_message = models.TextField(blank=True, null=True)
@@ -63,6 +69,8 @@ class Transcription(models.Model):
         verbose_name = 'Transcrição'
         verbose_name_plural = 'Transcrições'
         ordering = ['-created_at']
+        # Backlog and throughput counts for admission control
+        indexes = [models.Index(fields=['status', 'completed_at'])]
     
     def __str__(self):
         user_info = self.user.email if self.user else 'Anônimo'
@@ -99,4 +107,31 @@ class TranscriptionSegment(models.Model):
         unique_together = ['transcription', 'segment_number']
     
     def __str__(self):
-        return f"Segmento {self.segment_number} - {self.transcription}" 
\ No newline at end of file
+        return f"Segmento {self.segment_number} - {self.transcription}" 
+
+class StageTiming(models.Model):
+    """One stage of a transcription job's timeline (upload, queue wait, pipeline stages, API calls)."""
+    
+    STATUS_CHOICES = [
+        ('ok', 'OK'),
+        ('error', 'Erro'),
+    ]
+    
+    transcription = models.ForeignKey(Transcription, on_delete=models.CASCADE, related_name='stage_timings')
+    stage = models.CharField(max_length=50)
+    detail = models.CharField(max_length=100, blank=True, default='')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='ok')
+    # Wall-clock start (epoch ns) orders stages across workers; duration comes from the monotonic clock
+    started_at_ns = models.BigIntegerField()
+    duration_ns = models.BigIntegerField(blank=True, null=True)
+    worker = models.CharField(max_length=100, blank=True, default='')
+    
+    class Meta:
+        db_table = 'transcription_stage_timings'
+        verbose_name = 'Etapa de Processamento'
+        verbose_name_plural = 'Etapas de Processamento'
+        ordering = ['transcription', 'started_at_ns']
+        indexes = [models.Index(fields=['transcription', 'started_at_ns'])]
+    
+    def __str__(self):
+        return f"{self.transcription_id} - {self.stage} {self.detail}".strip()
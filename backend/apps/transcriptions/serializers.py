@@ -3,7 +3,11 @@ Serializers for transcription functionality.
 """
 from rest_framework import serializers
 from django.core.files.uploadedfile import InMemoryUploadedFile, TemporaryUploadedFile
+from .media_probe import MediaProbeError, probe_uploaded_file
 from .models import Transcription, TranscriptionSegment
+from apps.content_generation.models import ContentGeneration
+from apps.content_generation.serializers import ContentPackageOptionsSerializer
+import json
 import mimetypes
 import os
 
@@ -11,11 +15,15 @@ import os
 class TranscriptionCreateSerializer(serializers.ModelSerializer):
     """Serializer for creating transcriptions."""
     
+    # Optional content package generated as soon as the transcription completes.
+    # Accepts an object, or a JSON string for multipart uploads.
+    content_generation = serializers.JSONField(write_only=True, required=False)
+    
     class Meta:
         model = Transcription
         fields = [
             'source_type', 'source_url', 'audio_file', 'video_file',
-            'include_timestamps', 'model_used'
+            'include_timestamps', 'model_used', 'content_generation'
         ]
         extra_kwargs = {
             'source_url': {'required': False},
@@ -49,8 +57,31 @@ class TranscriptionCreateSerializer(serializers.ModelSerializer):
             if video_file:
                 self._validate_video_file(video_file)
         
+        if source_type in ('audio_upload', 'video_upload'):
+            data['media_probe'] = self._probe_media(data.get('audio_file') or data.get('video_file'))
+        
         return data
     
+    def _probe_media(self, file):
+        """Header-only ffprobe preflight: reject broken or audio-less files before anything is queued."""
+        try:
+            return probe_uploaded_file(file)
+        except MediaProbeError as e:
+            raise serializers.ValidationError(str(e))
+    
+    def validate_content_generation(self, value):
+        """Validate the requested content package options."""
+        if value in (None, '', {}):
+            return None
+        if isinstance(value, str):
+            try:
+                value = json.loads(value)
+            except ValueError:
+                raise serializers.ValidationError("Opções de geração de conteúdo inválidas (JSON esperado).")
+        options = ContentPackageOptionsSerializer(data=value)
+        options.is_valid(raise_exception=True)
+        return options.validated_data
+    
     def _validate_audio_file(self, file):
         """Validate audio file format and size."""
         # Check file size (500MB limit)
@@ -119,7 +150,22 @@ class TranscriptionCreateSerializer(serializers.ModelSerializer):
         if not validated_data.get('model_used'):
             validated_data['model_used'] = 'whisper-large-v3-turbo'
         
-        return super().create(validated_data)
+        media_probe = validated_data.pop('media_probe', None)
+        if media_probe is not None:
+            validated_data.update(media_probe.model_fields())
+        
+        content_options = validated_data.pop('content_generation', None)
+        transcription = super().create(validated_data)
+        
+        # The content generation waits as pending until the transcription task chains into it
+        transcription.pending_content_generation = None
+        if content_options:
+            transcription.pending_content_generation = ContentGeneration.objects.create(
+                user=transcription.user,
+                transcription=transcription,
+                **content_options
+            )
+        return transcription
 
 
 class TranscriptionSegmentSerializer(serializers.ModelSerializer):
@@ -142,15 +188,17 @@ class TranscriptionDetailSerializer(serializers.ModelSerializer):
         model = Transcription
         fields = [
             'id', 'user_email', 'source_type', 'source_url', 'original_filename',
-            'status', 'model_used', 'language_detected', 'title',
+            'status', 'model_used', 'language_detected', 'language_code', 'title',
             'transcription_text', 'include_timestamps', 'duration_seconds',
             'file_size_mb', 'file_size_display', 'duration_display',
+            'audio_codec', 'audio_bitrate_kbps', 'audio_channels', 'audio_sample_rate',
             'processing_time_seconds', 'error_message', 'retry_count',
             'created_at', 'updated_at', 'completed_at', 'segments'
         ]
         read_only_fields = [
-            'id', 'user_email', 'status', 'language_detected', 'title',
+            'id', 'user_email', 'status', 'language_detected', 'language_code', 'title',
             'transcription_text', 'duration_seconds', 'file_size_mb',
+            'audio_codec', 'audio_bitrate_kbps', 'audio_channels', 'audio_sample_rate',
             'processing_time_seconds', 'error_message', 'retry_count',
             'created_at', 'updated_at', 'completed_at'
         ]
@@ -180,6 +228,14 @@ class TranscriptionDetailSerializer(serializers.ModelSerializer):
         return None
 
 
+# Columns read by TranscriptionListSerializer; list querysets load only these so
+# the transcript text is never fetched for list pages
+TRANSCRIPTION_LIST_COLUMNS = (
+    'id', 'source_type', 'original_filename', 'title', 'status', 'language_detected',
+    'language_code', 'file_size_mb', 'duration_seconds', 'created_at', 'completed_at',
+)
+
+
 class TranscriptionListSerializer(serializers.ModelSerializer):
     """Serializer for transcription list."""
     
@@ -190,7 +246,7 @@ class TranscriptionListSerializer(serializers.ModelSerializer):
         model = Transcription
         fields = [
             'id', 'source_type', 'original_filename', 'title', 'status',
-            'language_detected', 'file_size_display', 'duration_display',
+            'language_detected', 'language_code', 'file_size_display', 'duration_display',
             'created_at', 'completed_at'
         ]
     
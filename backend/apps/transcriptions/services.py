@@ -7,18 +7,24 @@ import re
 import requests
 import logging
 import tempfile
+import shutil
 import time
 import math
+from contextlib import nullcontext
 from typing import Optional, Tuple, Dict, Any, List
 from django.conf import settings
 from django.core.files.base import ContentFile
 from django.utils import timezone
+from your_social_media import metrics
+from your_social_media.provider_stubs import StubYoutubeDL
 from pydub import AudioSegment
 from moviepy.editor import VideoFileClip
 import yt_dlp as youtube_dl
 from bs4 import BeautifulSoup
 import html
 from .models import Transcription, TranscriptionSegment
+from .language import detect_language
+from .media_probe import probe_media, speech_encoding_profile
 
 logger = logging.getLogger(__name__)
 
@@ -80,8 +86,10 @@ class TranscriptionService:
                 'compat_opts': {'ffmpeg': 'false'},
             }
 
-            with youtube_dl.YoutubeDL(ydl_opts) as ydl:
-                info_dict = ydl.extract_info(video_url, download=False)
+            youtube_dl_class = StubYoutubeDL if settings.PROVIDER_STUB_URL else youtube_dl.YoutubeDL
+            with youtube_dl_class(ydl_opts) as ydl:
+                with metrics.external_call('youtube', 'extract_info'):
+                    info_dict = ydl.extract_info(video_url, download=False)
                 title = info_dict.get('title', 'sem_titulo')
                 upload_date_str = info_dict.get('upload_date', None)
                 upload_date = None
@@ -160,7 +168,9 @@ class TranscriptionService:
                         if not transcript_url:
                             continue
 
-                        transcript_response = requests.get(transcript_url)
+                        with metrics.external_call('youtube', 'subtitles') as call:
+                            transcript_response = requests.get(transcript_url)
+                            call.status = str(transcript_response.status_code)
                         if transcript_response.status_code == 200:
                             transcript_xml = transcript_response.content
                             transcript_soup = BeautifulSoup(transcript_xml, 'xml')
@@ -189,8 +199,9 @@ class TranscriptionService:
             logger.error(f"Erro ao extrair transcrição do YouTube: {e}")
             return None, None, None, None, None
     
-    def extract_audio_from_video(self, video_path: str, output_audio_path: str) -> Optional[str]:
-        """Extract audio from video file."""
+    def extract_audio_from_video(self, video_path: str, output_audio_path: str, bitrate: Optional[str] = None,
+                                 sample_rate: Optional[int] = None, channels: Optional[int] = None) -> Optional[str]:
+        """Extract audio from video file, optionally re-encoded with a speech profile."""
         try:
             video = VideoFileClip(video_path)
             
@@ -200,7 +211,10 @@ class TranscriptionService:
             
             video.audio.write_audiofile(
                 output_audio_path,
+                fps=sample_rate,
                 codec='libmp3lame',
+                bitrate=bitrate,
+                ffmpeg_params=['-ac', str(channels)] if channels else None,
                 verbose=False,
                 logger=None
             )
@@ -283,9 +297,14 @@ class TranscriptionService:
         """Make API call with retry logic."""
         for attempt in range(MAX_RETRIES):
             try:
-                response = requests.post(endpoint, headers=headers, files=files, data=data, timeout=300)
+                with metrics.external_call('groq', 'transcription') as call:
+                    response = requests.post(endpoint, headers=headers, files=files, data=data, timeout=300)
+                    call.status = str(response.status_code)
                 
                 if response.status_code == 200:
+                    # response_format="text" answers with the plain transcript, not JSON
+                    if 'application/json' not in response.headers.get('Content-Type', ''):
+                        return {'text': response.text}
                     return response.json()
                 elif response.status_code == 429:  # Rate limit
                     wait_time = min(INITIAL_BACKOFF * (2 ** attempt), MAX_BACKOFF)
@@ -311,7 +330,7 @@ class TranscriptionService:
         try:
             logger.info(f"Transcrevendo segmento {segment_index + 1}")
             
-            endpoint = "https://api.groq.com/openai/v1/audio/transcriptions"
+            endpoint = f"{settings.GROQ_API_BASE_URL}/audio/transcriptions"
             headers = {"Authorization": f"Bearer {self.groq_api_key}"}
             
             with open(segment_path, 'rb') as audio_file:
@@ -405,7 +424,7 @@ class TranscriptionService:
     def transcribe_single_file(self, audio_path: str, model_id: str, include_timestamps: bool = True) -> Optional[str]:
         """Transcribe a single audio file (within size limits)."""
         try:
-            endpoint = "https://api.groq.com/openai/v1/audio/transcriptions"
+            endpoint = f"{settings.GROQ_API_BASE_URL}/audio/transcriptions"
             headers = {"Authorization": f"Bearer {self.groq_api_key}"}
             
             with open(audio_path, 'rb') as audio_file:
@@ -457,6 +476,7 @@ class YouTubeExtractorService:
                 transcription.transcription_text = transcript_text
                 transcription.title = title
                 transcription.language_detected = lang
+                transcription.language_code = detect_language(transcript_text, fallback=lang)
                 transcription.status = 'completed'
                 transcription.completed_at = timezone.now()
             else:
@@ -475,68 +495,179 @@ class YouTubeExtractorService:
 
 
 class AudioTranscriptionService:
-    """Service for audio/video transcription."""
+    """
+    Service for audio/video transcription.
+    Each method is one idempotent stage of the Celery pipeline in tasks.py
+    (probe -> extract -> segment -> transcribe segments -> merge). Intermediate
+    files live in a per-transcription work directory under MEDIA_ROOT so every
+    worker that shares the media volume can pick up any stage.
+    """
     
     def __init__(self):
         self.transcription_service = TranscriptionService()
     
-    def process_transcription(self, transcription: Transcription) -> bool:
-        """Process audio/video transcription with automatic segmentation for large files."""
-        try:
-            transcription.status = 'processing'
-            transcription.save()
-            
-            # Determine file path
-            if transcription.source_type == 'video_upload' and transcription.video_file:
-                file_path = transcription.video_file.path
-                temp_audio_file = tempfile.NamedTemporaryFile(suffix='.mp3', delete=False)
-                audio_path = self.transcription_service.extract_audio_from_video(
-                    file_path, temp_audio_file.name
+    def work_dir(self, transcription: Transcription) -> str:
+        path = os.path.join(settings.MEDIA_ROOT, 'transcriptions', 'work', str(transcription.id))
+        os.makedirs(path, exist_ok=True)
+        return path
+    
+    def cleanup_work_dir(self, transcription: Transcription) -> None:
+        shutil.rmtree(
+            os.path.join(settings.MEDIA_ROOT, 'transcriptions', 'work', str(transcription.id)),
+            ignore_errors=True
+        )
+    
+    def source_path(self, transcription: Transcription) -> str:
+        """Path of the uploaded file to transcribe."""
+        if transcription.source_type == 'video_upload' and transcription.video_file:
+            return transcription.video_file.path
+        if transcription.source_type == 'audio_upload' and transcription.audio_file:
+            return transcription.audio_file.path
+        raise Exception("Arquivo não encontrado")
+    
+    def probe(self, transcription: Transcription) -> Dict[str, Any]:
+        """Stage 1: check the source file and mark the transcription as processing."""
+        path = self.source_path(transcription)
+        if not os.path.exists(path):
+            raise Exception("Arquivo não encontrado")
+        
+        update_fields = ['status', 'file_size_mb', 'updated_at']
+        if transcription.duration_seconds is None:
+            # Uploads created before the preflight existed, or without ffprobe at upload time
+            media_probe = probe_media(path)
+            if media_probe is not None:
+                for field, value in media_probe.model_fields().items():
+                    setattr(transcription, field, value)
+                update_fields += list(media_probe.model_fields())
+        
+        transcription.status = 'processing'
+        transcription.file_size_mb = os.path.getsize(path) / (1024 * 1024)
+        transcription.save(update_fields=update_fields)
+        logger.info(f"Processando arquivo de {transcription.file_size_mb:.1f} MB")
+        return {'transcription_id': str(transcription.id), 'source_path': path}
+    
+    def extract_audio(self, transcription: Transcription, source_path: str) -> str:
+        """Stage 2: return the audio path, extracting it from the video once."""
+        if transcription.source_type != 'video_upload':
+            return source_path
+        
+        audio_path = os.path.join(self.work_dir(transcription), 'audio.mp3')
+        if os.path.exists(audio_path) and os.path.getsize(audio_path) > 0:
+            logger.info(f"Áudio já extraído para {transcription.id}, reutilizando")
+            return audio_path
+        
+        partial_path = f"{audio_path}.part.mp3"
+        profile = speech_encoding_profile(transcription)
+        if not self.transcription_service.extract_audio_from_video(source_path, partial_path, **profile):
+            raise Exception("Falha ao extrair áudio do vídeo")
+        os.replace(partial_path, audio_path)
+        return audio_path
+    
+    def split_segments(self, transcription: Transcription, audio_path: str) -> List[Dict[str, Any]]:
+        """
+        Stage 3: split the audio into Groq-sized segment files.
+        Files that fit the API limit are sent whole as a single segment.
+        Existing segment files from an earlier attempt are reused.
+        """
+        if self.transcription_service.check_groq_file_size(audio_path):
+            logger.info("Arquivo dentro do limite, transcrevendo diretamente")
+            return [{'index': 0, 'path': audio_path, 'start': 0.0, 'end': None}]
+        
+        logger.info("Arquivo muito grande, dividindo em segmentos")
+        work_dir = self.work_dir(transcription)
+        audio = AudioSegment.from_file(audio_path)
+        total_duration = len(audio)
+        num_segments = math.ceil(total_duration / SEGMENT_DURATION_MS)
+        logger.info(f"Dividindo áudio em {num_segments} segmentos de {SEGMENT_DURATION_MS/1000/60:.1f} minutos")
+        
+        transcription.duration_seconds = int(total_duration / 1000)
+        transcription.save(update_fields=['duration_seconds', 'updated_at'])
+        
+        profile = speech_encoding_profile(transcription)
+        segments = []
+        for i in range(num_segments):
+            start_ms = i * SEGMENT_DURATION_MS
+            end_ms = min((i + 1) * SEGMENT_DURATION_MS, total_duration)
+            segment_path = os.path.join(work_dir, f'segment_{i}.mp3')
+            
+            if not os.path.exists(segment_path):
+                partial_path = f"{segment_path}.part.mp3"
+                audio[start_ms:end_ms].export(
+                    partial_path, format="mp3", bitrate=profile['bitrate'],
+                    parameters=['-ac', str(profile['channels']), '-ar', str(profile['sample_rate'])]
                 )
-                temp_audio_file.close() # Close the file handle, but don't delete yet
-
-                if not audio_path:
-                    raise Exception("Falha ao extrair áudio do vídeo")
-                temp_audio_created = True
-            elif transcription.source_type == 'audio_upload' and transcription.audio_file:
-                audio_path = transcription.audio_file.path
-                temp_audio_created = False
-            else:
-                raise Exception("Arquivo não encontrado")
-            
-            # Log file size for debugging
-            file_size = os.path.getsize(audio_path)
-            logger.info(f"Processando arquivo de {file_size / (1024*1024):.1f} MB")
-            
-            # Transcribe with automatic segmentation
-            transcript_text = self.transcription_service.transcribe_audio_groq(
-                audio_path, 
+                if not self.transcription_service.check_groq_file_size(partial_path):
+                    # Try to reduce quality further
+                    if not self.transcription_service.reduce_audio_segment_size(partial_path, partial_path):
+                        logger.warning(f"Segmento {i} ainda muito grande após redução")
+                os.replace(partial_path, segment_path)
+            
+            segments.append({'index': i, 'path': segment_path, 'start': start_ms / 1000, 'end': end_ms / 1000})
+        return segments
+    
+    def transcribe_segment(self, transcription: Transcription, segment: Dict[str, Any], timeline=None) -> TranscriptionSegment:
+        """
+        Stage 4 (fan-out): transcribe one segment and store it as a TranscriptionSegment
+        holding only that segment's text.
+        Already stored segments are returned without calling the API again.
+        The Groq call and the DB save are recorded on `timeline` when given.
+        """
+        # The whole file, sent as a single segment, is stored with end_time == start_time
+        end_time = segment['end'] if segment['end'] is not None else segment['start']
+        existing = transcription.segments.filter(segment_number=segment['index']).first()
+        if existing is not None:
+            if existing.start_time == segment['start'] and existing.end_time == end_time:
+                return existing
+            # Left by an attempt that split the audio differently (e.g. the whole-file
+            # text as segment 0): reusing it would repeat text in the merge
+            logger.warning(f"Segmento {segment['index']} de {transcription.id} não corresponde à divisão atual, transcrevendo de novo")
+            existing.delete()
+        
+        with timeline.stage('groq_transcribe', f"segmento {segment['index']}") if timeline else nullcontext():
+            text = self.transcription_service.transcribe_audio_segment(
+                segment['path'],
                 transcription.model_used or 'whisper-large-v3-turbo',
+                segment['index'],
+                segment['start'],
                 transcription.include_timestamps
             )
-            
-            if transcript_text:
-                transcription.transcription_text = transcript_text
-                transcription.status = 'completed'
-                transcription.completed_at = timezone.now()
-                logger.info(f"Transcrição concluída com sucesso: {len(transcript_text)} caracteres")
-            else:
-                transcription.status = 'failed'
-                transcription.error_message = 'Falha na transcrição'
-            
-            # Cleanup temp file if created
-            if temp_audio_created:
-                try:
-                    os.unlink(audio_path)
-                except:
-                    pass
-            
-            transcription.save()
-            return transcription.status == 'completed'
-            
-        except Exception as e:
-            logger.error(f"Erro no processamento de transcrição: {e}")
+        if text is None:
+            raise Exception(f"Falha na transcrição do segmento {segment['index'] + 1}")
+        
+        with timeline.stage('save_segment', f"segmento {segment['index']}") if timeline else nullcontext():
+            stored, _ = TranscriptionSegment.objects.get_or_create(
+                transcription=transcription,
+                segment_number=segment['index'],
+                defaults={
+                    'start_time': segment['start'],
+                    'end_time': end_time,
+                    'text': text,
+                }
+            )
+        return stored
+    
+    def merge_segments(self, transcription: Transcription, expected_segments: int) -> bool:
+        """Stage 5: join the stored segments in order and complete the transcription."""
+        # Rows beyond the current split belong to an earlier attempt
+        segments = list(transcription.segments.filter(segment_number__lt=expected_segments).order_by('segment_number'))
+        texts = [segment.text for segment in segments if segment.text]
+        if len(segments) < expected_segments:
+            logger.warning(f"{expected_segments - len(segments)} segmento(s) sem transcrição para {transcription.id}")
+        
+        if texts:
+            transcript_text = '\n'.join(texts)
+            transcription.transcription_text = transcript_text
+            transcription.language_code = detect_language(transcript_text)
+            transcription.language_detected = transcription.language_code
+            transcription.status = 'completed'
+            transcription.error_message = None
+            transcription.completed_at = timezone.now()
+            logger.info(f"Transcrição completa: {len(segments)} segmentos processados, {len(transcript_text)} caracteres")
+        else:
+            logger.error("Nenhum segmento foi transcrito com sucesso")
             transcription.status = 'failed'
-            transcription.error_message = str(e)
-            transcription.save()
-            return False 
\ No newline at end of file
+            transcription.error_message = 'Falha na transcrição'
+        
+        transcription.save()
+        self.cleanup_work_dir(transcription)
+        return transcription.status == 'completed'
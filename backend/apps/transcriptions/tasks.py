@@ -1,9 +1,15 @@
 """
 Celery tasks for transcription processing.
 """
-from celery import shared_task
+from celery import chain, chord, group, shared_task
+from celery.exceptions import Ignore
 from django.utils import timezone
+from apps.content_generation.models import ContentGeneration
+from apps.content_generation.tasks import process_content_generation, redispatch_content_generation
+from your_social_media import metrics, profiling, scheduling
+from .media_probe import MediaProbeError
 from .models import Transcription
+from .timeline import Timeline, close_queue_wait, job_timeline, open_queue_wait, record_processing_time
 from .services import YouTubeExtractorService, AudioTranscriptionService
 import logging
 
@@ -11,13 +17,20 @@ logger = logging.getLogger(__name__)
 
 
 @shared_task(bind=True, max_retries=3)
+@profiling.profile_task('transcription')
 def process_youtube_transcription(self, transcription_id):
     """Process YouTube video transcription."""
+    if not scheduling.start_job('transcription', transcription_id, self.request.id):
+        raise Ignore()
+    
+    close_queue_wait(transcription_id)
     try:
         transcription = Transcription.objects.get(id=transcription_id)
         service = YouTubeExtractorService()
         
-        success = service.extract_transcript(transcription)
+        with job_timeline(transcription_id) as timeline, timeline.stage('youtube_extract'):
+            success = service.extract_transcript(transcription)
+        record_processing_time(transcription_id)
         
         if success:
             return {
@@ -61,52 +74,223 @@ def process_youtube_transcription(self, transcription_id):
         }
 
 
-@shared_task(bind=True, max_retries=3)
-def process_audio_transcription(self, transcription_id):
-    """Process audio/video file transcription."""
+def _fail_audio_stage(task, transcription_id, exc, stage):
+    """Retry the current stage only; after the last retry mark the transcription as failed."""
+    logger.error(f"[AUDIO-PIPELINE] Erro na etapa {stage} da transcrição {transcription_id}: {exc}")
+    if task.request.retries < task.max_retries:
+        raise task.retry(countdown=60 * (2 ** task.request.retries), exc=exc)
+    
     try:
         transcription = Transcription.objects.get(id=transcription_id)
-        service = AudioTranscriptionService()
-        
-        success = service.process_transcription(transcription)
-        
-        if success:
-            return {
-                'status': 'success',
-                'transcription_id': str(transcription_id),
-                'message': 'Transcrição de áudio concluída com sucesso'
-            }
-        else:
-            return {
-                'status': 'failed',
-                'transcription_id': str(transcription_id),
-                'message': 'Falha na transcrição do áudio'
-            }
-            
+        transcription.status = 'failed'
+        transcription.error_message = f"Falha após {task.max_retries} tentativas ({stage}): {str(exc)}"
+        transcription.save()
+    except:
+        pass
+    
+    return {
+        'status': 'error',
+        'transcription_id': str(transcription_id),
+        'message': f'Erro após {task.max_retries} tentativas: {str(exc)}'
+    }
+
+
+# Media stages (routed to the prefork "media" queue) are acknowledged only after
+# they finish, so a worker killed mid-transcode hands the stage to another
+# worker; the stages are idempotent, so running one twice is safe.
+@shared_task(bind=True, max_retries=3, acks_late=True, reject_on_worker_lost=True)
+@profiling.profile_task('transcription')
+def probe_audio(self, transcription_id):
+    """Stage 1: validate the uploaded file."""
+    if not scheduling.start_job('transcription', transcription_id, self.request.id):
+        raise Ignore()
+    
+    close_queue_wait(transcription_id)
+    timeline = Timeline(transcription_id)
+    try:
+        transcription = Transcription.objects.get(id=transcription_id)
+        with timeline.stage('probe'):
+            result = AudioTranscriptionService().probe(transcription)
+        return dict(result, status='success')
     except Transcription.DoesNotExist:
         logger.error(f"Transcrição {transcription_id} não encontrada")
         return {
             'status': 'error',
             'message': 'Transcrição não encontrada'
         }
+    except MediaProbeError as exc:
+        # Unusable media will not get better on retry
+        logger.error(f"[AUDIO-PIPELINE] Mídia inválida na transcrição {transcription_id}: {exc}")
+        Transcription.objects.filter(id=transcription_id).update(status='failed', error_message=str(exc))
+        return {
+            'status': 'error',
+            'transcription_id': str(transcription_id),
+            'message': str(exc)
+        }
     except Exception as exc:
-        logger.error(f"Erro no processamento da transcrição de áudio {transcription_id}: {exc}")
-        
-        # Retry logic
+        return _fail_audio_stage(self, transcription_id, exc, 'probe')
+    finally:
+        timeline.flush()
+
+
+@shared_task(bind=True, max_retries=3, acks_late=True, reject_on_worker_lost=True)
+@profiling.profile_task('transcription')
+def extract_audio(self, probe_result):
+    """Stage 2: extract the audio track from videos (no-op for audio uploads)."""
+    if probe_result.get('status') != 'success':
+        return probe_result
+    
+    transcription_id = probe_result['transcription_id']
+    timeline = Timeline(transcription_id)
+    try:
+        transcription = Transcription.objects.get(id=transcription_id)
+        with timeline.stage('extract_audio'):
+            audio_path = AudioTranscriptionService().extract_audio(transcription, probe_result['source_path'])
+        return {'status': 'success', 'transcription_id': transcription_id, 'audio_path': audio_path}
+    except Exception as exc:
+        return _fail_audio_stage(self, transcription_id, exc, 'extract')
+    finally:
+        timeline.flush()
+
+
+@shared_task(bind=True, max_retries=3, acks_late=True, reject_on_worker_lost=True)
+@profiling.profile_task('transcription')
+def segment_audio(self, extract_result):
+    """
+    Stage 3: split the audio and replace this task with a chord that
+    transcribes every segment in parallel and then merges them.
+    """
+    if extract_result.get('status') != 'success':
+        return extract_result
+    
+    transcription_id = extract_result['transcription_id']
+    timeline = Timeline(transcription_id)
+    try:
+        transcription = Transcription.objects.get(id=transcription_id)
+        with timeline.stage('split'):
+            segments = AudioTranscriptionService().split_segments(transcription, extract_result['audio_path'])
+    except Exception as exc:
+        return _fail_audio_stage(self, transcription_id, exc, 'segment')
+    finally:
+        timeline.flush()
+    
+    metrics.TRANSCRIPTION_SEGMENTS.observe(len(segments))
+    logger.info(f"[AUDIO-PIPELINE] {len(segments)} segmento(s) distribuídos para a transcrição {transcription_id}")
+    fan_out = group(transcribe_audio_segment.si(transcription_id, segment) for segment in segments)
+    return self.replace(chord(fan_out, merge_transcription_segments.s(transcription_id, len(segments))))
+
+
+@shared_task(bind=True, max_retries=3)
+@profiling.profile_task('transcription')
+def transcribe_audio_segment(self, transcription_id, segment):
+    """Stage 4: transcribe one segment. Failures never break the chord; merge decides."""
+    timeline = Timeline(transcription_id)
+    try:
+        transcription = Transcription.objects.get(id=transcription_id)
+        AudioTranscriptionService().transcribe_segment(transcription, segment, timeline)
+        metrics.TRANSCRIPTION_SEGMENT_RESULTS.labels('success').inc()
+        return {'status': 'success', 'segment': segment['index']}
+    except Exception as exc:
+        logger.error(f"[AUDIO-PIPELINE] Erro no segmento {segment['index'] + 1} da transcrição {transcription_id}: {exc}")
         if self.request.retries < self.max_retries:
+            metrics.TRANSCRIPTION_SEGMENT_RESULTS.labels('retry').inc()
             raise self.retry(countdown=60 * (2 ** self.request.retries), exc=exc)
-        
-        # Mark as failed after max retries
-        try:
-            transcription = Transcription.objects.get(id=transcription_id)
-            transcription.status = 'failed'
-            transcription.error_message = f"Falha após {self.max_retries} tentativas: {str(exc)}"
-            transcription.save()
-        except:
-            pass
-        
+        metrics.TRANSCRIPTION_SEGMENT_RESULTS.labels('error').inc()
+        return {'status': 'error', 'segment': segment['index'], 'message': str(exc)}
+    finally:
+        timeline.flush()
+
+
+@shared_task(bind=True, max_retries=3)
+@profiling.profile_task('transcription', job_arg=1)
+def merge_transcription_segments(self, segment_results, transcription_id, expected_segments):
+    """Stage 5: join the transcribed segments and complete the transcription."""
+    timeline = Timeline(transcription_id)
+    try:
+        transcription = Transcription.objects.get(id=transcription_id)
+        with timeline.stage('merge'):
+            success = AudioTranscriptionService().merge_segments(transcription, expected_segments)
+    except Exception as exc:
+        return _fail_audio_stage(self, transcription_id, exc, 'merge')
+    finally:
+        timeline.flush()
+    record_processing_time(transcription_id)
+    
+    if success:
         return {
-            'status': 'error',
+            'status': 'success',
             'transcription_id': str(transcription_id),
-            'message': f'Erro após {self.max_retries} tentativas: {str(exc)}'
-        } 
\ No newline at end of file
+            'message': 'Transcrição de áudio concluída com sucesso'
+        }
+    return {
+        'status': 'failed',
+        'transcription_id': str(transcription_id),
+        'message': 'Falha na transcrição do áudio'
+    }
+
+
+def audio_transcription_pipeline(transcription_id):
+    """Signature of the staged audio pipeline: probe -> extract -> segment -> fan-out -> merge."""
+    return chain(
+        probe_audio.si(str(transcription_id)),
+        extract_audio.s(),
+        segment_audio.s(),
+    )
+
+
+@shared_task(bind=True)
+def process_audio_transcription(self, transcription_id):
+    """Process audio/video file transcription through the staged pipeline."""
+    return self.replace(audio_transcription_pipeline(transcription_id))
+
+
+def transcription_workflow(transcription, content_generation=None):
+    """
+    Build the Celery signature that processes a transcription.
+    When a content generation was requested up front it is chained right after,
+    so generation starts as soon as the transcription text is saved.
+    """
+    if transcription.source_type == 'youtube':
+        workflow = process_youtube_transcription.si(str(transcription.id))
+    else:
+        workflow = audio_transcription_pipeline(transcription.id)
+    if content_generation is not None:
+        workflow = chain(workflow, process_content_generation.si(str(content_generation.id)))
+    return workflow
+
+
+def dispatch_transcription(transcription, content_generation=None):
+    """Publish the transcription workflow with a priority from the owner's plan and the job size."""
+    priority = scheduling.base_priority(
+        scheduling.plan_of(transcription.user),
+        scheduling.transcription_cost_seconds(transcription)
+    )
+    open_queue_wait(transcription.id)
+    return scheduling.dispatch_job(
+        'transcription',
+        transcription.id,
+        transcription_workflow(transcription, content_generation),
+        priority,
+        extra={'content_generation_id': str(content_generation.id) if content_generation else None}
+    )
+
+
+def redispatch_transcription(transcription_id, extra):
+    """Rebuild the workflow of a transcription that is still waiting (age boost)."""
+    transcription = Transcription.objects.filter(id=transcription_id, status='pending').first()
+    if transcription is None:
+        return None
+    content_generation = None
+    if extra.get('content_generation_id'):
+        content_generation = ContentGeneration.objects.filter(id=extra['content_generation_id']).first()
+    return transcription_workflow(transcription, content_generation)
+
+
+@shared_task(bind=True)
+def boost_waiting_jobs(self):
+    """Periodic: re-publish long-waiting jobs with a better priority (anti-starvation)."""
+    boosted = scheduling.boost_waiting_jobs({
+        'transcription': redispatch_transcription,
+        'content_generation': redispatch_content_generation,
+    })
+    return {'status': 'success', 'boosted': boosted}
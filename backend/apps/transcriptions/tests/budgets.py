@@ -0,0 +1,189 @@
+"""
+Shared data set and assertions for the query-count and response-size budget tests.
+The catalog is sized like a busy production account (thousands of transcriptions
+with long transcripts, segments and content generations) so that a per-row query
+or a full-text column on a list page shows up as a budget failure, not as noise.
+"""
+import itertools
+from types import SimpleNamespace
+from typing import Iterable, Optional
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from apps.content_generation.models import (
+    ContentGeneration, ContentGenerationBatch, GeneratedChapter, GeneratedPart, GeneratedTitle, LLMCall,
+)
+from apps.transcriptions.models import StageTiming, Transcription, TranscriptionSegment
+from apps.users.models import User
+
+SEED_USERS = 25
+SEED_TRANSCRIPTIONS = 2000
+SEED_SEGMENTS_PER_TRANSCRIPTION = 4
+SEED_CONTENT_GENERATIONS = 1000
+TRANSCRIPT_CHARS = 8000
+GENERATED_CONTENT_CHARS = 6000
+BATCH_SIZE = 500
+PASSWORD = 'budget-test-password'
+
+_WORDS = 'o vídeo explica como gravar áudio limpo editar cortes publicar e medir resultados'.split()
+
+
+def long_text(chars: int, offset: int = 0) -> str:
+    words = itertools.islice(itertools.cycle(_WORDS), offset % len(_WORDS), None)
+    text = []
+    size = 0
+    for word in words:
+        if size >= chars:
+            break
+        text.append(word)
+        size += len(word) + 1
+    return ' '.join(text)
+
+
+def seed_catalog() -> SimpleNamespace:
+    """Create the budget data set and return the objects the tests address directly."""
+    now = timezone.now()
+    users = User.objects.bulk_create([
+        User(username=f'budget{i}', email=f'budget{i}@example.com', plan='premium' if i % 5 == 0 else 'free')
+        for i in range(SEED_USERS)
+    ])
+    owner = users[0]
+    owner.set_password(PASSWORD)
+    owner.save(update_fields=['password'])
+
+    transcriptions = Transcription.objects.bulk_create([
+        Transcription(
+            user=users[i % SEED_USERS],
+            source_type=('youtube', 'audio_upload', 'video_upload')[i % 3],
+            source_url=f'https://www.youtube.com/watch?v=budget{i}' if i % 3 == 0 else None,
+            original_filename=None if i % 3 == 0 else f'episodio_{i}.mp3',
+            status='completed' if i % 10 else 'failed',
+            model_used='whisper-large-v3-turbo',
+            language_detected='Português',
+            language_code='pt',
+            title=f'Episódio {i}: {long_text(80, i)}',
+            transcription_text=long_text(TRANSCRIPT_CHARS, i) if i % 10 else None,
+            duration_seconds=600 + i,
+            file_size_mb=12.5,
+            completed_at=now if i % 10 else None,
+        )
+        for i in range(SEED_TRANSCRIPTIONS)
+    ], batch_size=BATCH_SIZE)
+
+    segment_chars = TRANSCRIPT_CHARS // SEED_SEGMENTS_PER_TRANSCRIPTION
+    TranscriptionSegment.objects.bulk_create([
+        TranscriptionSegment(
+            transcription=transcription,
+            segment_number=number,
+            start_time=number * 600.0,
+            end_time=(number + 1) * 600.0,
+            text=long_text(segment_chars, number),
+        )
+        for transcription in transcriptions
+        for number in range(SEED_SEGMENTS_PER_TRANSCRIPTION)
+    ], batch_size=BATCH_SIZE)
+
+    completed = [transcription for transcription in transcriptions if transcription.status == 'completed']
+    batch = ContentGenerationBatch.objects.create(user=owner, total=50)
+    content_generations = ContentGeneration.objects.bulk_create([
+        ContentGeneration(
+            user=users[i % SEED_USERS],
+            transcription=completed[i % len(completed)],
+            batch=batch if i < batch.total else None,
+            content_type=('titles', 'description', 'chapters', 'complete')[i % 4],
+            status='completed' if i % 10 else 'failed',
+            language_detected='Português',
+            generated_content=long_text(GENERATED_CONTENT_CHARS, i),
+            completed_at=now if i % 10 else None,
+        )
+        for i in range(SEED_CONTENT_GENERATIONS)
+    ], batch_size=BATCH_SIZE)
+
+    # Structured output for a tenth of the generations, as a complete package would have
+    detailed = content_generations[::10]
+    GeneratedTitle.objects.bulk_create([
+        GeneratedTitle(content_generation=generation, title_type=title_type, title_text=long_text(60, n),
+                       justification=long_text(200, n), keywords=['áudio', 'edição'])
+        for generation in detailed
+        for n, title_type in enumerate(('seo', 'curiosity', 'benefit', 'question', 'list'))
+    ], batch_size=BATCH_SIZE)
+    GeneratedChapter.objects.bulk_create([
+        GeneratedChapter(content_generation=generation, chapter_number=n + 1, timestamp=f'00:{n * 5:02d}:00',
+                         title=long_text(40, n), description=long_text(150, n))
+        for generation in detailed
+        for n in range(6)
+    ], batch_size=BATCH_SIZE)
+    GeneratedPart.objects.bulk_create([
+        GeneratedPart(content_generation=generation, part=part, status='completed',
+                      content=long_text(GENERATED_CONTENT_CHARS // 3, n), prompt_version=f'{part}:v2')
+        for generation in detailed
+        for n, part in enumerate(('titles', 'description', 'chapters'))
+    ], batch_size=BATCH_SIZE)
+    LLMCall.objects.bulk_create([
+        LLMCall(content_generation=generation, part=part, provider='gemini', model='gemini-2.0-flash',
+                status='success', latency_ms=1500 + n * 100, ttft_ms=400, prompt_tokens=3000, output_tokens=500)
+        for generation in detailed
+        for n, part in enumerate(('titles', 'description', 'chapters'))
+    ], batch_size=BATCH_SIZE)
+
+    transcription = detailed[0].transcription
+    StageTiming.objects.bulk_create([
+        StageTiming(transcription=transcription, stage=stage, started_at_ns=n * 10 ** 9, duration_ns=10 ** 9)
+        for n, stage in enumerate(('upload', 'queue_wait', 'probe', 'extract_audio', 'split', 'groq_transcribe', 'merge'))
+    ])
+
+    return SimpleNamespace(
+        owner=owner,
+        transcription=transcription,
+        failed_transcription=next(t for t in transcriptions if t.status == 'failed'),
+        content_generation=detailed[0],
+        failed_content_generation=next(g for g in content_generations if g.status == 'failed'),
+        batch=batch,
+    )
+
+
+class QueryBudgetTestCase(APITestCase):
+    """Seeds the catalog once per class and checks endpoints against their budgets."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.catalog = seed_catalog()
+
+    def assertWithinBudget(self, method: str, url: str, max_queries: int, max_bytes: int, data=None,
+                           expected_status: int = 200, unfetched_columns: Iterable[str] = ()):
+        """
+        Call the endpoint and assert its status, number of queries, response size
+        and that none of `unfetched_columns` is selected by any query.
+        """
+        with CaptureQueriesContext(connection) as queries:
+            response = getattr(self.client, method)(url, data, format='json')
+
+        self.assertEqual(response.status_code, expected_status, response.content[:500])
+        executed = [query['sql'] for query in queries.captured_queries]
+        self.assertLessEqual(
+            len(executed), max_queries,
+            f"{method.upper()} {url}: {len(executed)} queries (budget {max_queries})\n" + '\n'.join(executed)
+        )
+        self.assertLessEqual(
+            len(response.content), max_bytes,
+            f"{method.upper()} {url}: {len(response.content)} bytes (budget {max_bytes})"
+        )
+        for column in unfetched_columns:
+            offending = self._selecting(executed, column)
+            if offending:
+                self.fail(f"{method.upper()} {url} selects {column}: {offending}")
+        return response
+
+    @staticmethod
+    def _selecting(executed, column: str) -> Optional[str]:
+        """First query that selects `column` (filtering on it in WHERE is fine)."""
+        for sql in executed:
+            if not sql.lstrip().upper().startswith('SELECT'):
+                continue
+            select_list = sql.split(' FROM ', 1)[0]
+            if f'"{column}"' in select_list:
+                return sql
+        return None
@@ -0,0 +1,63 @@
+"""
+Query-count and response-size budgets for the transcription endpoints.
+"""
+from unittest import mock
+
+from django.test import override_settings
+
+from .budgets import QueryBudgetTestCase
+
+LIST_URL = '/api/transcriptions/'
+
+
+@override_settings(ADMISSION_CONTROL_ENABLED=False)
+class TranscriptionQueryBudgetTests(QueryBudgetTestCase):
+
+    def test_list(self):
+        response = self.assertWithinBudget('get', LIST_URL, max_queries=2, max_bytes=12 * 1024,
+                                           unfetched_columns=['transcription_text'])
+        self.assertEqual(len(response.data['results']), 20)
+
+    def test_list_filtered_searched_and_ordered(self):
+        url = f'{LIST_URL}?status=completed&source_type=audio_upload&search=episodio&ordering=-duration_seconds&page=3'
+        self.assertWithinBudget('get', url, max_queries=2, max_bytes=12 * 1024,
+                                unfetched_columns=['transcription_text'])
+
+    def test_detail(self):
+        transcription = self.catalog.transcription
+        response = self.assertWithinBudget('get', f'{LIST_URL}{transcription.id}/', max_queries=2, max_bytes=24 * 1024)
+        self.assertEqual(len(response.data['segments']), 4)
+
+    def test_status(self):
+        transcription = self.catalog.transcription
+        self.assertWithinBudget('get', f'{LIST_URL}{transcription.id}/status/', max_queries=2, max_bytes=24 * 1024)
+
+    def test_timeline(self):
+        transcription = self.catalog.transcription
+        response = self.assertWithinBudget('get', f'{LIST_URL}{transcription.id}/timeline/', max_queries=2,
+                                           max_bytes=4 * 1024)
+        self.assertEqual(len(response.data['stages']), 7)
+
+    def test_stats(self):
+        response = self.assertWithinBudget('get', f'{LIST_URL}stats/', max_queries=1, max_bytes=512)
+        self.assertEqual(response.data['total_transcriptions'], 2000)
+
+    def test_create_youtube(self):
+        data = {'source_type': 'youtube', 'source_url': 'https://www.youtube.com/watch?v=dQw4w9WgXcQ'}
+        with mock.patch('apps.transcriptions.views.dispatch_transcription') as dispatch:
+            self.assertWithinBudget('post', f'{LIST_URL}create/', max_queries=4, max_bytes=4 * 1024, data=data,
+                                    expected_status=201)
+        dispatch.assert_called_once()
+
+    def test_retry(self):
+        transcription = self.catalog.failed_transcription
+        with mock.patch('apps.transcriptions.views.dispatch_transcription') as dispatch:
+            self.assertWithinBudget('post', f'{LIST_URL}{transcription.id}/retry/', max_queries=3, max_bytes=1024)
+        dispatch.assert_called_once()
+
+    def test_delete_pending_preview(self):
+        self.assertWithinBudget('post', f'{LIST_URL}delete-pending/', max_queries=1, max_bytes=4 * 1024)
+
+    def test_delete(self):
+        transcription = self.catalog.failed_transcription
+        self.assertWithinBudget('delete', f'{LIST_URL}{transcription.id}/delete/', max_queries=5, max_bytes=512)
@@ -0,0 +1,160 @@
+"""
+Per-job stage timeline for transcriptions.
+Each stage records its wall-clock start (to order stages that ran in different
+processes or hosts) and a duration measured with the monotonic clock. Entries
+are buffered per task and written in one bulk insert.
+"""
+import logging
+import socket
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+from django.utils import timezone
+
+from .models import StageTiming, Transcription
+
+logger = logging.getLogger(__name__)
+
+QUEUE_WAIT_STAGE = 'queue_wait'
+_HOSTNAME = socket.gethostname()
+
+
+class Timeline:
+    """Collects StageTiming rows for one transcription inside one task or request."""
+
+    def __init__(self, transcription_id):
+        self.transcription_id = transcription_id
+        self.entries: List[StageTiming] = []
+
+    @contextmanager
+    def stage(self, name: str, detail: str = ''):
+        started_at_ns = time.time_ns()
+        start = time.monotonic_ns()
+        status = 'ok'
+        try:
+            yield
+        except BaseException:
+            status = 'error'
+            raise
+        finally:
+            self.entries.append(StageTiming(
+                transcription_id=self.transcription_id,
+                stage=name,
+                detail=str(detail)[:100],
+                status=status,
+                started_at_ns=started_at_ns,
+                duration_ns=time.monotonic_ns() - start,
+                worker=_HOSTNAME,
+            ))
+
+    def add(self, name: str, started_at_ns: int, duration_ns: int, detail: str = '') -> None:
+        """Record a stage measured by the caller."""
+        self.entries.append(StageTiming(
+            transcription_id=self.transcription_id,
+            stage=name,
+            detail=str(detail)[:100],
+            started_at_ns=started_at_ns,
+            duration_ns=duration_ns,
+            worker=_HOSTNAME,
+        ))
+
+    def flush(self) -> None:
+        """Write the buffered stages. Timeline failures never break the job."""
+        if not self.entries:
+            return
+        try:
+            StageTiming.objects.bulk_create(self.entries)
+        except Exception as e:
+            logger.warning(f"[TIMELINE] Falha ao salvar etapas de {self.transcription_id}: {e}")
+        self.entries = []
+
+
+@contextmanager
+def job_timeline(transcription_id):
+    """Timeline for the duration of a task; flushed even when the task fails."""
+    timeline = Timeline(transcription_id)
+    try:
+        yield timeline
+    finally:
+        timeline.flush()
+
+
+def open_queue_wait(transcription_id) -> None:
+    """Mark the moment a job is published; closed by the first task that picks it up."""
+    try:
+        StageTiming.objects.create(
+            transcription_id=transcription_id,
+            stage=QUEUE_WAIT_STAGE,
+            started_at_ns=time.time_ns(),
+            worker=_HOSTNAME,
+        )
+    except Exception as e:
+        logger.warning(f"[TIMELINE] Falha ao abrir espera na fila de {transcription_id}: {e}")
+
+
+def close_queue_wait(transcription_id) -> None:
+    """Set the duration of the open queue-wait stage (wall clock: it spans processes)."""
+    try:
+        entry = (
+            StageTiming.objects.filter(transcription_id=transcription_id, stage=QUEUE_WAIT_STAGE, duration_ns__isnull=True)
+            .order_by('-started_at_ns')
+            .first()
+        )
+        if entry is not None:
+            StageTiming.objects.filter(pk=entry.pk).update(duration_ns=max(0, time.time_ns() - entry.started_at_ns))
+    except Exception as e:
+        logger.warning(f"[TIMELINE] Falha ao fechar espera na fila de {transcription_id}: {e}")
+
+
+def record_processing_time(transcription_id) -> Optional[float]:
+    """
+    Fill Transcription.processing_time_seconds: from the first stage after the
+    latest queue wait up to now (queue time and upload are excluded).
+    Returns None when there is nothing to measure or the write failed.
+    """
+    try:
+        stages = StageTiming.objects.filter(transcription_id=transcription_id)
+        last_wait = stages.filter(stage=QUEUE_WAIT_STAGE).order_by('-started_at_ns').first()
+        if last_wait is not None:
+            stages = stages.filter(started_at_ns__gt=last_wait.started_at_ns).exclude(stage=QUEUE_WAIT_STAGE)
+        first = stages.order_by('started_at_ns').values_list('started_at_ns', flat=True).first()
+        if first is None:
+            return None
+        seconds = round((time.time_ns() - first) / 1e9, 3)
+        Transcription.objects.filter(id=transcription_id).update(processing_time_seconds=seconds, updated_at=timezone.now())
+        return seconds
+    except Exception as e:
+        logger.warning(f"[TIMELINE] Falha ao registrar tempo de processamento de {transcription_id}: {e}")
+        return None
+
+
+def waterfall(transcription: Transcription) -> Dict:
+    """Timeline as a waterfall: offsets from the first stage, in milliseconds."""
+    stages = list(transcription.stage_timings.order_by('started_at_ns'))
+    origin = stages[0].started_at_ns if stages else 0
+    end = max(
+        (stage.started_at_ns + (stage.duration_ns or 0) for stage in stages),
+        default=origin
+    )
+    by_stage: Dict[str, float] = {}
+    for stage in stages:
+        by_stage[stage.stage] = by_stage.get(stage.stage, 0) + (stage.duration_ns or 0) / 1e6
+    return {
+        'transcription_id': str(transcription.id),
+        'status': transcription.status,
+        'processing_time_seconds': transcription.processing_time_seconds,
+        'total_ms': round((end - origin) / 1e6, 1),
+        'totals_by_stage_ms': {name: round(total, 1) for name, total in by_stage.items()},
+        'stages': [
+            {
+                'stage': stage.stage,
+                'detail': stage.detail,
+                'status': stage.status,
+                'offset_ms': round((stage.started_at_ns - origin) / 1e6, 1),
+                'duration_ms': round(stage.duration_ns / 1e6, 1) if stage.duration_ns is not None else None,
+                'worker': stage.worker,
+            }
+            for stage in stages
+        ],
+    }
@@ -16,6 +16,7 @@ urlpatterns = [
     # Transcription status and actions
     path('<uuid:transcription_id>/status/', views.transcription_status_view, name='transcription-status'),
     path('<uuid:transcription_id>/retry/', views.retry_transcription_view, name='transcription-retry'),
+    path('<uuid:transcription_id>/timeline/', views.transcription_timeline_view, name='transcription-timeline'),
     
     # Bulk operations
     path('delete-pending/', views.delete_pending_transcriptions_view, name='delete-pending-transcriptions'),
@@ -5,20 +5,25 @@ from rest_framework import generics, status, permissions
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework.parsers import MultiPartParser, FormParser, JSONParser
+from django.db.models import Count, Q
 from django.shortcuts import get_object_or_404
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.filters import SearchFilter, OrderingFilter
 from django.utils import timezone
 from datetime import timedelta
 import logging
+import time
 
 from .models import Transcription
 from .serializers import (
     TranscriptionCreateSerializer,
     TranscriptionDetailSerializer,
-    TranscriptionListSerializer
+    TranscriptionListSerializer,
+    TRANSCRIPTION_LIST_COLUMNS
 )
-from .tasks import process_youtube_transcription, process_audio_transcription
+from .tasks import dispatch_transcription
+from .timeline import Timeline, waterfall
+from your_social_media.admission import check_admission, too_busy_response
 
 logger = logging.getLogger(__name__)
 
@@ -43,14 +48,18 @@ class TranscriptionCreateView(generics.CreateAPIView):
         
         transcription.save()
         
-        # Start processing task
+        # Request parsing, preflight and file storage, measured from the start of create()
+        upload_timeline = Timeline(transcription.id)
+        upload_timeline.add('upload', self.upload_started_at_ns, time.monotonic_ns() - self.upload_started_monotonic_ns)
+        upload_timeline.flush()
+        
+        # Start processing task (chained into content generation when one was requested)
         try:
-            if transcription.source_type == 'youtube':
-                task = process_youtube_transcription.delay(str(transcription.id))
-                logger.info(f"Started YouTube transcription task {task.id} for {transcription.id}")
-            else:
-                task = process_audio_transcription.delay(str(transcription.id))
-                logger.info(f"Started audio transcription task {task.id} for {transcription.id}")
+            content_generation = transcription.pending_content_generation
+            task = dispatch_transcription(transcription, content_generation)
+            logger.info(f"Started {transcription.source_type} transcription workflow {task.id} for {transcription.id}")
+            if content_generation is not None:
+                logger.info(f"Content generation {content_generation.id} chained after transcription {transcription.id}")
         except Exception as e:
             logger.error(f"Failed to start transcription task: {e}")
             transcription.status = 'failed'
@@ -59,6 +68,13 @@ class TranscriptionCreateView(generics.CreateAPIView):
     
     def create(self, request, *args, **kwargs):
         """Override create to handle errors properly."""
+        # Checked before the upload is parsed so a full queue does not store the file
+        admission = check_admission('transcription')
+        if not admission.admitted:
+            return too_busy_response(admission)
+        
+        self.upload_started_at_ns = time.time_ns()
+        self.upload_started_monotonic_ns = time.monotonic_ns()
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         
@@ -70,11 +86,16 @@ class TranscriptionCreateView(generics.CreateAPIView):
             transcription = serializer.instance
             response_serializer = TranscriptionDetailSerializer(transcription)
             
+            response_data = {
+                'message': 'Transcrição criada com sucesso. Processamento iniciado.',
+                'transcription': response_serializer.data,
+                **admission.as_dict()
+            }
+            if transcription.pending_content_generation is not None:
+                response_data['content_generation_id'] = str(transcription.pending_content_generation.id)
+            
             return Response(
-                {
-                    'message': 'Transcrição criada com sucesso. Processamento iniciado.',
-                    'transcription': response_serializer.data
-                },
+                response_data,
                 status=status.HTTP_201_CREATED,
                 headers=headers
             )
@@ -92,14 +113,14 @@ class TranscriptionListView(generics.ListAPIView):
     serializer_class = TranscriptionListSerializer
     permission_classes = [permissions.AllowAny]
     filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
-    filterset_fields = ['status', 'source_type', 'language_detected']
+    filterset_fields = ['status', 'source_type', 'language_detected', 'language_code']
     search_fields = ['title', 'original_filename']
     ordering_fields = ['created_at', 'completed_at', 'file_size_mb', 'duration_seconds']
     ordering = ['-created_at']
     
     def get_queryset(self):
-        """Get all transcriptions."""
-        return Transcription.objects.all()
+        """Get all transcriptions (list columns only)."""
+        return Transcription.objects.only(*TRANSCRIPTION_LIST_COLUMNS)
 
 
 class TranscriptionDetailView(generics.RetrieveAPIView):
@@ -110,8 +131,8 @@ class TranscriptionDetailView(generics.RetrieveAPIView):
     lookup_field = 'id'
     
     def get_queryset(self):
-        """Get all transcriptions."""
-        return Transcription.objects.all()
+        """Get all transcriptions with their owner and segments."""
+        return Transcription.objects.select_related('user').prefetch_related('segments')
 
 
 class TranscriptionDeleteView(generics.DestroyAPIView):
@@ -140,7 +161,7 @@ def transcription_status_view(request, transcription_id):
     """Get transcription status."""
     try:
         transcription = get_object_or_404(
-            Transcription,
+            Transcription.objects.select_related('user').prefetch_related('segments'),
             id=transcription_id
         )
         
@@ -155,6 +176,22 @@ def transcription_status_view(request, transcription_id):
         )
 
 
+@api_view(['GET'])
+@permission_classes([permissions.AllowAny])
+def transcription_timeline_view(request, transcription_id):
+    """Per-stage waterfall of a transcription job (upload, queue wait, pipeline stages, API calls)."""
+    transcription = get_object_or_404(Transcription, id=transcription_id)
+    try:
+        return Response(waterfall(transcription))
+        
+    except Exception as e:
+        logger.error(f"Error getting transcription timeline: {e}")
+        return Response(
+            {'error': 'Erro ao buscar linha do tempo da transcrição'},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+
 @api_view(['POST'])
 @permission_classes([permissions.AllowAny])
 def retry_transcription_view(request, transcription_id):
@@ -177,11 +214,18 @@ def retry_transcription_view(request, transcription_id):
         transcription.retry_count += 1
         transcription.save()
         
+        # A content package requested up front failed without reaching the providers
+        # when the transcription failed; chain it again after the retry
+        content_generation = transcription.content_generations.filter(
+            status='failed', parts__isnull=True
+        ).order_by('-created_at').first()
+        if content_generation is not None:
+            content_generation.status = 'pending'
+            content_generation.error_message = None
+            content_generation.save(update_fields=['status', 'error_message', 'updated_at'])
+        
         # Start processing task
-        if transcription.source_type == 'youtube':
-            task = process_youtube_transcription.delay(str(transcription.id))
-        else:
-            task = process_audio_transcription.delay(str(transcription.id))
+        task = dispatch_transcription(transcription, content_generation)
         
         logger.info(f"Retrying transcription {transcription.id}, task {task.id}")
         
@@ -308,15 +352,13 @@ def delete_pending_transcriptions_view(request):
 def user_transcription_stats_view(request):
     """Get transcription statistics."""
     try:
-        transcriptions = Transcription.objects.all()
-        
-        stats = {
-            'total_transcriptions': transcriptions.count(),
-            'completed_transcriptions': transcriptions.filter(status='completed').count(),
-            'processing_transcriptions': transcriptions.filter(status='processing').count(),
-            'failed_transcriptions': transcriptions.filter(status='failed').count(),
-            'pending_transcriptions': transcriptions.filter(status='pending').count(),
-        }
+        stats = Transcription.objects.aggregate(
+            total_transcriptions=Count('id'),
+            completed_transcriptions=Count('id', filter=Q(status='completed')),
+            processing_transcriptions=Count('id', filter=Q(status='processing')),
+            failed_transcriptions=Count('id', filter=Q(status='failed')),
+            pending_transcriptions=Count('id', filter=Q(status='pending')),
+        )
         
         return Response(stats)
         
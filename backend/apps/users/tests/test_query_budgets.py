@@ -0,0 +1,32 @@
+"""
+Query-count and response-size budgets for the authentication and profile endpoints.
+"""
+from django.test import override_settings
+
+from apps.transcriptions.tests.budgets import PASSWORD, QueryBudgetTestCase
+
+BASE_URL = '/api/auth/'
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class UserQueryBudgetTests(QueryBudgetTestCase):
+
+    def test_login(self):
+        data = {'email': self.catalog.owner.email, 'password': PASSWORD}
+        self.assertWithinBudget('post', f'{BASE_URL}login/', max_queries=1, max_bytes=2 * 1024, data=data)
+
+    def test_register(self):
+        data = {
+            'email': 'new-budget-user@example.com', 'username': 'new-budget-user',
+            'password': 'Budget-Pass-123', 'password_confirm': 'Budget-Pass-123',
+        }
+        self.assertWithinBudget('post', f'{BASE_URL}register/', max_queries=3, max_bytes=2 * 1024, data=data,
+                                expected_status=201)
+
+    def test_profile(self):
+        self.client.force_authenticate(self.catalog.owner)
+        self.assertWithinBudget('get', f'{BASE_URL}profile/', max_queries=0, max_bytes=1024)
+
+    def test_stats(self):
+        self.client.force_authenticate(self.catalog.owner)
+        self.assertWithinBudget('get', f'{BASE_URL}stats/', max_queries=0, max_bytes=1024)
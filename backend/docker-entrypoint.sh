@@ -75,9 +75,31 @@ python manage.py test_groq_direct
 echo "Testing Groq API using official library..."
 python manage.py test_groq_library
 
+# Métricas Prometheus: gunicorn e o pool prefork têm vários processos, que
+# gravam as métricas num diretório compartilhado (limpo a cada início)
+export PROMETHEUS_MULTIPROC_DIR="${PROMETHEUS_MULTIPROC_DIR:-/tmp/prometheus_multiproc}"
+rm -rf "$PROMETHEUS_MULTIPROC_DIR"
+mkdir -p "$PROMETHEUS_MULTIPROC_DIR"
+
+# Iniciar o Celery com as variáveis de ambiente explícitas
+run_celery() {
+    exec env \
+        GROQ_API_KEY="$GROQ_API_KEY" \
+        GOOGLE_API_KEY="$GOOGLE_API_KEY" \
+        OPENAI_API_KEY="$OPENAI_API_KEY" \
+        SECRET_KEY="$SECRET_KEY" \
+        DEBUG="$DEBUG" \
+        POSTGRES_DB="$POSTGRES_DB" \
+        POSTGRES_USER="$POSTGRES_USER" \
+        POSTGRES_PASSWORD="$POSTGRES_PASSWORD" \
+        POSTGRES_HOST="$POSTGRES_HOST" \
+        REDIS_URL="$REDIS_URL" \
+        celery -A your_social_media "$@"
+}
+
 # Verificar se é worker do Celery
-if [ "$1" = "celery" ]; then
-    echo "Starting Celery worker with explicit environment..."
+if [ "$1" = "celery" ] || [ "$1" = "celery-media" ] || [ "$1" = "celery-io" ]; then
+    echo "Starting Celery worker ($1) with explicit environment..."
     echo "GROQ_API_KEY available: ${GROQ_API_KEY:+YES (length: ${#GROQ_API_KEY})} ${GROQ_API_KEY:-NO}"
     echo "GOOGLE_API_KEY available: ${GOOGLE_API_KEY:+YES (length: ${#GOOGLE_API_KEY})} ${GOOGLE_API_KEY:-NO}"
     
@@ -92,19 +114,23 @@ if [ "$1" = "celery" ]; then
         echo "✅ Environment loader passed!"
     fi
     
-    # Start Celery with explicit environment
-    exec env \
-        GROQ_API_KEY="$GROQ_API_KEY" \
-        GOOGLE_API_KEY="$GOOGLE_API_KEY" \
-        OPENAI_API_KEY="$OPENAI_API_KEY" \
-        SECRET_KEY="$SECRET_KEY" \
-        DEBUG="$DEBUG" \
-        POSTGRES_DB="$POSTGRES_DB" \
-        POSTGRES_USER="$POSTGRES_USER" \
-        POSTGRES_PASSWORD="$POSTGRES_PASSWORD" \
-        POSTGRES_HOST="$POSTGRES_HOST" \
-        REDIS_URL="$REDIS_URL" \
-        celery -A your_social_media worker -l info --concurrency=2
+    if [ "$1" = "celery-media" ]; then
+        # CPU-bound ffmpeg/moviepy/pydub work: one process per core, one task
+        # reserved at a time so long transcodes are not queued behind each other
+        run_celery worker -l info -Q media -n media@%h \
+            --pool=prefork \
+            --concurrency="${CELERY_MEDIA_CONCURRENCY:-$(nproc)}" \
+            --prefetch-multiplier=1
+    elif [ "$1" = "celery-io" ]; then
+        # Network-bound YouTube/Groq/Gemini calls: many threads waiting on sockets
+        run_celery worker -l info -Q io -n io@%h \
+            --pool=threads \
+            --concurrency="${CELERY_IO_CONCURRENCY:-32}" \
+            --prefetch-multiplier="${CELERY_IO_PREFETCH_MULTIPLIER:-1}"
+    else
+        # Single worker consuming both queues (small deployments)
+        run_celery worker -l info -Q media,io --concurrency=2 --prefetch-multiplier=1
+    fi
         
 elif [ "$1" = "celery-beat" ]; then
     echo "Starting Celery beat with explicit environment..."
@@ -113,18 +139,7 @@ elif [ "$1" = "celery-beat" ]; then
     echo "Running Celery environment loader..."
     python load_env_for_celery.py
     
-    exec env \
-        GROQ_API_KEY="$GROQ_API_KEY" \
-        GOOGLE_API_KEY="$GOOGLE_API_KEY" \
-        OPENAI_API_KEY="$OPENAI_API_KEY" \
-        SECRET_KEY="$SECRET_KEY" \
-        DEBUG="$DEBUG" \
-        POSTGRES_DB="$POSTGRES_DB" \
-        POSTGRES_USER="$POSTGRES_USER" \
-        POSTGRES_PASSWORD="$POSTGRES_PASSWORD" \
-        POSTGRES_HOST="$POSTGRES_HOST" \
-        REDIS_URL="$REDIS_URL" \
-        celery -A your_social_media beat -l info
+    run_celery beat -l info
 else
     # Test Celery environment (only for Django server, not for workers)
     echo "Testing Celery environment..."
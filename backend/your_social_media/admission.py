@@ -0,0 +1,141 @@
+"""
+Queue-depth-aware admission control for job creation endpoints.
+Before a transcription or content generation is accepted, the backlog (jobs
+pending or running, plus messages waiting in the broker queues) is compared with
+the recent throughput. Jobs whose estimated wait is within the configured limit
+are admitted with an ETA; otherwise the caller answers 429 with Retry-After.
+"""
+import logging
+import math
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Tuple
+
+from django.apps import apps
+from django.conf import settings
+from django.db.models import Count, Q
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+
+from .redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+PRIORITY_STEPS = 10
+MIN_RETRY_AFTER_SECONDS = 30
+MAX_RETRY_AFTER_SECONDS = 60 * 60
+
+
+@dataclass(frozen=True)
+class Lane:
+    model: str
+    queues: Tuple[str, ...]
+    max_wait_setting: str
+    # Capacity assumed when too few jobs finished recently to measure it
+    baseline_jobs_per_minute: float
+
+
+LANES: Dict[str, Lane] = {
+    'transcription': Lane(
+        model='transcriptions.Transcription',
+        queues=('media', 'io'),
+        max_wait_setting='ADMISSION_TRANSCRIPTION_MAX_WAIT_SECONDS',
+        baseline_jobs_per_minute=1.0,
+    ),
+    'content_generation': Lane(
+        model='content_generation.ContentGeneration',
+        queues=('io',),
+        max_wait_setting='ADMISSION_CONTENT_GENERATION_MAX_WAIT_SECONDS',
+        baseline_jobs_per_minute=6.0,
+    ),
+}
+
+
+@dataclass
+class Admission:
+    admitted: bool
+    backlog: int = 0
+    queue_depth: int = 0
+    jobs_per_minute: Optional[float] = None
+    estimated_wait_seconds: Optional[int] = None
+    retry_after_seconds: Optional[int] = None
+
+    @property
+    def estimated_completion(self) -> Optional[datetime]:
+        if self.estimated_wait_seconds is None:
+            return None
+        return timezone.now() + timedelta(seconds=self.estimated_wait_seconds)
+
+    def as_dict(self) -> Dict:
+        completion = self.estimated_completion
+        return {
+            'estimated_wait_seconds': self.estimated_wait_seconds,
+            'estimated_completion': completion.isoformat() if completion else None,
+            'queue_backlog': self.backlog,
+        }
+
+
+def broker_queue_depth(queues) -> int:
+    """Messages waiting in the broker for these queues, over every priority sub-queue."""
+    separator = settings.CELERY_BROKER_TRANSPORT_OPTIONS.get('sep', ':')
+    pipe = get_redis().pipeline()
+    for queue in queues:
+        pipe.llen(queue)
+        for priority in range(1, PRIORITY_STEPS):
+            pipe.llen(f"{queue}{separator}{priority}")
+    return sum(pipe.execute())
+
+
+def check_admission(kind: str, jobs: int = 1) -> Admission:
+    """
+    Decide whether `jobs` new jobs of `kind` can be accepted now.
+    Errors reading the backlog fail open (admitted without an estimate).
+    """
+    if not settings.ADMISSION_CONTROL_ENABLED:
+        return Admission(admitted=True)
+
+    lane = LANES[kind]
+    window = settings.ADMISSION_THROUGHPUT_WINDOW_SECONDS
+    try:
+        counts = apps.get_model(lane.model).objects.aggregate(
+            backlog=Count('id', filter=Q(status__in=('pending', 'processing'))),
+            finished=Count('id', filter=Q(
+                status='completed', completed_at__gte=timezone.now() - timedelta(seconds=window)
+            )),
+        )
+        queue_depth = broker_queue_depth(lane.queues)
+    except Exception as e:
+        logger.warning(f"[ADMISSION] Falha ao medir a fila de {kind}; admitindo sem estimativa: {e}")
+        return Admission(admitted=True)
+
+    jobs_per_minute = max(counts['finished'] * 60 / window, lane.baseline_jobs_per_minute)
+    backlog = counts['backlog']
+    estimated_wait = int(math.ceil((backlog + jobs) * 60 / jobs_per_minute))
+    max_wait = getattr(settings, lane.max_wait_setting)
+
+    if estimated_wait <= max_wait and queue_depth < settings.ADMISSION_MAX_QUEUE_DEPTH:
+        return Admission(True, backlog, queue_depth, round(jobs_per_minute, 2), estimated_wait)
+
+    # Time until enough of the backlog drains for these jobs to fit under the limit
+    excess_seconds = max(estimated_wait - max_wait, 0)
+    retry_after = min(max(excess_seconds, MIN_RETRY_AFTER_SECONDS), MAX_RETRY_AFTER_SECONDS)
+    logger.warning(
+        f"[ADMISSION] {kind} recusado: backlog {backlog}, fila {queue_depth}, "
+        f"{jobs_per_minute:.1f} jobs/min, espera estimada {estimated_wait}s (limite {max_wait}s)"
+    )
+    return Admission(False, backlog, queue_depth, round(jobs_per_minute, 2), estimated_wait, retry_after)
+
+
+def too_busy_response(admission: Admission) -> Response:
+    """429 response for a rejected admission, with Retry-After in seconds."""
+    minutes = max(1, math.ceil(admission.retry_after_seconds / 60))
+    return Response(
+        {
+            'error': f'Fila de processamento cheia. Tente novamente em {minutes} minuto(s).',
+            'retry_after_seconds': admission.retry_after_seconds,
+            'queue_backlog': admission.backlog,
+        },
+        status=status.HTTP_429_TOO_MANY_REQUESTS,
+        headers={'Retry-After': str(admission.retry_after_seconds)}
+    )
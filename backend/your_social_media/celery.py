@@ -4,6 +4,7 @@ Celery configuration for your_social_media project.
 import os
 import logging
 from celery import Celery
+from celery.signals import before_task_publish, task_postrun, task_prerun, worker_init, worker_process_init
 from django.conf import settings
 
 # Configure logging
@@ -69,12 +70,28 @@ def setup_periodic_tasks(sender, **kwargs):
     
     logger.info("=== END CELERY ENVIRONMENT CHECK ===")
 
+# Prometheus: queue wait, task runtime and the worker's /metrics exporter
+from your_social_media import metrics
+before_task_publish.connect(metrics.stamp_published_at, weak=False)
+task_prerun.connect(metrics.task_started, weak=False)
+task_postrun.connect(metrics.task_finished, weak=False)
+worker_init.connect(metrics.start_worker_exporter, weak=False)
+
+@worker_process_init.connect
+def init_worker_clients(**kwargs):
+    """Create the LLM provider clients once per worker process (after fork)."""
+    from apps.content_generation.clients import init_clients
+    health = init_clients(force=True)
+    logger.info(f"LLM provider clients initialised for worker process {os.getpid()}: {health}")
+
 # Ensure environment variables are available to tasks
 @app.task(bind=True)
 def debug_env_vars(self):
     """Debug task to check environment variables in Celery worker"""
     import os
     from django.conf import settings
+    from apps.content_generation.clients import client_health
+    from apps.content_generation.routing import get_router
     
     result = {
         'worker_id': self.request.id,
@@ -87,7 +104,9 @@ def debug_env_vars(self):
             'GROQ_API_KEY': '✅ SET' if getattr(settings, 'GROQ_API_KEY', '') else '❌ NOT SET',
             'GOOGLE_API_KEY': '✅ SET' if getattr(settings, 'GOOGLE_API_KEY', '') else '❌ NOT SET',
             'OPENAI_API_KEY': '✅ SET' if getattr(settings, 'OPENAI_API_KEY', '') else '❌ NOT SET',
-        }
+        },
+        'llm_clients': client_health(),
+        'llm_routing': get_router().snapshot(),
     }
     
     return result
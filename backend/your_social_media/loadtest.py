@@ -0,0 +1,414 @@
+"""
+End-to-end load test of the REST API and the worker fleet.
+
+Virtual users drive the real endpoints over HTTP in a closed loop: create a job
+(audio upload, YouTube extraction or content generation), poll its status until
+it finishes, start the next one. Each scenario is ramped through increasing
+concurrency steps. Every step reports:
+- throughput (finished jobs and HTTP requests per second)
+- latency percentiles of the create call, of the status polls and end to end
+- error rates: HTTP errors, 429 admissions, failed jobs and timeouts
+- broker queue depth and job backlog, sampled during the step
+
+The first step whose end-to-end p95 degrades past the limit, or whose error rate
+is too high, marks the scenario's capacity.
+
+The external providers must be the local stand-ins (your_social_media/provider_stubs.py)
+on the workers; their request counters are included per step when the stub URL is
+known. Run through `python manage.py run_load_test`.
+"""
+import logging
+import math
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import requests
+from django.apps import apps
+
+logger = logging.getLogger(__name__)
+
+TERMINAL_STATUSES = ('completed', 'failed')
+QUEUE_SAMPLE_INTERVAL_SECONDS = 1.0
+# Pause after a create call that failed (HTTP error, connection refused), doubled per
+# consecutive failure so a backend that is down is not hammered
+ERROR_BACKOFF_SECONDS = 0.5
+MAX_ERROR_BACKOFF_SECONDS = 10.0
+
+
+class LoadTestError(Exception):
+    """The load test cannot run (bad arguments, backend unreachable)."""
+
+
+def percentile(values: List[float], p: float) -> Optional[float]:
+    """Nearest-rank percentile (p in 0-100) of `values`, None when empty."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(math.ceil(p / 100 * len(ordered)), 1)
+    return ordered[rank - 1]
+
+
+def latency_summary(values: List[float]) -> Dict[str, Optional[float]]:
+    def ms(value):
+        return round(value * 1000, 1) if value is not None else None
+
+    return {
+        'count': len(values),
+        'p50_ms': ms(percentile(values, 50)),
+        'p95_ms': ms(percentile(values, 95)),
+        'p99_ms': ms(percentile(values, 99)),
+        'max_ms': ms(max(values) if values else None),
+    }
+
+
+@dataclass
+class StepStats:
+    """Counters of one concurrency step, shared by its virtual users."""
+    scenario: str
+    concurrency: int
+    create_latencies: List[float] = field(default_factory=list)
+    poll_latencies: List[float] = field(default_factory=list)
+    job_latencies: List[float] = field(default_factory=list)
+    requests: int = 0
+    http_errors: int = 0
+    rejected: int = 0
+    jobs_completed: int = 0
+    jobs_failed: int = 0
+    jobs_timed_out: int = 0
+    queue_samples: List[Dict[str, int]] = field(default_factory=list)
+    stub_requests: Dict[str, Dict[str, int]] = field(default_factory=dict)
+    duration_seconds: float = 0.0
+    lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def add(self, **counters: int) -> None:
+        with self.lock:
+            for name, value in counters.items():
+                setattr(self, name, getattr(self, name) + value)
+
+    def observe(self, latencies: str, seconds: float) -> None:
+        with self.lock:
+            getattr(self, latencies).append(seconds)
+
+    @property
+    def jobs_started(self) -> int:
+        return self.jobs_completed + self.jobs_failed + self.jobs_timed_out
+
+    @property
+    def error_rate(self) -> float:
+        """Failed jobs, timeouts and HTTP errors over every attempted job."""
+        attempts = self.jobs_started + self.http_errors + self.rejected
+        return (self.jobs_failed + self.jobs_timed_out + self.http_errors) / attempts if attempts else 0.0
+
+    def report(self) -> Dict[str, Any]:
+        seconds = self.duration_seconds or 1.0
+        queue = {}
+        for key in (self.queue_samples[0] if self.queue_samples else {}):
+            values = [sample[key] for sample in self.queue_samples]
+            queue[key] = {'avg': round(sum(values) / len(values), 1), 'max': max(values)}
+        return {
+            'scenario': self.scenario,
+            'concurrency': self.concurrency,
+            'duration_seconds': round(self.duration_seconds, 1),
+            'jobs_per_second': round(self.jobs_completed / seconds, 3),
+            'requests_per_second': round(self.requests / seconds, 2),
+            'jobs_completed': self.jobs_completed,
+            'jobs_failed': self.jobs_failed,
+            'jobs_timed_out': self.jobs_timed_out,
+            'http_errors': self.http_errors,
+            'rejected_429': self.rejected,
+            'error_rate': round(self.error_rate, 4),
+            'create': latency_summary(self.create_latencies),
+            'poll': latency_summary(self.poll_latencies),
+            'end_to_end': latency_summary(self.job_latencies),
+            'queue': queue,
+            'stub_requests': self.stub_requests,
+        }
+
+
+@dataclass
+class LoadTestConfig:
+    base_url: str
+    token: Optional[str] = None
+    stub_url: Optional[str] = None
+    steps: Tuple[int, ...] = (1, 2, 4, 8, 16)
+    step_seconds: float = 60.0
+    poll_interval_seconds: float = 2.0
+    job_timeout_seconds: float = 15 * 60
+    request_timeout_seconds: float = 60.0
+    upload_file: Optional[str] = None
+    # Completed transcriptions the content scenario generates from, one per virtual user:
+    # a shared one would give every user the same single-flight fingerprint and collapse
+    # their generations into one LLM call. prepare() creates the missing ones.
+    transcription_ids: List[str] = field(default_factory=list)
+    content_type: str = 'complete'
+    # Makes the synthetic YouTube URLs of this run unique
+    run_id: str = field(default_factory=lambda: format(int(time.time()), 'x'))
+    # Capacity: first step whose end-to-end p95 exceeds the first step's by this
+    # factor, or whose error rate exceeds max_error_rate
+    p95_degradation: float = 1.5
+    max_error_rate: float = 0.05
+
+
+class Client:
+    """HTTP client of one virtual user (its own connection pool)."""
+
+    def __init__(self, config: LoadTestConfig, stats: StepStats, user_index: int = 0):
+        self.config = config
+        self.stats = stats
+        self.user_index = user_index
+        # Seconds the last 429 asked to wait before the next create
+        self.retry_after: Optional[float] = None
+        self.session = requests.Session()
+        if config.token:
+            self.session.headers['Authorization'] = f'Bearer {config.token}'
+
+    def call(self, method: str, path: str, latencies: str, **kwargs) -> Optional[requests.Response]:
+        """Timed request; None (counted as an HTTP error) when it fails to complete."""
+        started = time.perf_counter()
+        try:
+            response = self.session.request(method, f'{self.config.base_url}{path}',
+                                            timeout=self.config.request_timeout_seconds, **kwargs)
+        except requests.RequestException as e:
+            logger.warning(f"[LOAD TEST] {method} {path}: {e}")
+            self.stats.add(requests=1, http_errors=1)
+            return None
+        self.stats.add(requests=1)
+        self.stats.observe(latencies, time.perf_counter() - started)
+        return response
+
+
+# Scenarios: each creates one job and returns the status path to poll, or None
+
+def create_upload(client: Client, sequence: int) -> Optional[str]:
+    with open(client.config.upload_file, 'rb') as upload:
+        response = client.call('POST', '/api/transcriptions/create/', 'create_latencies',
+                               data={'source_type': 'audio_upload'}, files={'audio_file': upload})
+    return _created(client, response, 'transcription', '/api/transcriptions/{id}/status/')
+
+
+def create_youtube(client: Client, sequence: int) -> Optional[str]:
+    data = {'source_type': 'youtube',
+            'source_url': f'https://www.youtube.com/watch?v=lt{client.config.run_id}{sequence:06d}'}
+    response = client.call('POST', '/api/transcriptions/create/', 'create_latencies', json=data)
+    return _created(client, response, 'transcription', '/api/transcriptions/{id}/status/')
+
+
+def create_content(client: Client, sequence: int) -> Optional[str]:
+    data = {'transcription_id': client.config.transcription_ids[client.user_index],
+            'content_type': client.config.content_type}
+    response = client.call('POST', '/api/content-generation/create/', 'create_latencies', json=data)
+    return _created(client, response, 'content_generation', '/api/content-generation/{id}/status/')
+
+
+def _created(client: Client, response: Optional[requests.Response], key: str, status_path: str) -> Optional[str]:
+    if response is None:
+        return None
+    if response.status_code == 429:
+        client.stats.add(rejected=1)
+        # Closed loop: wait as told instead of hammering the admission check
+        client.retry_after = float(response.headers.get('Retry-After') or 1)
+        return None
+    if response.status_code != 201:
+        logger.warning(f"[LOAD TEST] create {response.status_code}: {response.text[:200]}")
+        client.stats.add(http_errors=1)
+        return None
+    return status_path.format(id=response.json()[key]['id'])
+
+
+SCENARIOS: Dict[str, Callable[[Client, int], Optional[str]]] = {
+    'upload': create_upload,
+    'youtube': create_youtube,
+    'content': create_content,
+}
+
+
+def wait_for_job(client: Client, status_path: str, started: float) -> Optional[str]:
+    """Poll until the job reaches a terminal status; returns it, or None on timeout."""
+    while time.perf_counter() - started < client.config.job_timeout_seconds:
+        response = client.call('GET', status_path, 'poll_latencies')
+        if response is not None and response.status_code == 200:
+            job_status = response.json().get('status')
+            if job_status in TERMINAL_STATUSES:
+                return job_status
+        elif response is not None:
+            client.stats.add(http_errors=1)
+        time.sleep(client.config.poll_interval_seconds)
+    return None
+
+
+def virtual_user(config: LoadTestConfig, scenario: str, stats: StepStats, stop: threading.Event,
+                 sequence: Callable[[], int], user_index: int) -> None:
+    client = Client(config, stats, user_index)
+    create = SCENARIOS[scenario]
+    failures = 0
+    while not stop.is_set():
+        started = time.perf_counter()
+        client.retry_after = None
+        status_path = create(client, sequence())
+        if status_path is None:
+            if client.retry_after is not None:
+                stop.wait(client.retry_after)
+            else:
+                failures += 1
+                stop.wait(min(ERROR_BACKOFF_SECONDS * 2 ** (failures - 1), MAX_ERROR_BACKOFF_SECONDS))
+            continue
+        failures = 0
+        job_status = wait_for_job(client, status_path, started)
+        if job_status is None:
+            stats.add(jobs_timed_out=1)
+        elif job_status == 'failed':
+            stats.add(jobs_failed=1)
+        else:
+            stats.add(jobs_completed=1)
+            stats.observe('job_latencies', time.perf_counter() - started)
+
+
+def sample_queues() -> Optional[Dict[str, int]]:
+    """Broker messages waiting per queue and jobs pending or running, None when unreachable."""
+    from .admission import broker_queue_depth
+
+    try:
+        sample = {f'queue_{queue}': broker_queue_depth((queue,)) for queue in ('media', 'io')}
+        for label, model in (('backlog_transcriptions', 'transcriptions.Transcription'),
+                             ('backlog_content_generations', 'content_generation.ContentGeneration')):
+            sample[label] = apps.get_model(model).objects.filter(status__in=('pending', 'processing')).count()
+        return sample
+    except Exception as e:
+        logger.warning(f"[LOAD TEST] Queue depth unavailable: {e}")
+        return None
+
+
+class LoadTest:
+
+    def __init__(self, config: LoadTestConfig, progress: Optional[Callable[[Dict[str, Any]], None]] = None):
+        self.config = config
+        self.progress = progress
+        self._sequence = 0
+        self._sequence_lock = threading.Lock()
+        self._sample_queues = True
+
+    def next_sequence(self) -> int:
+        with self._sequence_lock:
+            self._sequence += 1
+            return self._sequence
+
+    def _stub(self, method: str, path: str) -> Optional[Dict[str, Any]]:
+        if not self.config.stub_url:
+            return None
+        try:
+            return requests.request(method, f'{self.config.stub_url}{path}', timeout=10).json()
+        except (requests.RequestException, ValueError) as e:
+            logger.warning(f"[LOAD TEST] Provider stub stats unavailable: {e}")
+            return None
+
+    def check_backend(self) -> None:
+        try:
+            requests.get(f'{self.config.base_url}/api/health/', timeout=10).raise_for_status()
+        except requests.RequestException as e:
+            raise LoadTestError(f"Backend indisponível em {self.config.base_url}: {e}")
+
+    def prepare(self, scenarios: List[str]) -> None:
+        """Content generation needs a completed transcription per virtual user: create them through the stand-ins."""
+        if 'content' not in scenarios:
+            return
+        client = Client(self.config, StepStats('setup', 1))
+        for n in range(len(self.config.transcription_ids), max(self.config.steps)):
+            started = time.perf_counter()
+            response = client.call('POST', '/api/transcriptions/create/', 'create_latencies', json={
+                'source_type': 'youtube', 'source_url': f'https://www.youtube.com/watch?v=lt{self.config.run_id}s{n:04d}',
+            })
+            if response is None or response.status_code != 201:
+                raise LoadTestError(f"Não foi possível criar a transcrição base: {getattr(response, 'text', '')[:200]}")
+            transcription_id = response.json()['transcription']['id']
+            if wait_for_job(client, f'/api/transcriptions/{transcription_id}/status/', started) != 'completed':
+                raise LoadTestError(f"A transcrição base {transcription_id} não foi concluída")
+            self.config.transcription_ids.append(transcription_id)
+
+    def run_step(self, scenario: str, concurrency: int) -> StepStats:
+        stats = StepStats(scenario, concurrency)
+        stop = threading.Event()
+        done = threading.Event()
+        self._stub('POST', '/_stub/reset')
+
+        def sampler():
+            while not done.wait(QUEUE_SAMPLE_INTERVAL_SECONDS):
+                sample = sample_queues() if self._sample_queues else None
+                if sample is None:
+                    self._sample_queues = False
+                    return
+                with stats.lock:
+                    stats.queue_samples.append(sample)
+
+        threads = [threading.Thread(target=sampler, name='load-queue-sampler', daemon=True)]
+        threads += [
+            threading.Thread(target=virtual_user, args=(self.config, scenario, stats, stop, self.next_sequence, n),
+                             name=f'load-{scenario}-{n}', daemon=True)
+            for n in range(concurrency)
+        ]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        stop.wait(self.config.step_seconds)
+        stop.set()
+        # Jobs in flight finish (or time out) before the step is closed
+        for thread in threads[1:]:
+            thread.join()
+        stats.duration_seconds = time.perf_counter() - started
+        done.set()
+        threads[0].join()
+
+        stub_stats = self._stub('GET', '/_stub/stats')
+        if stub_stats:
+            stats.stub_requests = stub_stats.get('requests', {})
+        return stats
+
+    def run(self, scenarios: List[str]) -> Dict[str, Any]:
+        unknown = [scenario for scenario in scenarios if scenario not in SCENARIOS]
+        if unknown:
+            raise LoadTestError(f"Cenários desconhecidos: {', '.join(unknown)} (disponíveis: {', '.join(SCENARIOS)})")
+        if 'upload' in scenarios and not self.config.upload_file:
+            raise LoadTestError("O cenário upload precisa de um arquivo de áudio")
+        self.check_backend()
+        self.prepare(scenarios)
+
+        results = {}
+        for scenario in scenarios:
+            steps = []
+            for concurrency in self.config.steps:
+                step = self.run_step(scenario, concurrency).report()
+                steps.append(step)
+                if self.progress:
+                    self.progress(step)
+            results[scenario] = {'steps': steps, 'capacity': self.capacity(steps)}
+        return {
+            'config': {
+                'base_url': self.config.base_url,
+                'stub_url': self.config.stub_url,
+                'steps': list(self.config.steps),
+                'step_seconds': self.config.step_seconds,
+                'poll_interval_seconds': self.config.poll_interval_seconds,
+                'p95_degradation': self.config.p95_degradation,
+                'max_error_rate': self.config.max_error_rate,
+            },
+            'scenarios': results,
+        }
+
+    def capacity(self, steps: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Highest concurrency before the end-to-end p95 or the error rate degrades."""
+        baseline_p95 = next((step['end_to_end']['p95_ms'] for step in steps if step['end_to_end']['p95_ms']), None)
+        sustained = None
+        for step in steps:
+            p95 = step['end_to_end']['p95_ms']
+            if step['error_rate'] > self.config.max_error_rate:
+                return {'sustained_concurrency': sustained, 'degraded_at': step['concurrency'],
+                        'reason': f"error rate {step['error_rate']:.1%}"}
+            if p95 is None:
+                return {'sustained_concurrency': sustained, 'degraded_at': step['concurrency'],
+                        'reason': 'no job completed'}
+            if baseline_p95 and p95 > baseline_p95 * self.config.p95_degradation:
+                return {'sustained_concurrency': sustained, 'degraded_at': step['concurrency'],
+                        'reason': f'p95 {p95:.0f} ms > {self.config.p95_degradation}x {baseline_p95:.0f} ms'}
+            sustained = step['concurrency']
+        return {'sustained_concurrency': sustained, 'degraded_at': None, 'reason': None}
@@ -0,0 +1,167 @@
+"""
+Prometheus metrics for the API, the Celery workers and external API calls.
+The backend exposes them at /metrics; each Celery worker serves its own on
+CELERY_METRICS_PORT. With several processes per container (gunicorn workers,
+the prefork media pool) PROMETHEUS_MULTIPROC_DIR must point to a directory
+shared by them, emptied at start-up (see docker-entrypoint.sh).
+Recording is a dict lookup and a lock-protected add; nothing here does I/O.
+"""
+import logging
+import os
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+from django.conf import settings
+from django.http import HttpResponse
+from django.views.decorators.csrf import csrf_exempt
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Histogram, generate_latest, multiprocess,
+    start_http_server,
+)
+
+logger = logging.getLogger(__name__)
+
+HTTP_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300)
+TASK_BUCKETS = (0.1, 0.5, 1, 5, 15, 30, 60, 120, 300, 600, 1800, 3600, 7200)
+EXTERNAL_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+SEGMENT_BUCKETS = (1, 2, 4, 8, 16, 32, 64)
+QUERY_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+HTTP_REQUEST_SECONDS = Histogram(
+    'http_request_duration_seconds', 'Django request latency by route',
+    ['method', 'route', 'status'], buckets=HTTP_BUCKETS,
+)
+HTTP_REQUEST_DB_QUERIES = Histogram(
+    'http_request_db_queries', 'ORM queries per request by route (see query_profiling.py)',
+    ['method', 'route'], buckets=QUERY_COUNT_BUCKETS,
+)
+CELERY_TASK_SECONDS = Histogram(
+    'celery_task_duration_seconds', 'Celery task runtime by final state',
+    ['task', 'state'], buckets=TASK_BUCKETS,
+)
+CELERY_QUEUE_WAIT_SECONDS = Histogram(
+    'celery_task_queue_wait_seconds', 'Time between publishing a task and a worker starting it',
+    ['task', 'queue'], buckets=TASK_BUCKETS,
+)
+EXTERNAL_CALL_SECONDS = Histogram(
+    'external_api_call_duration_seconds', 'Latency of calls to Groq, Gemini, OpenAI and YouTube',
+    ['service', 'operation', 'status'], buckets=EXTERNAL_BUCKETS,
+)
+TRANSCRIPTION_SEGMENTS = Histogram(
+    'transcription_segments', 'Segments an audio transcription was split into', buckets=SEGMENT_BUCKETS,
+)
+TRANSCRIPTION_SEGMENT_RESULTS = Counter(
+    'transcription_segment_results', 'Transcribed segments by outcome (success, retry, error)', ['status'],
+)
+
+PUBLISHED_AT_HEADER = 'published_at'
+UNMATCHED_ROUTE = '<unmatched>'
+
+_task_started: Dict[str, float] = {}
+
+
+def registry():
+    """Registry to expose: every process's metrics in multiprocess mode, this process's otherwise."""
+    if 'PROMETHEUS_MULTIPROC_DIR' not in os.environ:
+        return REGISTRY
+    collector_registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(collector_registry)
+    return collector_registry
+
+
+@csrf_exempt
+def metrics_view(request):
+    """Prometheus scrape endpoint, optionally protected by METRICS_AUTH_TOKEN."""
+    token = settings.METRICS_AUTH_TOKEN
+    if token and request.headers.get('Authorization') != f'Bearer {token}':
+        return HttpResponse(status=401)
+    return HttpResponse(generate_latest(registry()), content_type=CONTENT_TYPE_LATEST)
+
+
+class MetricsMiddleware:
+    """Request latency by URL route (the pattern, not the path, to keep label cardinality low)."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        start = time.perf_counter()
+        response = self.get_response(request)
+        match = getattr(request, 'resolver_match', None)
+        route = match.route if match is not None else UNMATCHED_ROUTE
+        HTTP_REQUEST_SECONDS.labels(request.method, route, response.status_code).observe(time.perf_counter() - start)
+        return response
+
+
+def error_status(exc: BaseException) -> str:
+    """Status label for a failed external call: the HTTP status when the client exposes one."""
+    for attribute in ('status_code', 'code'):
+        code = getattr(exc, attribute, None)
+        code = code() if callable(code) else code
+        if isinstance(code, int) and 100 <= code < 600:
+            return str(code)
+    # yt-dlp only reports the HTTP status in the message
+    if 'HTTP Error 429' in str(exc):
+        return '429'
+    return 'timeout' if 'timeout' in type(exc).__name__.lower() else 'error'
+
+
+class ExternalCall:
+    """Outcome of one external call; set `status` when the response is not an exception."""
+    __slots__ = ('status',)
+
+    def __init__(self):
+        self.status: Optional[str] = None
+
+
+@contextmanager
+def external_call(service: str, operation: str):
+    """Time one external API call; exceptions are labelled with error_status()."""
+    call = ExternalCall()
+    start = time.perf_counter()
+    try:
+        yield call
+    except BaseException as exc:
+        if call.status is None:
+            call.status = error_status(exc)
+        raise
+    finally:
+        EXTERNAL_CALL_SECONDS.labels(service, operation, call.status or 'ok').observe(time.perf_counter() - start)
+
+
+def stamp_published_at(headers=None, **kwargs):
+    """before_task_publish: remember when the message was published."""
+    if headers is not None:
+        headers.setdefault(PUBLISHED_AT_HEADER, time.time())
+
+
+def task_started(task_id=None, task=None, **kwargs):
+    """task_prerun: start the runtime clock and record the queue wait."""
+    _task_started[task_id] = time.perf_counter()
+    request = task.request
+    published_at = getattr(request, PUBLISHED_AT_HEADER, None)
+    # Retries and countdowns wait on purpose; only count the wait for immediate messages
+    if published_at is None or request.eta is not None:
+        return
+    queue = (request.delivery_info or {}).get('routing_key') or 'unknown'
+    CELERY_QUEUE_WAIT_SECONDS.labels(task.name, queue).observe(max(0.0, time.time() - published_at))
+
+
+def task_finished(task_id=None, task=None, state=None, **kwargs):
+    """task_postrun: record the runtime with the final state."""
+    start = _task_started.pop(task_id, None)
+    if start is not None:
+        CELERY_TASK_SECONDS.labels(task.name, state or 'UNKNOWN').observe(time.perf_counter() - start)
+
+
+def start_worker_exporter(**kwargs):
+    """worker_init: serve this worker's metrics (all pool processes) on CELERY_METRICS_PORT."""
+    port = settings.CELERY_METRICS_PORT
+    if not port:
+        return
+    try:
+        start_http_server(port, registry=registry())
+        logger.info(f"[METRICS] Exportador do worker ouvindo na porta {port}")
+    except OSError as e:
+        logger.warning(f"[METRICS] Não foi possível abrir a porta {port} para métricas: {e}")
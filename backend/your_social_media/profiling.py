@@ -0,0 +1,246 @@
+"""
+Opt-in profiling of Celery jobs and API requests.
+With PROFILING_ENABLED, a job is profiled when its ID was marked through the
+admin endpoint or when it falls in the PROFILING_SAMPLE_RATE sample (decided
+from the job ID, so every stage of a sampled job is profiled). Requests are
+sampled by PROFILING_REQUEST_SAMPLE_RATE and kept only when slower than
+PROFILING_SLOW_REQUEST_SECONDS. Each profile is a pyinstrument (sampling
+profiler) HTML report plus a JSON file with the duration and peak RSS, written
+to PROFILING_DIR (kept out of MEDIA_ROOT, which is served publicly).
+"""
+import functools
+import json
+import logging
+import os
+import random
+import re
+import resource
+import socket
+import threading
+import time
+import uuid
+import zlib
+from typing import Dict, List, Optional
+
+from django.conf import settings
+from django.http import FileResponse, Http404
+from django.utils import timezone
+from rest_framework import permissions, status
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.response import Response
+
+from .redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+SAMPLING_INTERVAL_SECONDS = 0.001
+TARGETS_KEY = 'profiling:targets'
+TARGET_TTL_SECONDS = 7 * 24 * 60 * 60
+SAMPLE_BUCKETS = 10000
+ARTIFACT_NAME = re.compile(r'^[\w.-]+$')
+_HOSTNAME = socket.gethostname()
+# pyinstrument allows one profiler per thread; eager chains run nested tasks inline
+_active = threading.local()
+
+
+def _peak_rss_mb() -> Dict[str, float]:
+    """Peak resident set size of this process and of its finished children (ffmpeg), in MB."""
+    # ru_maxrss is in kilobytes on Linux
+    return {
+        'self': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        'children': round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024, 1),
+    }
+
+
+def mark_job(job_id) -> None:
+    """Profile every task of this job the next time it runs."""
+    redis_client = get_redis()
+    redis_client.sadd(TARGETS_KEY, str(job_id))
+    redis_client.expire(TARGETS_KEY, TARGET_TTL_SECONDS)
+
+
+def unmark_job(job_id) -> None:
+    get_redis().srem(TARGETS_KEY, str(job_id))
+
+
+def marked_jobs() -> List[str]:
+    return sorted(get_redis().smembers(TARGETS_KEY))
+
+
+def should_profile_job(job_id) -> bool:
+    if not settings.PROFILING_ENABLED or job_id is None:
+        return False
+    rate = settings.PROFILING_SAMPLE_RATE
+    # Same answer for every stage of a job: sample on the ID, not on a random draw
+    if rate > 0 and zlib.crc32(str(job_id).encode()) % SAMPLE_BUCKETS < rate * SAMPLE_BUCKETS:
+        return True
+    try:
+        return bool(get_redis().sismember(TARGETS_KEY, str(job_id)))
+    except Exception as e:
+        logger.warning(f"[PROFILING] Falha ao consultar jobs marcados: {e}")
+        return False
+
+
+def _start_profiler():
+    from pyinstrument import Profiler
+    profiler = Profiler(interval=SAMPLING_INTERVAL_SECONDS)
+    profiler.start()
+    return profiler
+
+
+def save_artifact(profiler, name: str, metadata: Dict) -> Optional[str]:
+    """Write the HTML report and its metadata. Returns the artifact name."""
+    artifact = f"{timezone.now():%Y%m%dT%H%M%S}-{re.sub(r'[^\w.-]', '_', name)}-{uuid.uuid4().hex[:6]}"
+    try:
+        os.makedirs(settings.PROFILING_DIR, exist_ok=True)
+        with open(os.path.join(settings.PROFILING_DIR, f'{artifact}.html'), 'w') as report:
+            report.write(profiler.output_html())
+        with open(os.path.join(settings.PROFILING_DIR, f'{artifact}.json'), 'w') as meta:
+            json.dump(dict(metadata, artifact=artifact, worker=_HOSTNAME, created_at=timezone.now().isoformat()), meta)
+    except Exception as e:
+        logger.warning(f"[PROFILING] Falha ao salvar o perfil {artifact}: {e}")
+        return None
+    logger.info(f"[PROFILING] Perfil salvo: {artifact} ({metadata.get('duration_seconds')}s)")
+    return artifact
+
+
+def _job_id(args, job_arg: int):
+    value = args[job_arg] if len(args) > job_arg else None
+    # Pipeline stages receive the previous stage's result dict
+    if isinstance(value, dict):
+        return value.get('transcription_id')
+    return value
+
+
+def profile_task(kind: str, job_arg: int = 0):
+    """
+    Decorator for bound Celery tasks (place it under @shared_task).
+    `job_arg` is the position of the job ID (or of a result dict carrying
+    'transcription_id') among the task arguments.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(task, *args, **kwargs):
+            job_id = _job_id(args, job_arg)
+            if getattr(_active, 'profiling', False) or not should_profile_job(job_id):
+                return func(task, *args, **kwargs)
+
+            rss_before = _peak_rss_mb()
+            start = time.monotonic()
+            profiler = _start_profiler()
+            _active.profiling = True
+            outcome = 'ok'
+            try:
+                return func(task, *args, **kwargs)
+            except BaseException as exc:
+                outcome = type(exc).__name__
+                raise
+            finally:
+                _active.profiling = False
+                profiler.stop()
+                rss_after = _peak_rss_mb()
+                save_artifact(profiler, f"{kind}-{job_id}-{task.name.rsplit('.', 1)[-1]}", {
+                    'type': 'task',
+                    'kind': kind,
+                    'job_id': str(job_id),
+                    'task': task.name,
+                    'task_id': task.request.id,
+                    'outcome': outcome,
+                    'duration_seconds': round(time.monotonic() - start, 3),
+                    'peak_rss_mb': rss_after['self'],
+                    'peak_rss_growth_mb': round(rss_after['self'] - rss_before['self'], 1),
+                    'peak_rss_children_mb': rss_after['children'],
+                })
+        return wrapper
+    return decorator
+
+
+class ProfilingMiddleware:
+    """Profile a sample of requests and keep the reports of the slow ones."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.PROFILING_ENABLED or random.random() >= settings.PROFILING_REQUEST_SAMPLE_RATE:
+            return self.get_response(request)
+
+        rss_before = _peak_rss_mb()
+        start = time.monotonic()
+        profiler = _start_profiler()
+        _active.profiling = True
+        try:
+            response = self.get_response(request)
+        finally:
+            _active.profiling = False
+            profiler.stop()
+        duration = time.monotonic() - start
+        if duration >= settings.PROFILING_SLOW_REQUEST_SECONDS:
+            rss_after = _peak_rss_mb()
+            save_artifact(profiler, f"http-{request.method}-{request.path.strip('/')}", {
+                'type': 'http',
+                'method': request.method,
+                'path': request.path,
+                'status': response.status_code,
+                'duration_seconds': round(duration, 3),
+                'peak_rss_mb': rss_after['self'],
+                'peak_rss_growth_mb': round(rss_after['self'] - rss_before['self'], 1),
+            })
+        return response
+
+
+def list_artifacts() -> List[Dict]:
+    """Metadata of the stored profiles, newest first."""
+    if not os.path.isdir(settings.PROFILING_DIR):
+        return []
+    artifacts = []
+    for filename in os.listdir(settings.PROFILING_DIR):
+        if not filename.endswith('.json'):
+            continue
+        try:
+            with open(os.path.join(settings.PROFILING_DIR, filename)) as meta:
+                artifacts.append(json.load(meta))
+        except (OSError, ValueError):
+            continue
+    return sorted(artifacts, key=lambda artifact: artifact.get('created_at', ''), reverse=True)
+
+
+@api_view(['GET', 'POST', 'DELETE'])
+@permission_classes([permissions.IsAdminUser])
+def profiles_view(request):
+    """
+    GET: stored profiles and jobs marked for profiling.
+    POST/DELETE {'job_id': ...}: mark or unmark a transcription or content generation.
+    """
+    try:
+        if request.method == 'GET':
+            return Response({
+                'enabled': settings.PROFILING_ENABLED,
+                'sample_rate': settings.PROFILING_SAMPLE_RATE,
+                'marked_jobs': marked_jobs(),
+                'profiles': list_artifacts(),
+            })
+
+        job_id = request.data.get('job_id')
+        if not job_id:
+            return Response({'error': 'job_id é obrigatório'}, status=status.HTTP_400_BAD_REQUEST)
+        if request.method == 'POST':
+            mark_job(job_id)
+            return Response({'job_id': str(job_id), 'marked': True, 'enabled': settings.PROFILING_ENABLED})
+        unmark_job(job_id)
+        return Response({'job_id': str(job_id), 'marked': False})
+    except Exception as e:
+        logger.error(f"[PROFILING] Erro na listagem de perfis: {e}")
+        return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAdminUser])
+def profile_download_view(request, artifact):
+    """Download a profile report (HTML) by artifact name."""
+    if not ARTIFACT_NAME.match(artifact):
+        raise Http404
+    path = os.path.join(settings.PROFILING_DIR, f'{artifact}.html')
+    if not os.path.exists(path):
+        raise Http404
+    return FileResponse(open(path, 'rb'), as_attachment=True, filename=f'{artifact}.html', content_type='text/html')
@@ -0,0 +1,607 @@
+"""
+Local stand-ins for the external providers: Groq (Whisper), Gemini, OpenAI and YouTube.
+
+`python manage.py run_provider_stubs` serves them over HTTP. With PROVIDER_STUB_URL
+pointing at that server, TranscriptionService, the LLM clients (clients.py) and
+StubYoutubeDL (in place of yt-dlp) talk to it instead of the real APIs, so the
+pipeline can be benchmarked and load-tested with no keys and no network.
+
+Responses are replayed from recorded fixtures when the fixtures directory has any
+for the route, and synthesized otherwise. The StubProfile adds latency, jitter,
+429/500 injection and controls payload sizes; it can be changed at runtime through
+POST /_stub/config. With record=True requests are forwarded to the real provider
+(using the caller's own key) and the responses are saved as fixtures.
+"""
+import codecs
+import json
+import logging
+import os
+import random
+import re
+import threading
+import time
+from dataclasses import asdict, dataclass, fields
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, quote, urlencode, urlsplit
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+# Real endpoints, used only when recording
+UPSTREAMS = {
+    'groq_transcription': 'https://api.groq.com',
+    'gemini_stream': 'https://generativelanguage.googleapis.com',
+    'gemini_generate': 'https://generativelanguage.googleapis.com',
+    'openai_chat': 'https://api.openai.com',
+}
+
+# (method, path pattern, route)
+ROUTES = [
+    ('POST', re.compile(r'^/openai/v1/audio/transcriptions$'), 'groq_transcription'),
+    ('POST', re.compile(r'^/v1beta/models/(?P<model>[^/:]+):streamGenerateContent$'), 'gemini_stream'),
+    ('POST', re.compile(r'^/v1beta/models/(?P<model>[^/:]+):generateContent$'), 'gemini_generate'),
+    ('POST', re.compile(r'^/v1/chat/completions$'), 'openai_chat'),
+    ('GET', re.compile(r'^/youtube/info$'), 'youtube_info'),
+    ('GET', re.compile(r'^/youtube/timedtext/(?P<video_id>[\w-]+)$'), 'youtube_subtitles'),
+]
+
+# Headers forwarded to the real provider when recording (the caller's credentials)
+FORWARDED_HEADERS = ('authorization', 'x-goog-api-key', 'content-type', 'x-goog-api-client')
+
+_VIDEO_ID_RE = re.compile(r'(?:v=|youtu\.be/|/live/|/shorts/)([\w-]{6,})')
+_RESPONSE_FORMAT_RE = re.compile(rb'name="response_format"\r\n\r\n(\w+)')
+_WORDS = ('hoje vamos falar sobre como gravar editar e publicar vídeos com áudio limpo '
+          'iluminação simples roteiro objetivo e uma boa chamada para ação no final').split()
+
+
+@dataclass
+class StubProfile:
+    """Latency, failure injection and payload sizes of the stand-in providers."""
+    latency_ms: float = 300.0                    # before the first byte of every response
+    jitter_ms: float = 100.0                     # uniform +/- around latency_ms
+    rate_limit_ratio: float = 0.0                # fraction of requests answered with 429
+    error_ratio: float = 0.0                     # fraction of requests answered with 500
+    retry_after_seconds: int = 1                 # Retry-After sent with the 429s
+    chunk_interval_ms: float = 40.0              # between chunks of a streamed response
+    transcribe_ms_per_audio_minute: float = 250.0  # extra Groq latency per minute of audio
+    audio_kbps: int = 64                         # to estimate the audio duration from the upload size
+    words_per_minute: int = 150                  # transcript density
+    content_chars: int = 2500                    # LLM output size
+    stream_chunk_chars: int = 120                # LLM output per streamed chunk
+    video_minutes: int = 20                      # length of the synthetic YouTube videos
+
+    def update(self, values: Dict[str, Any]) -> None:
+        """Apply the known keys of `values`, converted to each field's type."""
+        for field in fields(self):
+            if field.name in values:
+                setattr(self, field.name, type(getattr(self, field.name))(values[field.name]))
+
+
+class FixtureStore:
+    """
+    Recorded responses, one JSON file per response named `<route>-<n>.json`.
+    Replay rotates through the recordings of a route.
+    """
+
+    def __init__(self, directory: Optional[str]):
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._fixtures: Dict[str, List[Dict[str, Any]]] = {}
+        self._cursor: Dict[str, int] = {}
+        if directory and os.path.isdir(directory):
+            for name in sorted(os.listdir(directory)):
+                if not name.endswith('.json'):
+                    continue
+                with open(os.path.join(directory, name), encoding='utf-8') as fixture_file:
+                    fixture = json.load(fixture_file)
+                self._fixtures.setdefault(fixture['route'], []).append(fixture)
+
+    def counts(self) -> Dict[str, int]:
+        return {route: len(recordings) for route, recordings in self._fixtures.items()}
+
+    def next(self, route: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            recordings = self._fixtures.get(route)
+            if not recordings:
+                return None
+            cursor = self._cursor.get(route, 0)
+            self._cursor[route] = cursor + 1
+            return recordings[cursor % len(recordings)]
+
+    def save(self, route: str, status: int, content_type: str, chunks: List[str], **extra) -> None:
+        fixture = dict(route=route, status=status, content_type=content_type, chunks=chunks,
+                       recorded_at=time.strftime('%Y-%m-%dT%H:%M:%S'), **extra)
+        with self._lock:
+            self._fixtures.setdefault(route, []).append(fixture)
+            number = len(self._fixtures[route])
+            if not self.directory:
+                return
+            os.makedirs(self.directory, exist_ok=True)
+            path = os.path.join(self.directory, f'{route}-{number}.json')
+            with open(path, 'w', encoding='utf-8') as fixture_file:
+                json.dump(fixture, fixture_file, ensure_ascii=False, indent=1)
+        logger.info(f"[PROVIDER STUBS] Recorded {route} ({status}) to {path}")
+
+
+class StubStats:
+    """Request counters per route and status, served at GET /_stub/stats."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.started_at = time.time()
+            self.requests: Dict[str, Dict[str, int]] = {}
+            self.bytes_in = 0
+            self.bytes_out = 0
+            self.in_flight = 0
+            self.max_in_flight = 0
+
+    def begin(self, bytes_in: int) -> None:
+        with self._lock:
+            self.bytes_in += bytes_in
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+
+    def end(self, route: str, status: int, bytes_out: int) -> None:
+        with self._lock:
+            self.in_flight -= 1
+            self.bytes_out += bytes_out
+            by_status = self.requests.setdefault(route, {})
+            by_status[str(status)] = by_status.get(str(status), 0) + 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'uptime_seconds': round(time.time() - self.started_at, 1),
+                'requests': {route: dict(by_status) for route, by_status in self.requests.items()},
+                'bytes_in': self.bytes_in,
+                'bytes_out': self.bytes_out,
+                'in_flight': self.in_flight,
+                'max_in_flight': self.max_in_flight,
+            }
+
+
+def _words(count: int, offset: int = 0) -> str:
+    return ' '.join(_WORDS[(offset + i) % len(_WORDS)] for i in range(max(count, 1)))
+
+
+def _timestamp(seconds: int) -> str:
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f'{hours:02d}:{minutes:02d}:{seconds:02d}' if hours else f'{minutes:02d}:{seconds:02d}'
+
+
+def synthetic_llm_text(chars: int) -> str:
+    """
+    LLM output in the shape the parsers (apps/content_generation/parsers.py) accept:
+    titles with justification and keywords, chapters, then description paragraphs
+    up to `chars` characters.
+    """
+    lines = []
+    for n, title_type in enumerate(('Impactante', 'Curiosidade', 'SEO Clássico', 'Engajamento', 'Storytelling')):
+        lines += [
+            f'### {title_type}',
+            f'Título: {_words(8, n).capitalize()}',
+            f'Justificativa: {_words(20, n)}',
+            f'Palavras-chave: {", ".join(_WORDS[n:n + 3])}',
+            '',
+        ]
+    for n in range(6):
+        lines.append(f'{_timestamp(n * 90)} - {_words(4, n).capitalize()}')
+    lines.append('')
+    text = '\n'.join(lines)
+    paragraph = 0
+    while len(text) < chars:
+        text += '\n' + _words(60, paragraph).capitalize() + '.'
+        paragraph += 1
+    return text
+
+
+def _split(text: str, size: int) -> List[str]:
+    size = max(size, 1)
+    return [text[i:i + size] for i in range(0, len(text), size)] or ['']
+
+
+class ProviderStubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    server_version = 'ProviderStubs/1.0'
+
+    # Route dispatch
+
+    def do_GET(self):
+        self._dispatch('GET')
+
+    def do_POST(self):
+        self._dispatch('POST')
+
+    def log_message(self, format, *args):
+        logger.debug(f"[PROVIDER STUBS] {self.address_string()} {format % args}")
+
+    def _dispatch(self, method: str) -> None:
+        split = urlsplit(self.path)
+        self.query = parse_qs(split.query)
+        self.body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+
+        if split.path.startswith('/_stub/'):
+            self._control(method, split.path)
+            return
+
+        for route_method, pattern, route in ROUTES:
+            match = pattern.match(split.path)
+            if route_method == method and match:
+                break
+        else:
+            self._send_json(404, {'error': {'message': f'No stub for {method} {split.path}'}})
+            return
+
+        stats = self.server.stats
+        stats.begin(len(self.body))
+        self.bytes_out = 0
+        self.status = 500
+        try:
+            self._serve(route, match.groupdict())
+        except (BrokenPipeError, ConnectionResetError):
+            # The client gave up (e.g. a cancelled hedge attempt)
+            self.close_connection = True
+        finally:
+            stats.end(route, self.status, self.bytes_out)
+
+    def _serve(self, route: str, params: Dict[str, str]) -> None:
+        profile = self.server.profile
+        rng = self.server.rng
+
+        if self.server.record and route in UPSTREAMS:
+            self._record(route)
+            return
+        if self.server.record and route == 'youtube_info':
+            self._record_youtube_info()
+            return
+        if self.server.record and route == 'youtube_subtitles':
+            self._record_youtube_subtitles(params['video_id'])
+            return
+
+        delay_ms = profile.latency_ms + rng.uniform(-profile.jitter_ms, profile.jitter_ms)
+        roll = rng.random()
+        if roll < profile.rate_limit_ratio:
+            self._sleep(delay_ms)
+            self._send_error_response(route, 429)
+            return
+        if roll < profile.rate_limit_ratio + profile.error_ratio:
+            self._sleep(delay_ms)
+            self._send_error_response(route, 500)
+            return
+
+        fixture = self.server.fixtures.next(route)
+        if fixture is not None:
+            self._sleep(delay_ms)
+            self._send_chunks(fixture['status'], fixture['content_type'], fixture['chunks'],
+                              stream=len(fixture['chunks']) > 1)
+            return
+
+        status, content_type, chunks, extra_delay_ms = getattr(self, f'_synthesize_{route}')(params)
+        self._sleep(delay_ms + extra_delay_ms)
+        self._send_chunks(status, content_type, chunks, stream=route in ('gemini_stream', 'openai_chat') and len(chunks) > 1)
+
+    # Synthetic responses: (status, content type, body chunks, extra latency in ms)
+
+    def _synthesize_groq_transcription(self, params) -> Tuple[int, str, List[str], float]:
+        profile = self.server.profile
+        duration = max(len(self.body) * 8 / (profile.audio_kbps * 1000), 1.0)
+        words_per_segment = max(int(profile.words_per_minute * 5 / 60), 1)
+        segments = [
+            {'id': n, 'start': float(start), 'end': float(min(start + 5, duration)),
+             'text': ' ' + _words(words_per_segment, n).capitalize() + '.'}
+            for n, start in enumerate(range(0, int(duration), 5))
+        ]
+        text = ''.join(segment['text'] for segment in segments).strip()
+        extra_delay_ms = profile.transcribe_ms_per_audio_minute * duration / 60
+
+        match = _RESPONSE_FORMAT_RE.search(self.body)
+        if match and match.group(1) == b'text':
+            return 200, 'text/plain; charset=utf-8', [text], extra_delay_ms
+        payload = {'task': 'transcribe', 'language': 'Portuguese', 'duration': round(duration, 2),
+                   'text': text, 'segments': segments}
+        return 200, 'application/json', [json.dumps(payload, ensure_ascii=False)], extra_delay_ms
+
+    def _gemini_usage(self, text: str) -> Dict[str, int]:
+        prompt_tokens = max(len(self.body) // 4, 1)
+        output_tokens = max(len(text) // 4, 1)
+        return {'promptTokenCount': prompt_tokens, 'candidatesTokenCount': output_tokens,
+                'totalTokenCount': prompt_tokens + output_tokens}
+
+    def _synthesize_gemini_generate(self, params) -> Tuple[int, str, List[str], float]:
+        text = synthetic_llm_text(self.server.profile.content_chars)
+        payload = {
+            'candidates': [{'content': {'parts': [{'text': text}], 'role': 'model'}, 'finishReason': 'STOP', 'index': 0}],
+            'usageMetadata': self._gemini_usage(text),
+            'modelVersion': params['model'],
+        }
+        return 200, 'application/json', [json.dumps(payload, ensure_ascii=False)], 0
+
+    def _synthesize_gemini_stream(self, params) -> Tuple[int, str, List[str], float]:
+        # Without alt=sse the REST transport streams one JSON array of responses
+        profile = self.server.profile
+        text = synthetic_llm_text(profile.content_chars)
+        pieces = _split(text, profile.stream_chunk_chars)
+        chunks = []
+        for n, piece in enumerate(pieces):
+            response = {'candidates': [{'content': {'parts': [{'text': piece}], 'role': 'model'}, 'index': 0}],
+                        'modelVersion': params['model']}
+            if n == len(pieces) - 1:
+                response['candidates'][0]['finishReason'] = 'STOP'
+                response['usageMetadata'] = self._gemini_usage(text)
+            chunks.append(('[' if n == 0 else ',\r\n') + json.dumps(response, ensure_ascii=False))
+        chunks[-1] += ']'
+        return 200, 'application/json; charset=UTF-8', chunks, 0
+
+    def _synthesize_openai_chat(self, params) -> Tuple[int, str, List[str], float]:
+        profile = self.server.profile
+        request = json.loads(self.body or b'{}')
+        model = request.get('model', 'gpt-4o-mini')
+        text = synthetic_llm_text(profile.content_chars)
+        prompt_tokens = max(len(self.body) // 4, 1)
+        output_tokens = max(len(text) // 4, 1)
+        usage = {'prompt_tokens': prompt_tokens, 'completion_tokens': output_tokens,
+                 'total_tokens': prompt_tokens + output_tokens, 'prompt_tokens_details': {'cached_tokens': 0}}
+        base = {'id': f'chatcmpl-stub{self.server.rng.randrange(10 ** 9)}', 'created': int(time.time()), 'model': model}
+
+        if not request.get('stream'):
+            payload = dict(base, object='chat.completion', usage=usage, choices=[
+                {'index': 0, 'message': {'role': 'assistant', 'content': text}, 'finish_reason': 'stop'}])
+            return 200, 'application/json', [json.dumps(payload, ensure_ascii=False)], 0
+
+        def event(choices, **extra):
+            return 'data: ' + json.dumps(dict(base, object='chat.completion.chunk', choices=choices, **extra),
+                                         ensure_ascii=False) + '\n\n'
+
+        chunks = [event([{'index': 0, 'delta': {'role': 'assistant', 'content': piece}, 'finish_reason': None}])
+                  for piece in _split(text, profile.stream_chunk_chars)]
+        chunks.append(event([{'index': 0, 'delta': {}, 'finish_reason': 'stop'}]))
+        if (request.get('stream_options') or {}).get('include_usage'):
+            chunks.append(event([], usage=usage))
+        chunks.append('data: [DONE]\n\n')
+        return 200, 'text/event-stream', chunks, 0
+
+    def _synthesize_youtube_info(self, params) -> Tuple[int, str, List[str], float]:
+        url = (self.query.get('url') or [''])[0]
+        match = _VIDEO_ID_RE.search(url)
+        if not match:
+            return 404, 'application/json', [json.dumps({'error': f'Unsupported URL: {url}'})], 0
+        video_id = match.group(1)
+        subtitle_url = f'{self.server.public_url}/youtube/timedtext/{video_id}?' + urlencode({'lang': 'pt'})
+        info = {
+            'id': video_id,
+            'title': f'Vídeo sintético {video_id}',
+            'upload_date': '20240115',
+            'duration': self.server.profile.video_minutes * 60,
+            'language': 'pt',
+            'subtitles': {'pt': [{'ext': 'srv1', 'url': subtitle_url, 'name': 'Português'}]},
+            'automatic_captions': {},
+        }
+        return 200, 'application/json', [json.dumps(info, ensure_ascii=False)], 0
+
+    def _synthesize_youtube_subtitles(self, params) -> Tuple[int, str, List[str], float]:
+        profile = self.server.profile
+        words_per_line = max(int(profile.words_per_minute * 4 / 60), 1)
+        lines = [
+            f'<text start="{start}" dur="4">{_words(words_per_line, n)}</text>'
+            for n, start in enumerate(range(0, profile.video_minutes * 60, 4))
+        ]
+        body = '<?xml version="1.0" encoding="utf-8" ?><transcript>' + ''.join(lines) + '</transcript>'
+        return 200, 'text/xml; charset=UTF-8', [body], 0
+
+    # Recording
+
+    def _record(self, route: str) -> None:
+        headers = {name: value for name, value in self.headers.items() if name.lower() in FORWARDED_HEADERS}
+        # Network chunks can split a multi-byte character (accented Portuguese text)
+        decoder = codecs.getincrementaldecoder('utf-8')()
+        try:
+            upstream = requests.post(UPSTREAMS[route] + self.path, data=self.body, headers=headers, stream=True,
+                                     timeout=300)
+            chunks = [decoder.decode(chunk) for chunk in upstream.iter_content(chunk_size=None) if chunk]
+            chunks.append(decoder.decode(b'', final=True))
+        except requests.RequestException as e:
+            self._send_upstream_error(route, e)
+            return
+        chunks = [chunk for chunk in chunks if chunk]
+        content_type = upstream.headers.get('Content-Type', 'application/json')
+        self.server.fixtures.save(route, upstream.status_code, content_type, chunks)
+        self._send_chunks(upstream.status_code, content_type, chunks, stream=len(chunks) > 1)
+
+    def _record_youtube_info(self) -> None:
+        import yt_dlp
+        from yt_dlp.utils import DownloadError
+
+        url = (self.query.get('url') or [''])[0]
+        try:
+            with yt_dlp.YoutubeDL({'skip_download': True, 'quiet': True, 'no_warnings': True}) as ydl:
+                info = ydl.extract_info(url, download=False)
+        except DownloadError as e:
+            self._send_upstream_error('youtube_info', e)
+            return
+        video_id = info.get('id', 'video')
+
+        # Keep what extract_youtube_transcript reads and point the subtitle
+        # tracks at this server, remembering where each one really is
+        def rewrite(tracks: Dict[str, List[Dict[str, Any]]], kind: str) -> Dict[str, List[Dict[str, Any]]]:
+            rewritten = {}
+            for lang, formats in (tracks or {}).items():
+                rewritten[lang] = []
+                for subtitle_format in formats:
+                    query = urlencode({'lang': lang, 'kind': kind, 'ext': subtitle_format.get('ext', '')})
+                    self.server.subtitle_upstreams[f'{video_id}?{query}'] = subtitle_format.get('url')
+                    rewritten[lang].append(dict(subtitle_format, url=f'{self.server.public_url}/youtube/timedtext/{video_id}?{query}'))
+            return rewritten
+
+        trimmed = {
+            'id': video_id,
+            'title': info.get('title'),
+            'upload_date': info.get('upload_date'),
+            'duration': info.get('duration'),
+            'language': info.get('language'),
+            'subtitles': rewrite(info.get('subtitles'), 'manual'),
+            'automatic_captions': rewrite(info.get('automatic_captions'), 'auto'),
+        }
+        chunks = [json.dumps(trimmed, ensure_ascii=False)]
+        self.server.fixtures.save('youtube_info', 200, 'application/json', chunks, source_url=url)
+        self._send_chunks(200, 'application/json', chunks)
+
+    def _record_youtube_subtitles(self, video_id: str) -> None:
+        upstream_url = self.server.subtitle_upstreams.get(f'{video_id}?{urlsplit(self.path).query}')
+        if not upstream_url:
+            self._send_json(404, {'error': 'Subtitle track not seen in a recorded youtube_info'})
+            return
+        try:
+            upstream = requests.get(upstream_url, timeout=60)
+        except requests.RequestException as e:
+            self._send_upstream_error('youtube_subtitles', e)
+            return
+        content_type = upstream.headers.get('Content-Type', 'text/xml')
+        chunks = [upstream.text]
+        self.server.fixtures.save('youtube_subtitles', upstream.status_code, content_type, chunks)
+        self._send_chunks(upstream.status_code, content_type, chunks)
+
+    # Control endpoints
+
+    def _control(self, method: str, path: str) -> None:
+        server = self.server
+        if path == '/_stub/config' and method == 'POST':
+            try:
+                server.profile.update(json.loads(self.body or b'{}'))
+            except (TypeError, ValueError) as e:
+                self._send_json(400, {'error': str(e)})
+                return
+            logger.info(f"[PROVIDER STUBS] Profile updated: {asdict(server.profile)}")
+        if path == '/_stub/config':
+            self._send_json(200, asdict(server.profile))
+        elif path == '/_stub/stats' and method == 'GET':
+            self._send_json(200, dict(server.stats.snapshot(), fixtures=server.fixtures.counts(), record=server.record))
+        elif path == '/_stub/reset' and method == 'POST':
+            server.stats.reset()
+            self._send_json(200, {'reset': True})
+        else:
+            self._send_json(404, {'error': f'Unknown control endpoint {method} {path}'})
+
+    # Response helpers
+
+    def _sleep(self, delay_ms: float) -> None:
+        if delay_ms > 0:
+            time.sleep(delay_ms / 1000)
+
+    def _send_error_response(self, route: str, status: int) -> None:
+        retry_after = self.server.profile.retry_after_seconds
+        if route.startswith('gemini'):
+            code = 'RESOURCE_EXHAUSTED' if status == 429 else 'INTERNAL'
+            payload = {'error': {'code': status, 'message': f'Stub {code}', 'status': code}}
+        elif route.startswith('youtube'):
+            payload = {'error': 'HTTP Error 429: Too Many Requests' if status == 429 else 'HTTP Error 500'}
+        else:
+            kind = 'rate_limit_exceeded' if status == 429 else 'server_error'
+            payload = {'error': {'message': f'Stub {kind}', 'type': kind, 'code': kind}}
+        headers = {'Retry-After': str(retry_after)} if status == 429 else {}
+        self._send_json(status, payload, headers)
+
+    def _send_upstream_error(self, route: str, error: Exception) -> None:
+        """The real provider could not be reached while recording: nothing is saved."""
+        logger.error(f"[PROVIDER STUBS] Recording {route} failed: {error}")
+        self._send_json(502, {'error': {'message': f'Upstream {route} unavailable: {error}', 'type': 'upstream_error'}})
+
+    def _send_json(self, status: int, payload: Any, headers: Optional[Dict[str, str]] = None) -> None:
+        self._send_chunks(status, 'application/json', [json.dumps(payload, ensure_ascii=False)], headers=headers)
+
+    def _send_chunks(self, status: int, content_type: str, chunks: List[str], stream: bool = False,
+                     headers: Optional[Dict[str, str]] = None) -> None:
+        """
+        Send the body in one piece, or for streams chunk by chunk with the profile's
+        interval; streams are delimited by closing the connection.
+        """
+        self.status = status
+        encoded = [chunk.encode('utf-8') for chunk in chunks]
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        if stream:
+            self.send_header('Connection', 'close')
+            self.close_connection = True
+        else:
+            self.send_header('Content-Length', str(sum(len(chunk) for chunk in encoded)))
+        self.end_headers()
+
+        interval_ms = self.server.profile.chunk_interval_ms
+        for n, chunk in enumerate(encoded):
+            if stream and n:
+                self._sleep(interval_ms)
+            self.wfile.write(chunk)
+            self.wfile.flush()
+            self.bytes_out = getattr(self, 'bytes_out', 0) + len(chunk)
+
+
+class ProviderStubServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 256
+
+    def __init__(self, address: Tuple[str, int], profile: Optional[StubProfile] = None,
+                 fixtures_dir: Optional[str] = None, record: bool = False, seed: Optional[int] = None,
+                 public_url: Optional[str] = None):
+        super().__init__(address, ProviderStubHandler)
+        self.profile = profile or StubProfile()
+        self.fixtures = FixtureStore(fixtures_dir)
+        self.record = record
+        self.rng = random.Random(seed)
+        self.stats = StubStats()
+        self.subtitle_upstreams: Dict[str, str] = {}
+        host, port = self.server_address[:2]
+        # Subtitle URLs handed to clients must be reachable from them (e.g. another container)
+        self.public_url = (public_url or f'http://{"127.0.0.1" if host in ("0.0.0.0", "") else host}:{port}').rstrip('/')
+
+    @property
+    def url(self) -> str:
+        return self.public_url
+
+
+def start_stub_server(profile: Optional[StubProfile] = None, host: str = '127.0.0.1', port: int = 0,
+                      **kwargs) -> ProviderStubServer:
+    """Start a stub server on a background thread (port 0 picks a free port); stop it with shutdown()."""
+    server = ProviderStubServer((host, port), profile=profile, **kwargs)
+    threading.Thread(target=server.serve_forever, name='provider-stubs', daemon=True).start()
+    return server
+
+
+class StubYoutubeDL:
+    """
+    Stand-in for yt_dlp.YoutubeDL used when PROVIDER_STUB_URL is set: extract_info()
+    returns the info dict served by the stub server, whose subtitle URLs point back
+    at it. Failures raise yt-dlp's DownloadError, like the real extractor.
+    """
+
+    def __init__(self, params: Optional[Dict[str, Any]] = None, base_url: Optional[str] = None):
+        from django.conf import settings
+
+        self.params = params or {}
+        self.base_url = (base_url or settings.PROVIDER_STUB_URL).rstrip('/')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def extract_info(self, url: str, download: bool = False, **kwargs) -> Dict[str, Any]:
+        from yt_dlp.utils import DownloadError
+
+        if download:
+            raise DownloadError('StubYoutubeDL só fornece metadados e legendas (download=False)')
+        try:
+            response = requests.get(f'{self.base_url}/youtube/info?url={quote(url, safe="")}', timeout=60)
+        except requests.RequestException as e:
+            raise DownloadError(f'Provider stub unreachable: {e}') from e
+        if response.status_code != 200:
+            raise DownloadError(f'HTTP Error {response.status_code}: {response.text[:200]}')
+        return response.json()
@@ -0,0 +1,103 @@
+"""
+Per-request ORM query profiling.
+Every query of a request goes through a connection execute wrapper that counts
+it, adds its time and groups it by SQL shape (the statement without literal
+values, IN lists collapsed). The totals are returned in a Server-Timing header;
+shapes repeated QUERY_PROFILING_N_PLUS_ONE_THRESHOLD times or more are logged
+as probable N+1 patterns, and queries slower than QUERY_PROFILING_SLOW_QUERY_MS
+are logged for a QUERY_PROFILING_SLOW_QUERY_SAMPLE_RATE sample.
+"""
+import functools
+import logging
+import random
+import re
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+MAX_LOGGED_SQL = 1000
+_IN_LIST = re.compile(r'IN \((?:%s, )*%s\)')
+_WHITESPACE = re.compile(r'\s+')
+
+
+@functools.lru_cache(maxsize=1024)
+def sql_shape(sql: str) -> str:
+    """Statement identity for N+1 detection: parameters are already placeholders."""
+    return _IN_LIST.sub('IN (...)', _WHITESPACE.sub(' ', sql))
+
+
+class QueryStats:
+    """Execute wrapper collecting the queries of one request."""
+
+    def __init__(self, slow_query_seconds: float):
+        self.slow_query_seconds = slow_query_seconds
+        self.count = 0
+        self.seconds = 0.0
+        self.shapes = Counter()
+        self.slow = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.count += 1
+            self.seconds += elapsed
+            self.shapes[sql_shape(sql)] += 1
+            if elapsed >= self.slow_query_seconds:
+                self.slow.append((elapsed, sql))
+
+    def repeated_shapes(self, threshold: int):
+        return [(shape, count) for shape, count in self.shapes.most_common() if count >= threshold]
+
+
+class QueryProfilingMiddleware:
+    """Count queries and DB time per request; report them in Server-Timing and the logs."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.QUERY_PROFILING_ENABLED:
+            return self.get_response(request)
+
+        stats = QueryStats(settings.QUERY_PROFILING_SLOW_QUERY_MS / 1000)
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(stats))
+            response = self.get_response(request)
+        total = time.perf_counter() - start
+
+        response['Server-Timing'] = (
+            f'db;dur={stats.seconds * 1000:.1f};desc="{stats.count} queries", app;dur={total * 1000:.1f}'
+        )
+        match = getattr(request, 'resolver_match', None)
+        route = match.route if match is not None else metrics.UNMATCHED_ROUTE
+        metrics.HTTP_REQUEST_DB_QUERIES.labels(request.method, route).observe(stats.count)
+        self._log(request, route, stats)
+        return response
+
+    @staticmethod
+    def _log(request, route, stats: QueryStats) -> None:
+        for shape, count in stats.repeated_shapes(settings.QUERY_PROFILING_N_PLUS_ONE_THRESHOLD):
+            logger.warning(
+                f"[QUERIES] Possível N+1 em {request.method} /{route}: {count}x "
+                f"(de {stats.count} consultas) {shape[:MAX_LOGGED_SQL]}"
+            )
+        sample_rate = settings.QUERY_PROFILING_SLOW_QUERY_SAMPLE_RATE
+        for elapsed, sql in stats.slow:
+            if random.random() < sample_rate:
+                # SQL without parameters: values may contain user data
+                logger.warning(
+                    f"[QUERIES] Consulta lenta ({elapsed * 1000:.0f} ms) em {request.method} /{route}: "
+                    f"{sql[:MAX_LOGGED_SQL]}"
+                )
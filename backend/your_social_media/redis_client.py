@@ -0,0 +1,21 @@
+"""
+Shared Redis connection for application state (streams, locks, counters).
+Uses the same Redis instance as the Celery broker.
+"""
+import threading
+
+import redis
+from django.conf import settings
+
+_lock = threading.Lock()
+_client = None
+
+
+def get_redis() -> redis.Redis:
+    """Return a process-wide Redis client (connection pool is created lazily)."""
+    global _client
+    if _client is None:
+        with _lock:
+            if _client is None:
+                _client = redis.from_url(settings.CELERY_BROKER_URL, decode_responses=True)
+    return _client
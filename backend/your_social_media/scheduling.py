@@ -0,0 +1,210 @@
+"""
+Priority scheduling for Celery jobs (transcriptions and content generations).
+Jobs are published with a Redis broker priority (0 = consumed first, 9 = last)
+computed from the owner's plan and the estimated job cost. Jobs that wait too
+long are re-published with a better priority (age boost) by a periodic task;
+the copy that was superseded is skipped when a worker picks it up. Starting a
+job and re-publishing it are compare-and-set operations on the job record, so
+exactly one copy runs.
+"""
+import json
+import logging
+import time
+from typing import Callable, Dict, Optional
+
+from celery import uuid
+from django.conf import settings
+
+from .redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+PRIORITY_HIGHEST = 0
+PRIORITY_LOWEST = 9
+PLAN_BASE_PRIORITY = {'premium': 0, 'free': 3}
+# (estimated media seconds, priority penalty): short jobs jump ahead of long ones
+COST_TIERS = ((10 * 60, 0), (60 * 60, 1), (3 * 60 * 60, 2))
+MAX_COST_PENALTY = 3
+# Rough media seconds per MB when the duration is not known yet
+SECONDS_PER_MB = {'audio_upload': 60, 'video_upload': 8}
+YOUTUBE_COST_SECONDS = 30
+# Average characters per second of speech, to size content generations by transcript
+SPEECH_CHARS_PER_SECOND = 15
+
+JOB_KEY = 'scheduling:job:{kind}:{id}'
+WAITING_KEY = 'scheduling:waiting'
+JOB_TTL_SECONDS = 24 * 60 * 60
+
+# Claim the job of record KEYS[1] for the message ARGV[1] (its task_id). Returns 0
+# when the record names another copy. A job that was never boosted has no other
+# copy, so its record is deleted; otherwise a 'started' tombstone keeps rejecting
+# the superseded copies (but not retries of this one) until the record expires.
+_CLAIM_SCRIPT = """
+local raw = redis.call('GET', KEYS[1])
+if not raw then return 1 end
+local record = cjson.decode(raw)
+if record['task_id'] ~= ARGV[1] then return 0 end
+if record['started'] then return 1 end
+redis.call('ZREM', KEYS[2], ARGV[2])
+if (record['boosts'] or 0) > 0 then
+    local ttl = redis.call('PTTL', KEYS[1])
+    local tombstone = cjson.encode({task_id = ARGV[1], started = true})
+    redis.call('SET', KEYS[1], tombstone, 'PX', ttl > 0 and ttl or 1)
+else
+    redis.call('DEL', KEYS[1])
+end
+return 1
+"""
+
+# Replace the record with the boosted copy's only if it still names ARGV[1] and
+# that copy has not started
+_REPLACE_SCRIPT = """
+local raw = redis.call('GET', KEYS[1])
+if not raw then return 0 end
+local record = cjson.decode(raw)
+if record['task_id'] ~= ARGV[1] or record['started'] then return 0 end
+redis.call('SET', KEYS[1], ARGV[2], 'EX', ARGV[3])
+redis.call('ZADD', KEYS[2], ARGV[4], ARGV[5])
+return 1
+"""
+
+
+def plan_of(user) -> str:
+    return getattr(user, 'plan', None) or 'free'
+
+
+def transcription_cost_seconds(transcription) -> float:
+    """Estimated media duration a transcription job has to process."""
+    if transcription.source_type == 'youtube':
+        return YOUTUBE_COST_SECONDS
+    if transcription.duration_seconds:
+        return transcription.duration_seconds
+    return (transcription.file_size_mb or 0) * SECONDS_PER_MB.get(transcription.source_type, 60)
+
+
+def content_generation_cost_seconds(content_generation) -> float:
+    """Size of the transcript a content generation has to read, in media seconds."""
+    transcription = content_generation.transcription
+    if transcription.duration_seconds:
+        return transcription.duration_seconds
+    return len(transcription.transcription_text or '') / SPEECH_CHARS_PER_SECOND
+
+
+def base_priority(plan: str, cost_seconds: float) -> int:
+    """Priority before any age boost: plan lane plus a penalty for expensive jobs."""
+    penalty = next((tier for limit, tier in COST_TIERS if cost_seconds < limit), MAX_COST_PENALTY)
+    return min(PRIORITY_LOWEST, PLAN_BASE_PRIORITY.get(plan, PLAN_BASE_PRIORITY['free']) + penalty)
+
+
+def boosted_priority(base: int, waited_seconds: float) -> int:
+    """Improve the priority by one level for every SCHEDULING_AGE_BOOST_SECONDS waited."""
+    boost = int(waited_seconds // max(1, settings.SCHEDULING_AGE_BOOST_SECONDS))
+    return max(PRIORITY_HIGHEST, base - boost)
+
+
+def _first_task(signature):
+    return signature.tasks[0] if hasattr(signature, 'tasks') else signature
+
+
+def register_job(kind: str, job_id, signature, priority: int, extra: Optional[Dict] = None):
+    """
+    Remember a job for the age boost without publishing it, for callers that
+    publish the signature themselves (e.g. as part of a chain). Assigns the
+    task_id of the signature's first task, which is the copy allowed to start.
+    `extra` is stored with the job so the re-dispatcher can rebuild its signature.
+    Redis errors fail open: the job simply gets no age boost.
+    """
+    task_id = uuid()
+    _first_task(signature).set(task_id=task_id)
+    record = {
+        'task_id': task_id,
+        'base_priority': priority,
+        'priority': priority,
+        'dispatched_at': time.time(),
+        'boosts': 0,
+        'extra': extra or {},
+    }
+    member = f"{kind}:{job_id}"
+    try:
+        redis_client = get_redis()
+        redis_client.set(JOB_KEY.format(kind=kind, id=job_id), json.dumps(record), ex=JOB_TTL_SECONDS)
+        redis_client.zadd(WAITING_KEY, {member: record['dispatched_at']})
+    except Exception as e:
+        logger.warning(f"[SCHEDULING] Redis indisponível, {member} publicado sem age boost: {e}")
+    return signature
+
+
+def dispatch_job(kind: str, job_id, signature, priority: int, extra: Optional[Dict] = None):
+    """Publish a job with the given priority and remember it for the age boost."""
+    register_job(kind, job_id, signature, priority, extra)
+    logger.info(f"[SCHEDULING] {kind}:{job_id} publicado com prioridade {priority}")
+    return signature.apply_async(priority=priority)
+
+
+def _claim(redis_client, kind: str, job_id, task_id: str) -> bool:
+    claim = redis_client.register_script(_CLAIM_SCRIPT)
+    return bool(claim(keys=[JOB_KEY.format(kind=kind, id=job_id), WAITING_KEY], args=[task_id, f"{kind}:{job_id}"]))
+
+
+def start_job(kind: str, job_id, task_id: str) -> bool:
+    """
+    Called by the first task of a job. Atomically claims the job for this
+    message; returns False when it was superseded by a boosted copy (or another
+    copy already started) and must be skipped.
+    """
+    try:
+        if not _claim(get_redis(), kind, job_id, task_id):
+            logger.info(f"[SCHEDULING] Cópia antiga de {kind}:{job_id} ignorada ({task_id})")
+            return False
+    except Exception as e:
+        logger.warning(f"[SCHEDULING] Falha ao registrar início de {kind}:{job_id}: {e}")
+    return True
+
+
+def boost_waiting_jobs(redispatchers: Dict[str, Callable], now: Optional[float] = None) -> int:
+    """
+    Re-publish jobs whose age boost improved their priority.
+    `redispatchers` maps a job kind to a callable(job_id, extra) that returns the
+    job's signature, or None when the job no longer needs to run.
+    Returns the number of jobs re-published.
+    """
+    now = time.time() if now is None else now
+    redis_client = get_redis()
+    cutoff = now - settings.SCHEDULING_AGE_BOOST_SECONDS
+    boosted = 0
+    for member in redis_client.zrangebyscore(WAITING_KEY, '-inf', cutoff):
+        kind, job_id = member.split(':', 1)
+        key = JOB_KEY.format(kind=kind, id=job_id)
+        raw = redis_client.get(key)
+        redispatch = redispatchers.get(kind)
+        if raw is None or redispatch is None:
+            redis_client.zrem(WAITING_KEY, member)
+            continue
+
+        record = json.loads(raw)
+        if record.get('started'):
+            redis_client.zrem(WAITING_KEY, member)
+            continue
+        priority = boosted_priority(record['base_priority'], now - record['dispatched_at'])
+        if priority >= record['priority']:
+            continue
+        signature = redispatch(job_id, record['extra'])
+        if signature is None:
+            # No longer pending: retire the record unless a worker claimed it meanwhile
+            _claim(redis_client, kind, job_id, record['task_id'])
+            continue
+
+        previous_task_id = record['task_id']
+        record['task_id'] = uuid()
+        record['priority'] = priority
+        record['boosts'] = record.get('boosts', 0) + 1
+        replace = redis_client.register_script(_REPLACE_SCRIPT)
+        if not replace(keys=[key, WAITING_KEY],
+                       args=[previous_task_id, json.dumps(record), JOB_TTL_SECONDS, record['dispatched_at'], member]):
+            # A worker claimed the job after it was read: the waiting copy runs, publish nothing
+            continue
+        _first_task(signature).set(task_id=record['task_id'])
+        signature.apply_async(priority=priority)
+        boosted += 1
+        logger.info(f"[SCHEDULING] {member} aguardando há {int(now - record['dispatched_at'])}s; prioridade {priority}")
+    return boosted
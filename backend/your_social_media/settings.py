@@ -88,6 +88,9 @@ LOCAL_APPS = [
 INSTALLED_APPS = DJANGO_APPS + THIRD_PARTY_APPS + LOCAL_APPS
 
 MIDDLEWARE = [
+    'your_social_media.metrics.MetricsMiddleware',
+    'your_social_media.profiling.ProfilingMiddleware',
+    'your_social_media.query_profiling.QueryProfilingMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
@@ -302,6 +305,7 @@ CORS_EXPOSE_HEADERS = [
     'content-length',
     'content-range',
     'content-type',
+    'server-timing',
 ]
 
 # API Documentation
@@ -326,6 +330,85 @@ CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = TIME_ZONE
 
+# Task routing: CPU-bound media work (ffmpeg/moviepy/pydub) and network-bound
+# API work (YouTube, Groq, Gemini/OpenAI) run on separate queues and worker pools
+# (see docker-entrypoint.sh: celery-media uses prefork, celery-io uses threads)
+CELERY_MEDIA_QUEUE = 'media'
+CELERY_IO_QUEUE = 'io'
+CELERY_TASK_DEFAULT_QUEUE = CELERY_IO_QUEUE
+CELERY_TASK_ROUTES = {
+    'apps.transcriptions.tasks.probe_audio': {'queue': CELERY_MEDIA_QUEUE},
+    'apps.transcriptions.tasks.extract_audio': {'queue': CELERY_MEDIA_QUEUE},
+    'apps.transcriptions.tasks.segment_audio': {'queue': CELERY_MEDIA_QUEUE},
+    'apps.transcriptions.tasks.*': {'queue': CELERY_IO_QUEUE},
+    'apps.content_generation.tasks.*': {'queue': CELERY_IO_QUEUE},
+}
+# Media tasks are acknowledged late (see tasks.py), so the broker must not
+# redeliver them while a long transcode is still running
+CELERY_BROKER_TRANSPORT_OPTIONS = {
+    'visibility_timeout': env.int('CELERY_VISIBILITY_TIMEOUT_SECONDS', default=3 * 60 * 60),
+    # Priority lanes (see your_social_media/scheduling.py): with Redis, 0 is consumed first
+    'priority_steps': list(range(10)),
+    'sep': ':',
+    'queue_order_strategy': 'priority',
+}
+CELERY_TASK_DEFAULT_PRIORITY = 5
+CELERY_TASK_INHERIT_PARENT_PRIORITY = True
+# Waiting jobs gain one priority level per interval so long jobs are not starved
+SCHEDULING_AGE_BOOST_SECONDS = env.int('SCHEDULING_AGE_BOOST_SECONDS', default=5 * 60)
+CELERY_BEAT_SCHEDULE = {
+    'boost-waiting-jobs': {
+        'task': 'apps.transcriptions.tasks.boost_waiting_jobs',
+        'schedule': 60.0,
+    },
+}
+
+# Prometheus metrics (your_social_media/metrics.py): /metrics on the backend,
+# an exporter on this port in every Celery worker (0 disables it)
+METRICS_AUTH_TOKEN = env('METRICS_AUTH_TOKEN', default='')
+CELERY_METRICS_PORT = env.int('CELERY_METRICS_PORT', default=9808)
+
+# Opt-in profiling (your_social_media/profiling.py): jobs marked through
+# /api/profiles/ or sampled by ID, and sampled requests slower than the threshold
+PROFILING_ENABLED = env.bool('PROFILING_ENABLED', default=False)
+PROFILING_SAMPLE_RATE = env.float('PROFILING_SAMPLE_RATE', default=0.0)
+PROFILING_REQUEST_SAMPLE_RATE = env.float('PROFILING_REQUEST_SAMPLE_RATE', default=0.0)
+PROFILING_SLOW_REQUEST_SECONDS = env.float('PROFILING_SLOW_REQUEST_SECONDS', default=2.0)
+# Outside MEDIA_ROOT (served publicly); shared by the backend and the workers
+PROFILING_DIR = env('PROFILING_DIR', default=str(BASE_DIR / 'profiles'))
+
+# ORM query profiling per request (your_social_media/query_profiling.py):
+# Server-Timing header, N+1 warnings and a sample of the slow queries
+QUERY_PROFILING_ENABLED = env.bool('QUERY_PROFILING_ENABLED', default=True)
+QUERY_PROFILING_N_PLUS_ONE_THRESHOLD = env.int('QUERY_PROFILING_N_PLUS_ONE_THRESHOLD', default=10)
+QUERY_PROFILING_SLOW_QUERY_MS = env.float('QUERY_PROFILING_SLOW_QUERY_MS', default=200.0)
+QUERY_PROFILING_SLOW_QUERY_SAMPLE_RATE = env.float('QUERY_PROFILING_SLOW_QUERY_SAMPLE_RATE', default=0.1)
+
+# Admission control on job creation (your_social_media/admission.py): reject with
+# 429 + Retry-After when the estimated wait exceeds these limits
+ADMISSION_CONTROL_ENABLED = env.bool('ADMISSION_CONTROL_ENABLED', default=True)
+ADMISSION_TRANSCRIPTION_MAX_WAIT_SECONDS = env.int('ADMISSION_TRANSCRIPTION_MAX_WAIT_SECONDS', default=2 * 60 * 60)
+ADMISSION_CONTENT_GENERATION_MAX_WAIT_SECONDS = env.int('ADMISSION_CONTENT_GENERATION_MAX_WAIT_SECONDS', default=30 * 60)
+ADMISSION_MAX_QUEUE_DEPTH = env.int('ADMISSION_MAX_QUEUE_DEPTH', default=5000)
+ADMISSION_THROUGHPUT_WINDOW_SECONDS = env.int('ADMISSION_THROUGHPUT_WINDOW_SECONDS', default=15 * 60)
+
+# Content generation
+# Stream Gemini output into a Redis buffer so clients can show partial results
+CONTENT_GENERATION_STREAMING = env.bool('CONTENT_GENERATION_STREAMING', default=True)
+# Batch requests: maximum transcriptions per batch and tasks running at once per batch
+CONTENT_GENERATION_BATCH_MAX_SIZE = env.int('CONTENT_GENERATION_BATCH_MAX_SIZE', default=100)
+CONTENT_GENERATION_BATCH_CONCURRENCY = env.int('CONTENT_GENERATION_BATCH_CONCURRENCY', default=4)
+# Identical in-flight generations (same transcription and options) reuse one run
+CONTENT_GENERATION_SINGLE_FLIGHT = env.bool('CONTENT_GENERATION_SINGLE_FLIGHT', default=True)
+# LLM provider routing: hedge slow Gemini calls with OpenAI after the rolling p95
+# (clamped to the min/max below) and skip providers whose circuit breaker is open
+LLM_HEDGING_ENABLED = env.bool('LLM_HEDGING_ENABLED', default=True)
+LLM_HEDGE_DEFAULT_DELAY_SECONDS = env.float('LLM_HEDGE_DEFAULT_DELAY_SECONDS', default=20.0)
+LLM_HEDGE_MIN_DELAY_SECONDS = env.float('LLM_HEDGE_MIN_DELAY_SECONDS', default=5.0)
+LLM_HEDGE_MAX_DELAY_SECONDS = env.float('LLM_HEDGE_MAX_DELAY_SECONDS', default=30.0)
+LLM_CIRCUIT_FAILURE_THRESHOLD = env.int('LLM_CIRCUIT_FAILURE_THRESHOLD', default=5)
+LLM_CIRCUIT_COOLDOWN_SECONDS = env.float('LLM_CIRCUIT_COOLDOWN_SECONDS', default=60.0)
+
 # AI APIs Configuration
 if DEBUG:
     # In DEBUG mode, allow reading from .env via django-environ for local development
@@ -343,8 +426,19 @@ logger.info(f"[SETTINGS] GROQ_API_KEY loaded: {'Yes' if GROQ_API_KEY else 'No'}
 logger.info(f"[SETTINGS] GOOGLE_API_KEY loaded: {'Yes' if GOOGLE_API_KEY else 'No'} (length: {len(GOOGLE_API_KEY) if GOOGLE_API_KEY else 0})")
 logger.info(f"[SETTINGS] OPENAI_API_KEY loaded: {'Yes' if OPENAI_API_KEY else 'No'} (length: {len(OPENAI_API_KEY) if OPENAI_API_KEY else 0})")
 
+# Local stand-ins for the external providers (your_social_media/provider_stubs.py,
+# `manage.py run_provider_stubs`): when set, Groq, Gemini, OpenAI and YouTube are
+# called on this server instead of the real APIs (benchmarks and load tests only)
+PROVIDER_STUB_URL = env('PROVIDER_STUB_URL', default='').rstrip('/')
+GROQ_API_BASE_URL = f'{PROVIDER_STUB_URL}/openai/v1' if PROVIDER_STUB_URL else 'https://api.groq.com/openai/v1'
+if PROVIDER_STUB_URL:
+    logger.warning(f"[SETTINGS] PROVIDER_STUB_URL set: external providers replaced by {PROVIDER_STUB_URL}")
+
 # File Upload Settings - UNLIMITED for mobile compatibility
-FILE_UPLOAD_MAX_MEMORY_SIZE = None  # Unlimited
+# Threshold above which an upload is streamed to a temp file instead of being held
+# in memory (not a size limit - the serializer caps audio at 500MB). It must be an
+# integer: None makes every multipart request fail in MemoryFileUploadHandler.
+FILE_UPLOAD_MAX_MEMORY_SIZE = env.int('FILE_UPLOAD_MAX_MEMORY_SIZE', default=2621440)  # 2.5MB
 DATA_UPLOAD_MAX_MEMORY_SIZE = None  # Unlimited
 DATA_UPLOAD_MAX_NUMBER_FIELDS = 10000  # Increase field limit
 FILE_UPLOAD_PERMISSIONS = 0o644
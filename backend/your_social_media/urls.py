@@ -9,6 +9,8 @@ from drf_spectacular.views import SpectacularAPIView, SpectacularSwaggerView
 from django.views.generic import TemplateView
 from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
+from your_social_media.metrics import metrics_view
+from your_social_media.profiling import profile_download_view, profiles_view
 
 @csrf_exempt
 def health_check(request):
@@ -26,6 +28,9 @@ urlpatterns = [
     # API Routes
     path('api/auth/', include('apps.users.urls')),
     path('api/health/', health_check, name='health_check'),
+    path('metrics', metrics_view, name='metrics'),
+    path('api/profiles/', profiles_view, name='profiles'),
+    path('api/profiles/<str:artifact>/', profile_download_view, name='profile_download'),
     path('api/transcriptions/', include('apps.transcriptions.urls')),
     path('api/content-generation/', include('apps.content_generation.urls')),
     